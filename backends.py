@@ -0,0 +1,416 @@
+"""Input backends: the only place that talks to the keyboard and mouse libraries.
+
+Every backend implements the InputBackend interface. The input library is
+imported when a backend is created, not when this module is imported, so the
+recording backend works on a headless machine with none of them installed.
+"""
+import contextlib
+import math
+import sys
+import time
+from collections import namedtuple
+
+DEFAULT_BACKEND = 'pydirectinput'
+
+
+def _clipboard():
+    """The pyperclip module (installed with pyautogui), or None."""
+    try:
+        import pyperclip
+        return pyperclip
+    except ImportError:
+        return None
+
+
+PASTE_MODIFIER = 'command' if sys.platform == 'darwin' else 'ctrl'
+
+
+class InputBackend:
+    """Keyboard and mouse interface used by the engine.
+
+    can_paste tells whether paste() works; unicode_typing whether write()
+    can type characters that have no key on a US keyboard.
+    """
+
+    name = None
+    can_paste = False
+    unicode_typing = False
+
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+    def key_press(self, key):
+        self.key_down(key)
+        self.key_up(key)
+
+    def mouse_move(self, x, y, duration=0.0):
+        """Move the cursor to (x, y), taking duration seconds."""
+        raise NotImplementedError
+
+    def mouse_down(self, button='left'):
+        raise NotImplementedError
+
+    def mouse_up(self, button='left'):
+        raise NotImplementedError
+
+    def click(self, button='left'):
+        self.mouse_down(button)
+        self.mouse_up(button)
+
+    def write(self, text, interval=0.0):
+        """Type text, waiting interval seconds between characters."""
+        raise NotImplementedError
+
+    def position(self):
+        """Return the cursor position as (x, y)."""
+        raise NotImplementedError
+
+    def paste(self, text):
+        """Put text on the clipboard and send the paste shortcut."""
+        raise NotImplementedError
+
+    def atomic(self):
+        """Context manager for calls that must not interleave with other input."""
+        return contextlib.nullcontext()
+
+
+class PyDirectInputBackend(InputBackend):
+    """DirectInput keys and clicks (works in games).
+
+    pydirectinput cannot tween the cursor or type arbitrary symbols, so
+    timed moves and typing go through pyautogui, as they always have.
+    pause overrides the libraries' per-call pause (0.1 s by default).
+    """
+
+    name = 'pydirectinput'
+
+    def __init__(self, pause=None):
+        import pydirectinput
+        import pyautogui
+        self.pdi = pydirectinput
+        self.pag = pyautogui
+        self.clipboard = _clipboard()
+        self.can_paste = self.clipboard is not None
+        if pause is not None:
+            pydirectinput.PAUSE = pause
+            pyautogui.PAUSE = pause
+
+    def key_down(self, key):
+        self.pdi.keyDown(key)
+
+    def key_up(self, key):
+        self.pdi.keyUp(key)
+
+    def key_press(self, key):
+        self.pdi.press(key)
+
+    def mouse_move(self, x, y, duration=0.0):
+        if duration > 0:
+            self.pag.moveTo(x, y, duration=duration)
+        else:
+            self.pdi.moveTo(x, y)
+
+    def mouse_down(self, button='left'):
+        self.pdi.mouseDown(button=button)
+
+    def mouse_up(self, button='left'):
+        self.pdi.mouseUp(button=button)
+
+    def click(self, button='left'):
+        self.pdi.click(button=button)
+
+    def write(self, text, interval=0.0):
+        self.pag.write(text, interval=interval)
+
+    def paste(self, text):
+        self.clipboard.copy(text)
+        self.pdi.keyDown(PASTE_MODIFIER)
+        self.pdi.press('v')
+        self.pdi.keyUp(PASTE_MODIFIER)
+
+    def position(self):
+        return tuple(self.pag.position())
+
+
+class PyAutoGUIBackend(InputBackend):
+    """Cross-platform input through pyautogui."""
+
+    name = 'pyautogui'
+
+    def __init__(self, pause=None):
+        import pyautogui
+        self.pag = pyautogui
+        self.clipboard = _clipboard()
+        self.can_paste = self.clipboard is not None
+        if pause is not None:
+            pyautogui.PAUSE = pause
+
+    def key_down(self, key):
+        self.pag.keyDown(key)
+
+    def key_up(self, key):
+        self.pag.keyUp(key)
+
+    def key_press(self, key):
+        self.pag.press(key)
+
+    def mouse_move(self, x, y, duration=0.0):
+        self.pag.moveTo(x, y, duration=duration)
+
+    def mouse_down(self, button='left'):
+        self.pag.mouseDown(button=button)
+
+    def mouse_up(self, button='left'):
+        self.pag.mouseUp(button=button)
+
+    def click(self, button='left'):
+        self.pag.click(button=button)
+
+    def write(self, text, interval=0.0):
+        self.pag.write(text, interval=interval)
+
+    def paste(self, text):
+        self.clipboard.copy(text)
+        self.pag.hotkey(PASTE_MODIFIER, 'v')
+
+    def position(self):
+        return tuple(self.pag.position())
+
+
+PYNPUT_KEY_NAMES = {
+    'pageup': 'page_up', 'pagedown': 'page_down',
+    'capslock': 'caps_lock', 'numlock': 'num_lock', 'scrolllock': 'scroll_lock',
+    'printscreen': 'print_screen', 'prntscrn': 'print_screen', 'prtsc': 'print_screen',
+    'win': 'cmd', 'command': 'cmd',
+}
+
+PYNPUT_MOVE_STEP = 0.01
+
+
+class PynputBackend(InputBackend):
+    """Input through pynput controllers. Has no per-call pause."""
+
+    name = 'pynput'
+    unicode_typing = True
+
+    def __init__(self, pause=None):
+        from pynput import keyboard, mouse
+        self.keyboard = keyboard.Controller()
+        self.mouse = mouse.Controller()
+        self.Key = keyboard.Key
+        self.Button = mouse.Button
+        self.pause = pause or 0.0
+        self.clipboard = _clipboard()
+        self.can_paste = self.clipboard is not None
+
+    def _key(self, key):
+        if len(key) == 1:
+            return key
+        name = key.lower()
+        return getattr(self.Key, PYNPUT_KEY_NAMES.get(name, name))
+
+    def _after(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def key_down(self, key):
+        self.keyboard.press(self._key(key))
+        self._after()
+
+    def key_up(self, key):
+        self.keyboard.release(self._key(key))
+        self._after()
+
+    def mouse_move(self, x, y, duration=0.0):
+        if duration > 0:
+            x0, y0 = self.mouse.position
+            steps = max(1, int(duration / PYNPUT_MOVE_STEP))
+            for i in range(1, steps):
+                self.mouse.position = (x0 + (x - x0) * i / steps, y0 + (y - y0) * i / steps)
+                time.sleep(duration / steps)
+        self.mouse.position = (x, y)
+        self._after()
+
+    def mouse_down(self, button='left'):
+        self.mouse.press(getattr(self.Button, button))
+        self._after()
+
+    def mouse_up(self, button='left'):
+        self.mouse.release(getattr(self.Button, button))
+        self._after()
+
+    def click(self, button='left'):
+        self.mouse.click(getattr(self.Button, button))
+        self._after()
+
+    def write(self, text, interval=0.0):
+        if interval <= 0:
+            self.keyboard.type(text)
+        else:
+            for ch in text:
+                self.keyboard.type(ch)
+                time.sleep(interval)
+        self._after()
+
+    def paste(self, text):
+        self.clipboard.copy(text)
+        with self.keyboard.pressed(self._key(PASTE_MODIFIER)):
+            self.keyboard.tap('v')
+        self._after()
+
+    def position(self):
+        x, y = self.mouse.position
+        return int(x), int(y)
+
+
+RecordedEvent = namedtuple('RecordedEvent', ['time', 'kind', 'args'])
+
+
+class RecordingBackend(InputBackend):
+    """Records every call in memory with a time.perf_counter() timestamp.
+
+    Nothing reaches the real devices. Moves and typing with a duration or
+    interval are recorded as a single event and return immediately unless
+    simulate_time is set.
+    """
+
+    name = 'recording'
+    can_paste = True
+    unicode_typing = True
+
+    def __init__(self, pause=None, simulate_time=False):
+        self.pause = pause or 0.0
+        self.simulate_time = simulate_time
+        self.events = []
+        self.cursor = (0, 0)
+
+    def _record(self, kind, *args):
+        self.events.append(RecordedEvent(time.perf_counter(), kind, args))
+        if self.pause:
+            time.sleep(self.pause)
+
+    def key_down(self, key):
+        self._record('key_down', key)
+
+    def key_up(self, key):
+        self._record('key_up', key)
+
+    def key_press(self, key):
+        self._record('key_press', key)
+
+    def mouse_move(self, x, y, duration=0.0):
+        if self.simulate_time and duration > 0:
+            time.sleep(duration)
+        self.cursor = (x, y)
+        self._record('mouse_move', x, y)
+
+    def mouse_down(self, button='left'):
+        self._record('mouse_down', button)
+
+    def mouse_up(self, button='left'):
+        self._record('mouse_up', button)
+
+    def click(self, button='left'):
+        self._record('click', button)
+
+    def write(self, text, interval=0.0):
+        if self.simulate_time and interval > 0:
+            time.sleep(interval * len(text))
+        self._record('write', text)
+
+    def paste(self, text):
+        self._record('paste', text)
+
+    def position(self):
+        return self.cursor
+
+    def clear(self):
+        self.events.clear()
+
+    def summary(self, kind=None):
+        """Throughput and inter-event timing of the recorded events (of one kind).
+
+        Returns a dict with event count, elapsed seconds, events per second
+        and the mean, standard deviation and min/max of the intervals.
+        """
+        times = [e.time for e in self.events if kind is None or e.kind == kind]
+        return interval_stats(times)
+
+
+class NullBackend(InputBackend):
+    """Discards all input; only the cursor position is kept. For benchmarks."""
+
+    name = 'null'
+    can_paste = True
+    unicode_typing = True
+
+    def __init__(self, pause=None):
+        self.cursor = (0, 0)
+
+    def key_down(self, key):
+        pass
+
+    def key_up(self, key):
+        pass
+
+    def key_press(self, key):
+        pass
+
+    def mouse_move(self, x, y, duration=0.0):
+        self.cursor = (x, y)
+
+    def mouse_down(self, button='left'):
+        pass
+
+    def mouse_up(self, button='left'):
+        pass
+
+    def click(self, button='left'):
+        pass
+
+    def write(self, text, interval=0.0):
+        pass
+
+    def paste(self, text):
+        pass
+
+    def position(self):
+        return self.cursor
+
+
+def interval_stats(times):
+    """Summarize a sorted list of timestamps (seconds)."""
+    count = len(times)
+    elapsed = times[-1] - times[0] if count > 1 else 0.0
+    intervals = [b - a for a, b in zip(times, times[1:])]
+    stats = {'events': count, 'elapsed': elapsed,
+             'events_per_second': (count - 1) / elapsed if elapsed > 0 else 0.0,
+             'interval_mean': 0.0, 'interval_stdev': 0.0,
+             'interval_min': 0.0, 'interval_max': 0.0}
+    if intervals:
+        mean = sum(intervals) / len(intervals)
+        stats.update(interval_mean=mean,
+                     interval_stdev=math.sqrt(sum((i - mean) ** 2 for i in intervals) / len(intervals)),
+                     interval_min=min(intervals), interval_max=max(intervals))
+    return stats
+
+
+BACKENDS = {
+    PyDirectInputBackend.name: PyDirectInputBackend,
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    PynputBackend.name: PynputBackend,
+    RecordingBackend.name: RecordingBackend,
+    NullBackend.name: NullBackend,
+}
+
+
+def create_backend(name=DEFAULT_BACKEND, **kwargs):
+    """Create a backend by name. Raises ValueError for unknown names."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown input backend '{name}' (choose from {', '.join(BACKENDS)}).")
+    return cls(**kwargs)
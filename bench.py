@@ -0,0 +1,288 @@
+"""Benchmarks for the execution engine, with regression thresholds.
+
+    python -m bench [--rows N] [--repeat N] [--json PATH]
+                    [--thresholds bench_thresholds.json] [--write-thresholds]
+
+Everything runs against the null input backend and synthetic screens, so
+no device is touched and no display is needed. Each benchmark runs
+--repeat times and the best result is kept, which makes the figures
+steadier than a single run:
+
+- steps_per_second: a synthetic program (keys, clicks, moves, typing and
+  jumps) with no delays, run by the precise scheduler; the engine's hot path.
+- traced_steps_per_second: the same with every event traced to a file.
+- stream_steps_per_second: the same rows played from a .skm macro file.
+- demo_steps_per_second: demo_config.json with its delays and holds zeroed
+  and its waitcolor rows satisfied by a synthetic screen.
+- jitter_*_ms: how late the scheduler reaches 2 ms delays.
+- poll_per_second / region_poll_per_second: waitcolor and waitregion
+  captures per second against a synthetic screen that never matches.
+- load_seconds / skm_load_seconds: loading and compiling N rows from JSON,
+  and validating them from a .skm file.
+- bytes_per_row: memory held by a compiled program, per row.
+- gui_import_seconds: importing main.py in a fresh interpreter, the part of
+  GUI startup that does not need a display (skipped if the GUI's
+  dependencies are missing).
+
+With a thresholds file, every metric listed there is checked against its
+'min' or 'max' and the exit status is 1 if any is outside. The shipped file
+has generous limits; --write-thresholds replaces it with limits derived
+from the current machine (half the measured throughput, twice the measured
+times).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from backends import NullBackend
+from engine import Engine, RESULT_COMPLETED
+from macrofile import write_macro
+from program import compile_rows, load_config, StreamedProgram, OP_WAITCOLOR
+from scheduler import Scheduler
+from screen import PixelSampler, SyntheticSource, color_matches
+from tracelog import Tracer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEMO_CONFIG = os.path.join(HERE, 'demo_config.json')
+DEFAULT_THRESHOLDS = os.path.join(HERE, 'bench_thresholds.json')
+DEFAULT_ROWS = 10000
+DEFAULT_REPEAT = 3
+POLL_SECONDS = 0.3
+JITTER_ROWS = 200
+JITTER_DELAY = 0.002
+
+# Metrics where a larger value is better; for all others smaller is better.
+HIGHER_IS_BETTER = {'steps_per_second', 'traced_steps_per_second', 'stream_steps_per_second',
+                    'demo_steps_per_second', 'poll_per_second', 'region_poll_per_second'}
+
+_PATTERN = ('a', 'space', '+shift', 'b', '-shift', 'click', 'moveto(100,200,0)',
+            'moveto(+5,-5,0)', 'type(ok)', 'f5')
+
+
+def synthetic_rows(count):
+    """count rows cycling through common actions; every 50th row jumps back once."""
+    rows = []
+    for i in range(count):
+        row = {'key': _PATTERN[i % len(_PATTERN)], 'sleep': '0.0', 'hold': '0.0',
+               'jump': '0', 'jumpcount': '0'}
+        if i % 50 == 49:
+            row['jump'] = str(i - 8)     # 0-based index of the row 8 back
+            row['jumpcount'] = '1'
+        rows.append(row)
+    return rows
+
+
+def _engine(program, sampler=None, tracer=None):
+    return Engine(program, repetitions=1, mouse_speed=0.0, type_interval=0.0,
+                  backend=NullBackend(), timer=Scheduler(), sampler=sampler, tracer=tracer)
+
+
+def _steps_per_second(engine):
+    started = time.perf_counter()
+    result = engine.run()
+    elapsed = time.perf_counter() - started
+    if result != RESULT_COMPLETED:
+        raise RuntimeError(f"benchmark program ended with '{result}'")
+    return engine.progress.steps / elapsed
+
+
+def bench_steps(rows):
+    program = compile_rows(rows)
+    return {'steps_per_second': _steps_per_second(_engine(program))}
+
+
+def bench_traced(rows, directory):
+    program = compile_rows(rows)
+    tracer = Tracer(os.path.join(directory, 'bench-trace.jsonl'))
+    try:
+        return {'traced_steps_per_second': _steps_per_second(_engine(program, tracer=tracer))}
+    finally:
+        tracer.close()
+
+
+def bench_stream(rows, directory):
+    path = os.path.join(directory, 'bench.skm')
+    # Streamed programs cannot jump.
+    write_macro(path, {'title': 'bench'}, [dict(row, jump='0', jumpcount='0') for row in rows])
+    return {'stream_steps_per_second': _steps_per_second(_engine(StreamedProgram(path)))}
+
+
+def bench_demo():
+    config = load_config(DEMO_CONFIG)
+    rows = [dict(row, sleep='0.0', hold='0.0') for row in config['rows']] * 50
+    program = compile_rows(rows)
+    colors = {ins.args[3:5]: ins.args[:3] for ins in program if ins.op == OP_WAITCOLOR}
+    source = SyntheticSource(lambda x, y: colors.get((x, y), (0, 0, 0)))
+    engine = _engine(program, PixelSampler(source=source, interval=0.0))
+    return {'demo_steps_per_second': _steps_per_second(engine)}
+
+
+def bench_jitter():
+    rows = [{'key': 'a', 'sleep': str(JITTER_DELAY), 'hold': '0.0'}] * JITTER_ROWS
+    engine = _engine(compile_rows(rows))
+    engine.run()
+    stats = engine.timer.stats()
+    return {'jitter_mean_ms': stats['late_mean'] * 1000,
+            'jitter_stdev_ms': stats['late_stdev'] * 1000,
+            'jitter_max_ms': stats['late_max'] * 1000}
+
+
+def _polls_per_second(sampler, bbox, predicate):
+    sampler.wait(bbox, predicate, POLL_SECONDS, interval=0.0)
+    return sampler.last_polls / sampler.last_wait
+
+
+def bench_polls():
+    sampler = PixelSampler(source=SyntheticSource(lambda x, y: (0, 0, 0)), interval=0.0)
+    results = {'poll_per_second': _polls_per_second(
+        sampler, (50, 50, 51, 51), lambda frame: color_matches(frame.pixel(50, 50), (255, 0, 0)))}
+    try:
+        import numpy as np
+    except ImportError:
+        return results
+    from conditions import region_condition
+    condition = region_condition((0, 0, 200, 200, 255, 0, 0))
+    sampler = PixelSampler(source=SyntheticSource(np.zeros((400, 400, 3), dtype=np.uint8)), interval=0.0)
+    results['region_poll_per_second'] = _polls_per_second(sampler, condition.bbox, condition.matches)
+    return results
+
+
+def bench_load(rows, directory):
+    path = os.path.join(directory, 'bench.json')
+    with open(path, 'w') as f:
+        json.dump({'title': 'bench', 'rows': rows}, f)
+    started = time.perf_counter()
+    compile_rows(load_config(path)['rows'])
+    load_seconds = time.perf_counter() - started
+
+    skm = os.path.join(directory, 'bench_load.skm')
+    write_macro(skm, {'title': 'bench'}, [dict(row, jump='0', jumpcount='0') for row in rows])
+    started = time.perf_counter()
+    StreamedProgram(skm).validate()
+    return {'load_seconds': load_seconds, 'skm_load_seconds': time.perf_counter() - started}
+
+
+def bench_memory(rows):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        program = compile_rows(rows)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {'bytes_per_row': (after - before) / len(program)}
+
+
+def bench_gui_import():
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {}
+    return {'gui_import_seconds': float(result.stdout.split()[-1])}
+
+
+def _better(name, a, b):
+    if a is None:
+        return b
+    return max(a, b) if name in HIGHER_IS_BETTER else min(a, b)
+
+
+def run_all(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT, report=print):
+    """Run every benchmark repeat times; returns {metric: best value}."""
+    rows = synthetic_rows(rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        benchmarks = [
+            ('engine', lambda: bench_steps(rows)),
+            ('trace', lambda: bench_traced(rows, directory)),
+            ('stream', lambda: bench_stream(rows, directory)),
+            ('demo', bench_demo),
+            ('jitter', bench_jitter),
+            ('polls', bench_polls),
+            ('load', lambda: bench_load(rows, directory)),
+            ('memory', lambda: bench_memory(rows)),
+            ('gui import', bench_gui_import),
+        ]
+        for title, benchmark in benchmarks:
+            for _ in range(repeat):
+                for name, value in benchmark().items():
+                    results[name] = _better(name, results.get(name), value)
+            report(f"  {title} done")
+    return results
+
+
+def check(results, thresholds):
+    """The (metric, value, limit description) of every threshold not met."""
+    failures = []
+    for name, limit in thresholds.items():
+        value = results.get(name)
+        if value is None:
+            continue
+        if 'min' in limit and value < limit['min']:
+            failures.append((name, value, f"min {limit['min']:g}"))
+        if 'max' in limit and value > limit['max']:
+            failures.append((name, value, f"max {limit['max']:g}"))
+    return failures
+
+
+def derive_thresholds(results):
+    """Limits with room for noise: half of each throughput, twice each time or size."""
+    thresholds = {}
+    for name, value in sorted(results.items()):
+        if name == 'jitter_max_ms':
+            continue    # one preempted wait decides it; too noisy to gate on
+        if name in HIGHER_IS_BETTER:
+            thresholds[name] = {'min': round(value * 0.5, 3)}
+        else:
+            thresholds[name] = {'max': round(max(value, 0.05 if name.startswith('jitter') else 0.0) * 2, 6)}
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench", description="Benchmark the execution engine.")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS,
+                        help="rows in the synthetic programs (default %(default)s)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="runs per benchmark; the best is kept (default %(default)s)")
+    parser.add_argument('--json', metavar='PATH', help="also write the results to PATH")
+    parser.add_argument('--thresholds', metavar='PATH', default=DEFAULT_THRESHOLDS,
+                        help="regression limits to check (default %(default)s)")
+    parser.add_argument('--write-thresholds', action='store_true',
+                        help="replace the thresholds file with limits derived from this run")
+    args = parser.parse_args(argv)
+    if args.rows < 50 or args.repeat < 1:
+        parser.error("--rows must be at least 50 and --repeat at least 1")
+
+    print(f"Running benchmarks ({args.rows} rows, best of {args.repeat})...")
+    results = run_all(args.rows, args.repeat)
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"{name:<{width}}  {value:,.3f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.write_thresholds:
+        with open(args.thresholds, 'w') as f:
+            json.dump(derive_thresholds(results), f, indent=4)
+        print(f"Thresholds written to {args.thresholds}")
+        return 0
+    if not os.path.exists(args.thresholds):
+        return 0
+    with open(args.thresholds, 'r') as f:
+        thresholds = json.load(f)
+    failures = check(results, thresholds)
+    for name, value, limit in failures:
+        print(f"REGRESSION {name}: {value:,.3f} ({limit})", file=sys.stderr)
+    if not failures:
+        print(f"All {len(thresholds)} thresholds met.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
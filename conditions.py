@@ -0,0 +1,62 @@
+"""Screen conditions evaluated over a whole capture with NumPy.
+
+Each condition knows the bounding box it needs (bbox) and tests a Frame of
+that box in one vectorized pass (matches), so PixelSampler.wait makes one
+capture per poll however many pixels are involved.
+"""
+import numpy as np
+
+from screen import COLOR_MATCH_TOLERANCE, bounding_box
+
+
+class RegionCondition:
+    """At least fraction of the pixels in a rectangle are within tolerance of a color.
+
+    The corners (x1, y1) and (x2, y2) are both inside the region.
+    """
+
+    def __init__(self, x1, y1, x2, y2, rgb, tolerance=COLOR_MATCH_TOLERANCE, fraction=1.0):
+        left, right = sorted((x1, x2))
+        top, bottom = sorted((y1, y2))
+        self.bbox = (left, top, right + 1, bottom + 1)
+        self.rgb = np.array(rgb, dtype=np.int16)
+        self.tolerance = tolerance
+        self.needed = fraction * (right - left + 1) * (bottom - top + 1)
+
+    def matches(self, frame):
+        diff = np.abs(frame.to_array().astype(np.int16) - self.rgb)
+        hits = np.count_nonzero((diff <= self.tolerance).all(axis=2))
+        return hits >= self.needed
+
+
+class PointsCondition:
+    """All (or any) of several points match their own color."""
+
+    def __init__(self, points, colors, require_all=True, tolerance=COLOR_MATCH_TOLERANCE):
+        self.bbox = bounding_box(points)
+        left, top = self.bbox[0], self.bbox[1]
+        self.xs = np.array([x - left for x, _ in points])
+        self.ys = np.array([y - top for _, y in points])
+        self.colors = np.array(colors, dtype=np.int16)
+        self.require_all = require_all
+        self.tolerance = tolerance
+
+    def matches(self, frame):
+        pixels = frame.to_array()[self.ys, self.xs].astype(np.int16)
+        ok = (np.abs(pixels - self.colors) <= self.tolerance).all(axis=1)
+        return bool(ok.all() if self.require_all else ok.any())
+
+
+def region_condition(args):
+    """Build a RegionCondition from waitregion's (x1, y1, x2, y2, r, g, b[, tol[, fraction]])."""
+    x1, y1, x2, y2, r, g, b = args[:7]
+    tolerance = args[7] if len(args) > 7 else COLOR_MATCH_TOLERANCE
+    fraction = args[8] if len(args) > 8 else 1.0
+    return RegionCondition(x1, y1, x2, y2, (r, g, b), tolerance, fraction)
+
+
+def points_condition(args, require_all):
+    """Build a PointsCondition from waitall/waitany's repeated (r, g, b, x, y) groups."""
+    groups = [args[i:i+5] for i in range(0, len(args), 5)]
+    return PointsCondition([(x, y) for _, _, _, x, y in groups],
+                           [(r, g, b) for r, g, b, _, _ in groups], require_all)
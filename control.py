@@ -0,0 +1,346 @@
+"""Local control server.
+
+Lets another process drive the programs of the GUI or the headless runner
+over HTTP on localhost (or a Unix socket), instead of pressing hotkeys:
+
+    GET  /programs                  every program and its run state
+    GET  /programs/NAME             one program
+    POST /programs/NAME/start       start it (202: the start is queued)
+    POST /programs/NAME/stop        stop it
+    GET  /programs/NAME/profile     its last profile (runs must be profiled;
+                                    409 until the run has finished)
+    GET  /progress[?interval=S]     server-sent events with the state of every
+                                    program, sent whenever it changes
+
+    curl -H "Authorization: Bearer $TOKEN" -X POST http://127.0.0.1:8765/programs/Farm/start
+    curl -H "Authorization: Bearer $TOKEN" -N http://127.0.0.1:8765/progress
+
+Every request must carry the server's token, a random string made for each
+server (or passed in), as 'Authorization: Bearer TOKEN'. With token_path the
+server writes it to that file, readable only by the user, while it runs.
+Requests with an Origin header come from a web page and are refused, and
+so are requests over TCP whose Host is not the local machine, which keeps
+pages using DNS rebinding out as well.
+
+The server runs an asyncio loop in its own daemon thread, so any number
+of clients are served without a thread each. Requests only read engine
+state that the engines publish for polling (Progress, and a Profiler once
+its run has finished) and call the controller's start_program/stop_program,
+which must return without waiting on the Tk thread. Every response is JSON and closes the connection.
+
+A controller provides:
+
+    program_names()         the names that can be started
+    latest_engine(name)     the Engine of the name's latest run, or None
+    start_program(name)     start a run; KeyError if unknown, ValueError if it cannot start
+    stop_program(name)      stop the run; KeyError if unknown
+"""
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import threading
+from urllib.parse import unquote, urlsplit, parse_qs
+
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+STREAM_INTERVAL = 0.1       # seconds between progress checks for /progress
+MIN_STREAM_INTERVAL = 0.02
+HEARTBEAT = 15.0            # seconds without a change before /progress sends a comment
+MAX_HEADER_LINES = 100
+MAX_BODY = 1024             # bytes; no endpoint takes a body, so larger ones are refused unread
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '[::1]')
+TOKEN_ENV = 'SIMPLEKEYCLICKER_TOKEN_FILE'
+TOKEN_FILE = 'SimpleKeyClicker-control.token'
+
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 401: 'Unauthorized',
+            403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict',
+            413: 'Content Too Large', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def default_token_path():
+    """Where the GUI and headless runner write the token: SIMPLEKEYCLICKER_TOKEN_FILE, or the home directory."""
+    return os.environ.get(TOKEN_ENV) or os.path.join(os.path.expanduser('~'), TOKEN_FILE)
+
+
+def parse_address(text):
+    """(host, port, path) from a port number, 'host:port' or a Unix socket path."""
+    text = str(text).strip()
+    if text.isdigit():
+        return HOST, int(text), None
+    host, sep, port = text.rpartition(':')
+    if sep and port.isdigit() and '/' not in text:
+        return host or HOST, int(port), None
+    return None, None, text
+
+
+def program_status(name, engine):
+    """The JSON state of one program."""
+    status = {'name': name, 'running': bool(engine is not None and engine.running)}
+    if engine is not None:
+        status['progress'] = engine.progress.snapshot()
+        status['failed'] = engine.failed
+        status['stop_latency'] = engine.stop_latency
+        status['profiled'] = engine.profiler is not None
+    return status
+
+
+class ControlServer:
+    """Serves a controller's programs; start() and stop() may be called from any thread.
+
+    port 0 picks a free port (see the port attribute once started); with
+    path, a Unix socket is used instead of TCP. Without a token a new one
+    is made; with token_path it is written there while the server runs.
+    """
+
+    def __init__(self, controller, host=HOST, port=DEFAULT_PORT, path=None,
+                 stream_interval=STREAM_INTERVAL, token=None, token_path=None):
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.path = path
+        self.stream_interval = stream_interval
+        self.token = token or secrets.token_urlsafe(24)
+        self.token_path = token_path
+        self.requests = 0
+        self.clients = 0
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._tasks = set()
+        self._started = threading.Event()
+        self._error = None
+
+    @property
+    def address(self):
+        if self.path is not None:
+            return f"unix:{self.path}"
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Start serving in a daemon thread; raises OSError if the address cannot be bound."""
+        self._started.clear()
+        self._error = None
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()),
+                                        daemon=True, name="control server")
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+        if self.token_path is not None:
+            try:
+                self._write_token()
+            except OSError:
+                self.stop()
+                raise
+
+    def _write_token(self):
+        if os.path.exists(self.token_path):
+            os.remove(self.token_path)      # a new file gets the permissions below
+        fd = os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.token + '\n')
+
+    def stop(self, timeout=2.0):
+        """Close the server and every open connection."""
+        if self._thread is None:
+            return
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass    # the loop has already finished
+        self._thread.join(timeout)
+        self._thread = None
+        if self.token_path is not None:
+            try:
+                os.remove(self.token_path)
+            except OSError:
+                pass
+
+    def join(self, timeout=None):
+        """Wait until the server stops; returns False if it is still running after timeout."""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            if self.path is not None:
+                server = await asyncio.start_unix_server(self._connection, path=self.path)
+            else:
+                server = await asyncio.start_server(self._connection, self.host, self.port)
+                self.port = server.sockets[0].getsockname()[1]
+        except (OSError, NotImplementedError, AttributeError) as e:
+            self._error = e if isinstance(e, OSError) else OSError(f"Unix sockets are not supported here: {e}")
+            self._started.set()
+            return
+        self._started.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await server.wait_closed()
+
+    async def _connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self.clients += 1
+        try:
+            await self._request(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        except asyncio.CancelledError:
+            pass    # the server is stopping; ending quietly keeps asyncio from logging it
+        finally:
+            self.clients -= 1
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _request(self, reader, writer):
+        line = await reader.readline()
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            await self._respond(writer, 400, {'error': "malformed request line"})
+            return
+        method, target, _ = parts
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        self.requests += 1
+        length = headers.get('content-length', '0')
+        try:
+            # Before reading the body, so clients without the token cannot make us read anything.
+            self._check_access(headers)
+            if not length.isdigit():
+                raise HttpError(400, "invalid Content-Length")
+            if int(length) > MAX_BODY:
+                raise HttpError(413, f"request bodies are limited to {MAX_BODY} bytes")
+        except HttpError as e:
+            await self._respond(writer, e.status, {'error': str(e)})
+            return
+        if int(length):
+            await reader.readexactly(int(length))   # no endpoint takes a body
+        url = urlsplit(target)
+        segments = [unquote(segment) for segment in url.path.strip('/').split('/') if segment]
+        query = parse_qs(url.query)
+        try:
+            if segments == ['progress']:
+                if method != 'GET':
+                    raise HttpError(405, "use GET")
+                await self._stream(writer, query)
+                return
+            status, body = self._route(method, segments)
+        except HttpError as e:
+            status, body = e.status, {'error': str(e)}
+        except Exception as e:
+            status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+        await self._respond(writer, status, body)
+
+    def _check_access(self, headers):
+        """Raise HttpError unless the request comes from a local client that knows the token."""
+        if 'origin' in headers:
+            raise HttpError(403, "requests from web pages are not accepted")
+        if self.path is None:
+            host = headers.get('host', '')
+            name, sep, port = host.rpartition(':')
+            if not (sep and port.isdigit()):
+                name = host
+            if name.lower() not in LOCAL_HOSTS + (self.host,):
+                raise HttpError(403, f"host '{host}' is not this machine")
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            raise HttpError(401, "missing or wrong token; send 'Authorization: Bearer TOKEN'")
+
+    def _route(self, method, segments):
+        """(status, body) for everything but /progress."""
+        controller = self.controller
+        if not segments or segments[0] != 'programs' or len(segments) > 3:
+            raise HttpError(404, "unknown endpoint")
+        if len(segments) == 1:
+            if method != 'GET':
+                raise HttpError(405, "use GET")
+            return 200, {'programs': self._statuses()}
+        name = segments[1]
+        if name not in controller.program_names():
+            raise HttpError(404, f"no program named '{name}'")
+        action = segments[2] if len(segments) == 3 else None
+        if action is None or action == 'profile':
+            if method != 'GET':
+                raise HttpError(405, "use GET")
+            engine = controller.latest_engine(name)
+            if action is None:
+                return 200, program_status(name, engine)
+            if engine is None or engine.profiler is None:
+                raise HttpError(404, f"no profile for '{name}'; enable profiling and run it first")
+            if engine.profiler.finished is None:
+                # The engine thread is still adding to it.
+                raise HttpError(409, f"'{name}' is still running; its profile is ready when the run ends")
+            return 200, engine.profiler.to_dict()
+        if method != 'POST':
+            raise HttpError(405, "use POST")
+        try:
+            if action == 'start':
+                controller.start_program(name)
+                return 202, {'started': name}
+            if action == 'stop':
+                controller.stop_program(name)
+                return 200, {'stopped': name}
+        except KeyError:
+            raise HttpError(404, f"no program named '{name}'")
+        except ValueError as e:
+            raise HttpError(409, str(e))
+        raise HttpError(404, "unknown endpoint")
+
+    def _statuses(self):
+        controller = self.controller
+        return [program_status(name, controller.latest_engine(name)) for name in controller.program_names()]
+
+    async def _stream(self, writer, query):
+        """Send the programs' state as server-sent events until the client goes away."""
+        try:
+            interval = max(MIN_STREAM_INTERVAL, float(query.get('interval', [self.stream_interval])[0]))
+        except ValueError:
+            raise HttpError(400, "interval must be a number of seconds")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        last = None
+        quiet = 0.0
+        while True:
+            data = json.dumps({'programs': self._statuses()})
+            if data != last:
+                writer.write(f"data: {data}\n\n".encode())
+                last = data
+                quiet = 0.0
+            elif quiet >= HEARTBEAT:
+                writer.write(b": keep-alive\n\n")
+                quiet = 0.0
+            await writer.drain()
+            await asyncio.sleep(interval)
+            quiet += interval
+
+    async def _respond(self, writer, status, body):
+        data = json.dumps(body, default=str).encode()
+        writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + data)
+        await writer.drain()
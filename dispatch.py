@@ -0,0 +1,157 @@
+"""One ordered input queue shared by engines that run at the same time.
+
+Every running tab gets a DispatchClient, which is an InputBackend. Each
+call waits for its turn in a single priority queue (higher priority first,
+then first come, first served) and is then performed on the caller's own
+thread while no other client can send input. atomic() keeps the turn for a
+whole group of calls, such as a key hold's down, wait and up, so other tabs'
+events cannot land in between. The dispatcher records each client's queue
+depth and waiting time.
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from backends import InputBackend
+
+
+class ClientStats:
+    """Queueing figures for one client."""
+
+    __slots__ = ('calls', 'waited', 'max_wait', 'max_depth')
+
+    def __init__(self):
+        self.calls = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+        self.max_depth = 0
+
+    def to_dict(self):
+        return {'calls': self.calls,
+                'wait_mean': self.waited / self.calls if self.calls else 0.0,
+                'wait_max': self.max_wait,
+                'max_depth': self.max_depth}
+
+
+class InputDispatcher:
+    """Serializes input from several clients onto one backend."""
+
+    def __init__(self, backend, clock=time.perf_counter):
+        self.backend = backend
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._queue = []
+        self._order = itertools.count()
+        self._owner = None
+        self._held = 0
+        self._stats = {}
+
+    def client(self, name, priority=0):
+        """A backend for one engine. Higher priorities get their turn first."""
+        return DispatchClient(self, name, priority)
+
+    @property
+    def depth(self):
+        """Number of calls waiting for their turn."""
+        return len(self._queue)
+
+    def acquire(self, client):
+        """Wait for client's turn; nested acquires by the owner return at once."""
+        with self._cond:
+            if self._owner is client:
+                self._held += 1
+                return
+            stats = self._stats.get(client.name)
+            if stats is None:
+                stats = self._stats[client.name] = ClientStats()
+            entry = (-client.priority, next(self._order), client)
+            heapq.heappush(self._queue, entry)
+            stats.max_depth = max(stats.max_depth, len(self._queue))
+            started = self.clock()
+            while self._owner is not None or self._queue[0] is not entry:
+                self._cond.wait()
+            heapq.heappop(self._queue)
+            self._owner = client
+            self._held = 1
+            waited = self.clock() - started
+            stats.calls += 1
+            stats.waited += waited
+            stats.max_wait = max(stats.max_wait, waited)
+
+    def release(self, client):
+        with self._cond:
+            if self._owner is not client:
+                return
+            self._held -= 1
+            if self._held == 0:
+                self._owner = None
+                self._cond.notify_all()
+
+    def call(self, client, method, *args, **kwargs):
+        self.acquire(client)
+        try:
+            return getattr(self.backend, method)(*args, **kwargs)
+        finally:
+            self.release(client)
+
+    def stats(self):
+        """Per-client calls, mean and max wait (seconds) and the deepest queue seen."""
+        with self._cond:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+
+class DispatchClient(InputBackend):
+    """An engine's view of the shared backend."""
+
+    def __init__(self, dispatcher, name, priority=0):
+        self.dispatcher = dispatcher
+        self.name = name
+        self.priority = priority
+
+    @property
+    def can_paste(self):
+        return self.dispatcher.backend.can_paste
+
+    @property
+    def unicode_typing(self):
+        return self.dispatcher.backend.unicode_typing
+
+    @contextmanager
+    def atomic(self):
+        self.dispatcher.acquire(self)
+        try:
+            yield
+        finally:
+            self.dispatcher.release(self)
+
+    def key_down(self, key):
+        self.dispatcher.call(self, 'key_down', key)
+
+    def key_up(self, key):
+        self.dispatcher.call(self, 'key_up', key)
+
+    def key_press(self, key):
+        self.dispatcher.call(self, 'key_press', key)
+
+    def mouse_move(self, x, y, duration=0.0):
+        self.dispatcher.call(self, 'mouse_move', x, y, duration=duration)
+
+    def mouse_down(self, button='left'):
+        self.dispatcher.call(self, 'mouse_down', button)
+
+    def mouse_up(self, button='left'):
+        self.dispatcher.call(self, 'mouse_up', button)
+
+    def click(self, button='left'):
+        self.dispatcher.call(self, 'click', button)
+
+    def write(self, text, interval=0.0):
+        self.dispatcher.call(self, 'write', text, interval=interval)
+
+    def paste(self, text):
+        self.dispatcher.call(self, 'paste', text)
+
+    def position(self):
+        return self.dispatcher.call(self, 'position')
@@ -0,0 +1,572 @@
+"""GUI-free execution engine for compiled action programs.
+
+The Tk front end (main.py) and the headless runner (headless.py) both drive
+an Engine; neither the engine nor this module imports ttkbootstrap.
+
+A '>Name' row runs another program inline, on the same thread and timer:
+the engine looks it up in its chains mapping, runs it with that program's
+own repetitions and returns to the next row. A chain that leads back to a
+program already running stops the run instead of recursing.
+"""
+import threading
+import time
+
+from backends import create_backend
+from scheduler import SleepTimer
+from mousepath import MouseModel
+from screen import PixelSampler, color_matches
+from program import (ProgramError, OP_NOP, OP_KEY, OP_CLICK, OP_MOVETO, OP_WAITCOLOR, OP_TYPE,
+                     OP_CHAIN, OP_RESETMOUSE, OP_WAITREGION, OP_WAITPOINTS,
+                     OP_WAITIMAGE, OP_CLICKIMAGE, OP_IFCOLOR, OP_GOTO, OP_PASTE, DOWN, UP,
+                     STOP_ON_ERROR, ON_ERROR_STOP, ON_ERROR_SKIP, ON_ERROR_GOTO)
+from textinput import send_text, TYPE_INTERVAL
+from tracelog import (EVENT_RUN_START, EVENT_LOOP, EVENT_ROW_START, EVENT_ACTION_DONE, EVENT_ROW_END,
+                      EVENT_JUMP, EVENT_CHAIN_START, EVENT_CHAIN_END, EVENT_WAIT, EVENT_RETRY,
+                      EVENT_ERROR, EVENT_RUN_END)
+
+DEFAULT_MOUSE_SPEED = 20
+WAITCOLOR_TIMEOUT = 30
+
+RESULT_COMPLETED = 'completed'
+RESULT_STOPPED = 'stopped'
+RESULT_FAILED = 'failed'
+
+PHASE_IDLE = 0
+PHASE_ACTION = 1    # the row's action is being performed
+PHASE_DELAY = 2     # the row's action is done, its delay is running
+
+
+class Progress:
+    """The engine's latest position, for polling from another thread.
+
+    The engine only assigns attributes, so publishing never blocks or queues
+    anything; readers see the newest values and skip intermediate ones.
+    """
+
+    __slots__ = ('index', 'phase', 'loop', 'repetitions', 'steps', 'chain')
+
+    def __init__(self, repetitions=None):
+        self.chain = None    # name of the chained program index refers to, None for the main one
+        self.index = -1
+        self.phase = PHASE_IDLE
+        self.loop = 0
+        self.repetitions = repetitions
+        self.steps = 0
+
+    def snapshot(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class EngineListener:
+    """Engine callbacks. All of them are called from the engine's thread."""
+
+    def on_loop_start(self, loop_count, repetitions):
+        """A repetition starts. repetitions is None when running indefinitely."""
+
+    def on_row_start(self, index):
+        """The row at index is about to be performed."""
+
+    def on_row_done(self, index):
+        """The row's action finished; its delay is about to start."""
+
+    def on_row_end(self, index):
+        """The row's delay is over."""
+
+    def on_error(self, title, message):
+        """An action failed; the run stops after this returns."""
+
+    def on_row_error(self, index, title, message, action):
+        """An action failed and the error policy handles it; the run goes on.
+
+        action is 'retry N/M', 'skip' or 'goto'.
+        """
+
+    def on_finish(self, result):
+        """The run ended with one of the RESULT_* values."""
+
+
+class Engine:
+    """Runs a compiled program against an input backend (the real devices by default).
+
+    chains maps the names '>Name' rows refer to onto (program, repetitions)
+    pairs; name is the main program's own name, so chaining back to it is
+    reported as a cycle. type_interval is the default delay between typed
+    characters; a text row's hold time overrides it. mouse_speed is the
+    seconds per move, or a MouseModel. tracer, a tracelog.Tracer, records
+    the run as events. error_policy, a program.ErrorPolicy, says what a
+    failed action leads to in rows without an onerror(...) policy; by
+    default the run stops.
+    """
+
+    def __init__(self, program, repetitions=None, mouse_speed=1./DEFAULT_MOUSE_SPEED,
+                 safe_mode=False, listener=None, backend=None, timer=None, sampler=None,
+                 profiler=None, chains=None, name=None, type_interval=TYPE_INTERVAL, tracer=None,
+                 error_policy=None):
+        self.program = program
+        self.name = name
+        self.chains = chains if chains is not None else {}
+        self.profiler = profiler
+        self.tracer = tracer
+        self.error_policy = error_policy or STOP_ON_ERROR
+        self._error = None
+        self.backend = backend or create_backend()
+        if profiler is not None:
+            self.backend = profiler.wrap(self.backend)
+        self.timer = timer or SleepTimer()
+        self.sampler = sampler or PixelSampler()
+        self.repetitions = repetitions
+        self.mouse = mouse_speed if isinstance(mouse_speed, MouseModel) else MouseModel(seconds=mouse_speed)
+        self.type_interval = type_interval
+        self.safe_mode = safe_mode
+        self.listener = listener or EngineListener()
+        self.running = False
+        self.failed = False
+        self.stop_latency = None
+        self._stop_event = threading.Event()
+        self._stop_requested = None
+        self._held = {}
+        self.progress = Progress(repetitions)
+        self._conditions = {}
+        self._branch = -1
+        self._chain_stack = [name] if name is not None else []
+        self.thread = None
+        self.mouseposition = None
+
+    def start(self):
+        """Run in a daemon thread."""
+        self._arm()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Run in the calling thread. Returns one of the RESULT_* values."""
+        self._arm()
+        return self._run()
+
+    def _arm(self):
+        self._stop_event.clear()
+        self._stop_requested = None
+        self._branch = -1
+        self._error = None
+        self.stop_latency = None
+        self.running = True
+
+    def stop(self):
+        """Stop the run: delays, holds, mouse moves and screen waits end at once.
+
+        An input call already in progress (such as a chunk of typed text)
+        finishes first. Keys and buttons the run holds down are released
+        before it ends; stop_latency is then the time from this call until
+        the run was idle.
+        """
+        if self.running and self._stop_requested is None:
+            self._stop_requested = time.perf_counter()
+        self.running = False
+        self._stop_event.set()
+
+    def _run(self):
+        """Main automation loop with repetition control."""
+        self.failed = False
+        result = RESULT_STOPPED
+        loop_count = 0
+        tracer = self.tracer
+        try:
+            # Inside the try, so a backend or timer that fails here still ends the run.
+            self.mouseposition = self.backend.position()
+            self.timer.start(interrupt=self._stop_event)
+            if self.profiler is not None:
+                self.profiler.start()
+            if tracer is not None:
+                tracer.emit(EVENT_RUN_START, self.name, detail=self.repetitions)
+            while self.running:
+                if self.repetitions is not None and loop_count >= self.repetitions:
+                    result = RESULT_COMPLETED
+                    break
+                loop_count += 1
+                self.progress.loop = loop_count
+                if tracer is not None:
+                    tracer.emit(EVENT_LOOP, self.name, detail=loop_count)
+                self.listener.on_loop_start(loop_count, self.repetitions)
+                self._run_program(self.program)
+            if self.failed:
+                result = RESULT_FAILED
+        finally:
+            self.running = False
+            self._release_held()
+            self.progress.phase = PHASE_IDLE
+            if self._stop_requested is not None:
+                self.stop_latency = time.perf_counter() - self._stop_requested
+            self.timer.stop()
+            if self.profiler is not None:
+                self.profiler.finish(loop_count)
+            if tracer is not None:
+                tracer.emit(EVENT_RUN_END, self.name,
+                            detail={'result': result, 'stop_requested': self._stop_requested is not None})
+            self.listener.on_finish(result)
+        return result
+
+    def _run_program(self, program):
+        """Run one repetition of the program.
+
+        Every row with a jump has its own counter: the jump is taken
+        jumpcount times, then the row falls through once and the counter
+        starts over, so loops can be nested and re-entered.
+        """
+        if getattr(program, 'streamed', False):
+            self._run_stream(program)
+            return
+        # Chained programs are timed as part of their '>Name' row.
+        profiler = self.profiler if program is self.program else None
+        tracer = self.tracer
+        counters = [0] * len(program)
+        j = 0
+        while j < len(program):
+            if not self.running: return
+            ins = program[j]
+
+            next_j = j + 1
+            if ins.jump >= 0:
+                if counters[j] < ins.jumpcount:
+                    counters[j] += 1
+                    next_j = ins.jump
+                else:
+                    counters[j] = 0
+
+            if not self._step(j, ins, profiler):
+                return
+            if self._branch >= 0:
+                next_j = self._branch
+                self._branch = -1
+            if tracer is not None and next_j != j + 1:
+                tracer.emit(EVENT_JUMP, self.progress.chain or self.name, j, next_j + 1)
+            j = next_j
+
+    def _run_stream(self, program):
+        """Run one repetition of a streamed program, compiling rows as they are read."""
+        rows = iter(program)
+        try:
+            for j, ins in enumerate(rows):
+                if not self.running or not self._step(j, ins, None):
+                    return
+        except (ProgramError, OSError, ValueError) as e:
+            self._fail("Macro Error", f"{e}\nAutomation stopped.")
+        finally:
+            rows.close()
+
+    def _step(self, j, ins, profiler):
+        """Perform one row and its delay. Returns False when the run must stop."""
+        progress = self.progress
+        listener = self.listener
+        timer = self.timer
+        tracer = self.tracer
+        progress.index = j
+        progress.phase = PHASE_ACTION
+        if tracer is not None:
+            tracer.emit(EVENT_ROW_START, progress.chain or self.name, j, ins.source)
+        listener.on_row_start(j)
+        timer.begin_row()
+
+        if profiler is None:
+            ok = self._perform_action(ins)
+        else:
+            started = time.perf_counter()
+            ok = self._perform_action(ins)
+            profiler.record_action(j, time.perf_counter() - started)
+        if not ok and self._error is not None:
+            ok = self._recover(j, ins)
+        if not ok or not self.running:
+            self.running = False
+            return False
+
+        progress.phase = PHASE_DELAY
+        progress.steps += 1
+        if tracer is not None:
+            tracer.emit(EVENT_ACTION_DONE, progress.chain or self.name, j)
+        listener.on_row_done(j)
+        if profiler is None:
+            timer.wait(ins.delay)
+        else:
+            started = time.perf_counter()
+            timer.wait(ins.delay)
+            profiler.record_delay(j, ins.delay, time.perf_counter() - started)
+        if tracer is not None:
+            tracer.emit(EVENT_ROW_END, progress.chain or self.name, j)
+        listener.on_row_end(j)
+        return True
+
+    def _fail(self, title, message):
+        """Report a failed action and stop. Returns False."""
+        self.failed = True
+        if self.tracer is not None:
+            self.tracer.emit(EVENT_ERROR, self.progress.chain or self.name, self.progress.index,
+                             {'title': title, 'message': message, 'handled': ON_ERROR_STOP})
+        self.listener.on_error(title, message)
+        self.running = False
+        return False
+
+    def _action_failed(self, title, message):
+        """Note a failure the error policy decides about (see _recover). Returns False."""
+        self._error = (title, message)
+        return False
+
+    def _recover(self, j, ins):
+        """Apply the row's error policy, or the run's, to the failure in self._error.
+
+        Retries wait on the timer, so stopping the run ends them at once.
+        Returns True when the run goes on.
+        """
+        policy = ins.onerror or self.error_policy
+        tracer = self.tracer
+        program_name = self.progress.chain or self.name
+        delay = policy.backoff
+        for attempt in range(1, policy.retries + 1):
+            title, message = self._error
+            self._error = None
+            if tracer is not None:
+                tracer.emit(EVENT_RETRY, program_name, j, {'attempt': attempt, 'error': title, 'delay': delay})
+            self.listener.on_row_error(j, title, message, f"retry {attempt}/{policy.retries}")
+            self.timer.rebase()
+            self.timer.wait(delay)
+            if not self.running:
+                return False
+            if self._perform_action(ins):
+                return True
+            if self._error is None:
+                return False    # stopped, or failed in a way no policy covers
+            delay *= 2
+        title, message = self._error
+        self._error = None
+        if policy.retries:
+            message += f"\nTried {policy.retries + 1} times."
+        if policy.action == ON_ERROR_STOP:
+            return self._fail(title, f"{message}\nAutomation stopped.")
+        if tracer is not None:
+            tracer.emit(EVENT_ERROR, program_name, j, {'title': title, 'message': message, 'handled': policy.action})
+        self.listener.on_row_error(j, title, message, policy.action)
+        if policy.action == ON_ERROR_GOTO:
+            self._branch = policy.target
+        self.timer.rebase()
+        return True
+
+    def _glide(self, x, y, duration=None):
+        """Move the cursor to (x, y) along the mouse model's precomputed path."""
+        backend = self.backend
+        points, interval = self.mouse.plan(backend.position(), (x, y), duration)
+        if interval <= 0:
+            backend.mouse_move(x, y)
+            return
+        timer = self.timer
+        timer.rebase()
+        for px, py in points:
+            if not self.running:
+                return
+            timer.wait(interval)
+            backend.mouse_move(px, py)
+
+    def _press(self, press, down, up, name, mode, hold_time):
+        """Press, hold, or send only the down/up half of a key or button."""
+        held = self._held
+        if hold_time > 0:
+            with self.backend.atomic():
+                down(name)
+                held[up, name] = True
+                self.timer.wait(hold_time)
+                up(name)
+                held.pop((up, name), None)
+        elif mode == DOWN:
+            down(name)
+            held[up, name] = True
+        elif mode == UP:
+            up(name)
+            held.pop((up, name), None)
+        else:
+            press(name)
+
+    def _release_held(self):
+        """Release every key and button still held down by the run."""
+        held = self._held
+        while held:
+            (up, name), _ = held.popitem()
+            try:
+                up(name)
+            except Exception as e:
+                title, message = "Release Error", f"Could not release '{name}'.\nError: {e}"
+                if self.tracer is not None:
+                    self.tracer.emit(EVENT_ERROR, self.name, self.progress.index,
+                                     {'title': title, 'message': message, 'handled': ON_ERROR_SKIP})
+                self.listener.on_error(title, message)
+
+    def _perform_action(self, ins):
+        """Execute a compiled instruction. Returns True on success, False on handled failure."""
+        if not self.running: return False
+        op = ins.op
+
+        if op == OP_CHAIN:
+            return self._run_chain(ins.text)
+
+        backend = self.backend
+        if op == OP_RESETMOUSE:
+            with backend.atomic():
+                self._glide(*self.mouseposition)
+            self.timer.rebase()
+            return True
+
+        if op == OP_NOP and not ins.dangerous:
+            return True
+
+        if op == OP_GOTO:
+            self._branch = ins.branch
+            return True
+
+        if self.safe_mode and ins.dangerous:
+            return self._fail("Safe Mode Block", f"Action '{ins.source}' is blocked in safe mode.")
+
+        try:
+            if op == OP_CLICK:
+                button = ins.text
+                # Keep other engines' input out from between the move and the click.
+                with backend.atomic():
+                    if ins.args:
+                        x, y = ins.args
+                        if ins.relative:
+                            currentmouseposition = backend.position()
+                            x += currentmouseposition[0]
+                            y += currentmouseposition[1]
+                        backend.mouse_move(x, y)
+                        self.timer.wait(0.005)
+                    self._press(backend.click, backend.mouse_down, backend.mouse_up,
+                                button, ins.mode, ins.hold)
+
+            elif op == OP_MOVETO:
+                x, y = ins.args[:2]
+                with backend.atomic():
+                    if ins.relative:
+                        currentmouseposition = backend.position()
+                        x += currentmouseposition[0]
+                        y += currentmouseposition[1]
+                    self._glide(x, y, ins.args[2] if len(ins.args) > 2 else None)
+                self.timer.rebase()
+
+            elif op == OP_WAITCOLOR:
+                r_val, g_val, b_val, x, y = ins.args
+                rgb = (r_val, g_val, b_val)
+                found = self._wait_screen((x, y, x + 1, y + 1),
+                                          lambda frame: color_matches(frame.pixel(x, y), rgb))
+                if not found and self.running:
+                    return self._action_failed("Wait Color Failed",
+                                               f"Color ({r_val},{g_val},{b_val}) not found at ({x},{y}) within {WAITCOLOR_TIMEOUT}s.")
+                elif not self.running:
+                    return False
+
+            elif op == OP_WAITREGION or op == OP_WAITPOINTS:
+                condition = self._condition(ins)
+                found = self._wait_screen(condition.bbox, condition.matches)
+                if not found and self.running:
+                    return self._action_failed("Wait Color Failed",
+                                               f"'{ins.source}' did not match within {WAITCOLOR_TIMEOUT}s.")
+                elif not self.running:
+                    return False
+
+            elif op == OP_WAITIMAGE or op == OP_CLICKIMAGE:
+                condition = self._condition(ins)
+                found = self._wait_screen(condition.bbox, condition.matches)
+                if not found and self.running:
+                    return self._action_failed("Wait Image Failed",
+                                               f"Image '{ins.text}' not found within {WAITCOLOR_TIMEOUT}s.")
+                elif not self.running:
+                    return False
+                if op == OP_CLICKIMAGE:
+                    with backend.atomic():
+                        backend.mouse_move(*condition.found)
+                        self.timer.wait(0.005)
+                        self._press(backend.click, backend.mouse_down, backend.mouse_up,
+                                    'left', ins.mode, ins.hold)
+
+            elif op == OP_IFCOLOR:
+                r_val, g_val, b_val, x, y = ins.args
+                pixels = self.sampler.sample([(x, y)])
+                if pixels is not None and color_matches(pixels[0], (r_val, g_val, b_val)):
+                    self._branch = ins.branch
+                else:
+                    self._branch = ins.branch_else
+
+            elif op == OP_KEY:
+                self._press(backend.key_press, backend.key_down, backend.key_up,
+                            ins.text, ins.mode, ins.hold)
+
+            elif op == OP_TYPE or op == OP_PASTE:
+                interval = ins.hold if ins.hold > 0 else self.type_interval
+                with backend.atomic():
+                    send_text(backend, ins.text, interval, paste=op == OP_PASTE,
+                              is_running=lambda: self.running)
+                self.timer.rebase()
+
+        except Exception as e:
+            return self._action_failed("Action Error",
+                                       f"Error performing action '{ins.source}':\n{type(e).__name__}: {e}")
+
+        return True
+
+    def _run_chain(self, name):
+        """Run the chained program called name inline, with its own repetitions."""
+        target = self.chains.get(name)
+        if target is None:
+            return self._fail("Executing chain failed",
+                              f"Tab \"{name}\" not found.\nAutomation stopped.")
+        if name in self._chain_stack:
+            cycle = " > ".join(self._chain_stack[self._chain_stack.index(name):] + [name])
+            return self._fail("Executing chain failed",
+                              f"Chain cycle: {cycle}.\nAutomation stopped.")
+        program, repetitions = target
+        progress = self.progress
+        outer = progress.chain, progress.index
+        self._chain_stack.append(name)
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.emit(EVENT_CHAIN_START, progress.chain or self.name, progress.index, name)
+        progress.chain = name
+        try:
+            loop_count = 0
+            while self.running and (repetitions is None or loop_count < repetitions):
+                loop_count += 1
+                self._run_program(program)
+        finally:
+            self._chain_stack.pop()
+            progress.chain, progress.index = outer
+            progress.phase = PHASE_ACTION
+            if tracer is not None:
+                tracer.emit(EVENT_CHAIN_END, progress.chain or self.name, progress.index, name)
+        self.timer.rebase()
+        return self.running
+
+    def _wait_screen(self, bbox, predicate):
+        """Poll bbox until predicate(frame) holds, the timeout passes or the run stops."""
+        sampler = self.sampler
+        found = sampler.wait(bbox, predicate, WAITCOLOR_TIMEOUT, is_running=lambda: self.running,
+                             interrupt=self._stop_event)
+        self.timer.rebase()
+        # Like action timings, waits are only profiled in the main program's own
+        # rows, and not at all in streamed programs, which keep no rows in memory.
+        if (self.profiler is not None and self.progress.chain is None
+                and not getattr(self.program, 'streamed', False)):
+            self.profiler.record_wait(self.progress.index, sampler.last_polls, sampler.last_wait, found)
+        if self.tracer is not None:
+            self.tracer.emit(EVENT_WAIT, self.progress.chain or self.name, self.progress.index,
+                             {'found': found, 'polls': sampler.last_polls, 'seconds': sampler.last_wait})
+        return found
+
+    def _condition(self, ins):
+        """The screen condition of a waitregion/waitall/waitany/waitimage row, built once per run."""
+        condition = self._conditions.get(ins)
+        if condition is None:
+            if ins.op == OP_WAITREGION:
+                from conditions import region_condition
+                condition = region_condition(ins.args)
+            elif ins.op == OP_WAITPOINTS:
+                from conditions import points_condition
+                condition = points_condition(ins.args, require_all=ins.text == 'all')
+            else:
+                from imagematch import image_condition
+                condition = image_condition(ins.text, ins.args)
+            self._conditions[ins] = condition
+        return condition
@@ -0,0 +1,325 @@
+"""Run saved configurations without the GUI.
+
+    python -m headless f2 f3 [--repetitions N] [--safe-mode] [--backend NAME]
+
+Configurations run one after another, in the order given. The '.json'
+extension is added when missing, as with the GUI's command line. A '>Title'
+row chains to another configuration loaded in the same invocation.
+Macro files (.skm, .skm.gz) are played while they are read, so their
+length does not matter.
+'--backend recording' runs without touching any device and prints the
+event throughput and timing at the end. '--parallel' starts all of them at
+once, sharing the input device through one ordered queue.
+"""
+import argparse
+import os
+import sys
+import threading
+
+from program import ProgramError, StreamedProgram, parse_error_policy
+import programcache
+from programcache import cached_compile_rows, cached_load_config
+from macrofile import is_macro_file, EXTENSIONS
+from engine import Engine, EngineListener, RESULT_COMPLETED, DEFAULT_MOUSE_SPEED
+from backends import create_backend, BACKENDS, DEFAULT_BACKEND, RecordingBackend
+from scheduler import Scheduler, SleepTimer
+from screen import PixelSampler, POLL_INTERVAL
+from profiler import Profiler
+from tracelog import Tracer
+from control import ControlServer, default_token_path, parse_address
+from dispatch import InputDispatcher
+from textinput import TYPE_INTERVAL
+from mousepath import MouseModel, SHAPES, DEFAULT_SHAPE, DEFAULT_RATE
+
+
+class HeadlessRunner(EngineListener):
+    """Runs a set of configurations and reports errors on stderr."""
+
+    def __init__(self, configs, repetitions=None, mouse_speed=1./DEFAULT_MOUSE_SPEED,
+                 safe_mode=False, backend=None, timer=None, sampler=None, profile=False,
+                 type_interval=TYPE_INTERVAL, tracer=None, error_policy=None):
+        self.configs = configs
+        self.tracer = tracer
+        self.error_policy = error_policy
+        self.profile = profile
+        self.profilers = {}
+        self.sampler = sampler or PixelSampler()
+        self.backend = backend or create_backend()
+        self.timer = timer or SleepTimer()
+        self.repetitions = repetitions
+        self.mouse_speed = mouse_speed
+        self.type_interval = type_interval
+        self.safe_mode = safe_mode
+        self.programs = {}
+        self.priorities = {}
+        self.engines = []
+        self.latest = {}
+        self.threads = []
+        self.dispatcher = None
+
+    def compile(self):
+        """Compile every configuration up front, keyed by title."""
+        for name, config in self.configs:
+            program = config.get('streamed')
+            if program is not None:
+                program.validate()
+            else:
+                program = cached_compile_rows(config['rows'])
+            self.programs[config.get('title', name)] = (program, self._repetitions(config))
+            self.priorities[config.get('title', name)] = int(config.get('priority', 0))
+
+    def _repetitions(self, config):
+        """The saved repetitions; '>Title' rows always run a program this many times."""
+        if config.get('run_mode', 'infinite') != 'limited':
+            return None
+        return int(config.get('repetitions', 1))
+
+    def _engine(self, title, backend, timer, sampler):
+        program, repetitions = self.programs[title]
+        if self.repetitions is not None:
+            repetitions = self.repetitions      # the override is for the programs run, not chained
+        profiler = None
+        if self.profile:
+            profiler = self.profilers.get(title) or Profiler(program)
+            self.profilers[title] = profiler
+        engine = Engine(program, repetitions=repetitions, mouse_speed=self.mouse_speed,
+                        safe_mode=self.safe_mode, listener=self, backend=backend,
+                        timer=timer, sampler=sampler, profiler=profiler,
+                        chains=self.programs, name=title, type_interval=self.type_interval,
+                        tracer=self.tracer, error_policy=self.error_policy)
+        self.engines.append(engine)
+        self.latest[title] = engine
+        return engine
+
+    def run_program(self, title):
+        return self._engine(title, self.backend, self.timer, self.sampler).run()
+
+    def run_parallel(self, titles):
+        """Run several programs at once, each in its own thread, and return their results.
+
+        Input goes through one InputDispatcher; every program gets its own
+        timer and sampler (sharing the capture source).
+        """
+        results = {}
+        threads = self.threads = []
+        for title in titles:
+            engine = self._background_engine(title)
+            thread = threading.Thread(target=lambda t=title, e=engine: results.__setitem__(t, e.run()),
+                                      daemon=True)
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.1)    # a bounded join keeps Ctrl+C working
+        return [results.get(title) for title in titles]
+
+    def _background_engine(self, title):
+        """An engine for title with its own timer and sampler, sending input through the dispatcher."""
+        if self.dispatcher is None:
+            self.dispatcher = InputDispatcher(self.backend)
+        timer = Scheduler() if self.timer.precise else SleepTimer()
+        sampler = PixelSampler(source=self.sampler.source, interval=self.sampler.interval)
+        return self._engine(title, self.dispatcher.client(title, self.priorities[title]), timer, sampler)
+
+    # Controller interface of control.ControlServer
+
+    def program_names(self):
+        return list(self.programs)
+
+    def latest_engine(self, title):
+        return self.latest.get(title)
+
+    def start_program(self, title):
+        """Start title in its own thread, alongside any other running programs."""
+        if title not in self.programs:
+            raise KeyError(title)
+        engine = self.latest.get(title)
+        if engine is not None and engine.running:
+            raise ValueError(f"'{title}' is already running")
+        self.engines = [engine for engine in self.engines if engine.running]
+        self._background_engine(title).start()
+
+    def stop_program(self, title):
+        if title not in self.programs:
+            raise KeyError(title)
+        engine = self.latest.get(title)
+        if engine is not None:
+            engine.stop()
+
+    def stop(self, timeout=1.0):
+        """Stop every engine and wait up to timeout seconds for parallel runs to end."""
+        for engine in self.engines:
+            engine.stop()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def stop_latencies(self):
+        """Seconds each stopped engine took from stop() to idle, by title."""
+        return {engine.name: engine.stop_latency for engine in self.engines
+                if engine.stop_latency is not None}
+
+    def on_error(self, title, message):
+        print(f"{title}: {message}", file=sys.stderr)
+
+    def on_row_error(self, index, title, message, action):
+        print(f"{title} (row {index + 1}, {action}): {message}", file=sys.stderr)
+
+
+def config_path(name):
+    return name if name.lower().endswith(('.json',) + EXTENSIONS) else name + ".json"
+
+
+def load(name):
+    """The configuration called name; macro files are streamed, not read whole."""
+    path = config_path(name)
+    if is_macro_file(path):
+        program = StreamedProgram(path)
+        return dict(program.settings, streamed=program)
+    return cached_load_config(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="headless", description="Run SimpleKeyClicker configurations without the GUI.")
+    parser.add_argument('configs', nargs='+',
+                        help="configuration files ('.json' may be omitted) or .skm/.skm.gz macro files")
+    parser.add_argument('--repetitions', type=int, help="override the saved run mode and repeat N times")
+    parser.add_argument('--safe-mode', action='store_true', help="block disruptive keys and commands")
+    parser.add_argument('--mouse-speed', default=str(1./DEFAULT_MOUSE_SPEED),
+                        help="seconds per moveto, or a speed such as 2000px/s (default %(default)s)")
+    parser.add_argument('--mouse-path', choices=SHAPES, default=DEFAULT_SHAPE,
+                        help="shape of mouse moves (default %(default)s)")
+    parser.add_argument('--mouse-rate', type=int, default=DEFAULT_RATE,
+                        help="cursor updates per second while moving (default %(default)s)")
+    parser.add_argument('--type-interval', type=float, default=TYPE_INTERVAL,
+                        help="seconds between typed characters, 0 for as fast as possible (default %(default)s)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="input backend (default %(default)s)")
+    parser.add_argument('--pause', type=float,
+                        help="override the input library's pause after every call, in seconds")
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help="seconds between screen captures while waiting for a color (default %(default)s)")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write per-row timing histograms to PATH (.json or .csv); "
+                             "with several configurations the title is added to the name")
+    parser.add_argument('--on-error', metavar='POLICY', default='stop',
+                        help="what a failed action leads to: stop, skip or retry,N[,seconds][,stop|skip] "
+                             "(default %(default)s); onerror(...) rows override it")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="append every run event (rows, jumps, waits, errors) to PATH as JSON lines")
+    parser.add_argument('--parallel', action='store_true',
+                        help="run all configurations at the same time through one ordered input queue")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="parse and compile the configurations without the on-disk cache")
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help="instead of running the configurations, wait for commands from a local control "
+                             "server on ADDRESS: a port on 127.0.0.1, host:port, or a Unix socket path")
+    parser.add_argument('--precise', action='store_true',
+                        help="schedule delays and holds on an absolute timeline and report jitter")
+    args = parser.parse_args(argv)
+    if args.repetitions is not None and args.repetitions <= 0:
+        parser.error("--repetitions must be a positive whole number")
+    try:
+        mouse = MouseModel.from_speed(args.mouse_speed, shape=args.mouse_path, rate=args.mouse_rate)
+    except ValueError as e:
+        parser.error(f"--mouse-speed/--mouse-rate: {e}")
+    try:
+        error_policy = parse_error_policy(args.on_error)
+    except ValueError as e:
+        parser.error(f"--on-error: {e}")
+
+    if args.no_cache:
+        programcache.disable()
+    configs = []
+    try:
+        for name in args.configs:
+            configs.append((name, load(name)))
+    except (OSError, ValueError) as e:
+        print(f"Load Error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        backend = create_backend(args.backend, pause=args.pause)
+    except ImportError as e:
+        print(f"Backend Error: {e}", file=sys.stderr)
+        return 2
+    tracer = None
+    if args.trace:
+        try:
+            tracer = Tracer(args.trace)
+        except OSError as e:
+            print(f"Trace Error: {e}", file=sys.stderr)
+            return 2
+    runner = HeadlessRunner(configs, repetitions=args.repetitions, mouse_speed=mouse,
+                            safe_mode=args.safe_mode, backend=backend,
+                            timer=Scheduler() if args.precise else SleepTimer(),
+                            sampler=PixelSampler(interval=args.poll_interval),
+                            profile=bool(args.profile), type_interval=args.type_interval,
+                            tracer=tracer, error_policy=error_policy)
+    try:
+        runner.compile()
+    except (ProgramError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        if tracer is not None:
+            tracer.close()
+        return 2
+
+    status = 0
+    titles = [config.get('title', name) for name, config in configs]
+    server = None
+    if args.serve:
+        host, port, path = parse_address(args.serve)
+        server = ControlServer(runner, host=host, port=port, path=path, token_path=default_token_path())
+        try:
+            server.start()
+        except OSError as e:
+            print(f"Serve Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Control server listening on {server.address} ({', '.join(titles)}), "
+              f"token in {server.token_path}; Ctrl+C to quit.")
+    try:
+        if server is not None:
+            while not server.join(0.5):     # a bounded join keeps Ctrl+C working
+                pass
+        elif args.parallel:
+            for title, result in zip(titles, runner.run_parallel(titles)):
+                print(f"{title}: {result}")
+                if result != RESULT_COMPLETED:
+                    status = 1
+        else:
+            for title in titles:
+                result = runner.run_program(title)
+                print(f"{title}: {result}")
+                if result != RESULT_COMPLETED:
+                    status = 1
+                    break
+    except KeyboardInterrupt:
+        if server is not None:
+            server.stop()
+        runner.stop()
+        print("Stopped.", file=sys.stderr)
+        for title, latency in runner.stop_latencies().items():
+            print(f"{title}: stopped in {latency * 1000:.2f} ms", file=sys.stderr)
+        status = 130
+    if tracer is not None:
+        tracer.close()
+        print(f"Trace written to {args.trace}")
+    if args.profile:
+        root, ext = os.path.splitext(args.profile)
+        for title, profiler in runner.profilers.items():
+            path = args.profile if len(runner.profilers) == 1 else f"{root}-{title}{ext}"
+            profiler.write(path)
+            print(f"Profile written to {path}")
+    if isinstance(backend, RecordingBackend):
+        for key, value in backend.summary().items():
+            print(f"{key}: {value:.6g}")
+    if runner.dispatcher is not None:
+        for title, stats in runner.dispatcher.stats().items():
+            print(f"queue {title}: " + ", ".join(f"{key} {value:.6g}" for key, value in stats.items()))
+    else:
+        for key, value in runner.timer.stats().items():
+            print(f"timer {key}: {value:.6g}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
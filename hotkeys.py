@@ -0,0 +1,118 @@
+"""Process-wide global hotkeys.
+
+The keyboard library runs every registered hook on each key event, so
+registering the same combination again on every run or configuration load
+makes each key press slower and fires its action several times. The
+registry installs at most one hook per combination and dispatches it to
+the callbacks bound to it, which are kept per owner (a tab) and binding
+name ('start', 'stop', ...). Binding again replaces the previous entry.
+
+    registry.bind(tab, 'start', ['ctrl+f2'], tab.start_action)
+    registry.unbind_all(tab)
+"""
+import threading
+
+
+def normalize(combo):
+    """'Ctrl + F2' -> 'ctrl+f2'."""
+    return '+'.join(part.strip().lower() for part in combo.split('+'))
+
+
+def describe_failures(failed):
+    """One 'combo: error' line per (combo, error) pair returned by bind(), sorted by combo."""
+    return "\n".join(f"{combo}: {error}" for combo, error in sorted(failed, key=lambda pair: pair[0]))
+
+
+class HotkeyRegistry:
+    """Owns the keyboard hooks of the process.
+
+    hook is the module that installs them (keyboard by default, imported on
+    first use); it needs add_hotkey(combo, callback) returning a handle and
+    remove_hotkey(handle).
+    """
+
+    def __init__(self, hook=None):
+        self._hook = hook
+        self._lock = threading.Lock()
+        self._handles = {}      # combo -> hook handle
+        self._callbacks = {}    # combo -> {(owner, name): callback}
+        self._bindings = {}     # (owner, name) -> combos
+
+    @property
+    def hook(self):
+        if self._hook is None:
+            import keyboard
+            self._hook = keyboard
+        return self._hook
+
+    @property
+    def hook_count(self):
+        """Number of hooks currently installed."""
+        return len(self._handles)
+
+    def bind(self, owner, name, combos, callback):
+        """Make combos call callback, replacing owner's previous name binding.
+
+        Returns (combo, error) pairs for the combinations the keyboard
+        library rejected; the others are bound.
+        """
+        key = (owner, name)
+        combos = {normalize(combo) for combo in combos if combo.strip()}
+        failed = []
+        with self._lock:
+            for combo in self._bindings.pop(key, set()) - combos:
+                self._drop(combo, key)
+            bound = set()
+            for combo in combos:
+                if combo not in self._handles:
+                    try:
+                        self._handles[combo] = self.hook.add_hotkey(
+                            combo, lambda combo=combo: self._dispatch(combo))
+                    except Exception as e:
+                        failed.append((combo, e))
+                        continue
+                self._callbacks.setdefault(combo, {})[key] = callback
+                bound.add(combo)
+            if bound:
+                self._bindings[key] = bound
+        return failed
+
+    def unbind(self, owner, name):
+        with self._lock:
+            for combo in self._bindings.pop((owner, name), ()):
+                self._drop(combo, (owner, name))
+
+    def unbind_all(self, owner):
+        """Remove every binding of owner, e.g. when its tab is closed."""
+        with self._lock:
+            for key in [key for key in self._bindings if key[0] is owner]:
+                for combo in self._bindings.pop(key):
+                    self._drop(combo, key)
+
+    def _drop(self, combo, key):
+        callbacks = self._callbacks.get(combo)
+        if callbacks is None:
+            return
+        callbacks.pop(key, None)
+        if not callbacks:
+            del self._callbacks[combo]
+            handle = self._handles.pop(combo, None)
+            if handle is not None:
+                try:
+                    self.hook.remove_hotkey(handle)
+                except (KeyError, ValueError):
+                    pass
+
+    def _dispatch(self, combo):
+        with self._lock:
+            callbacks = list(self._callbacks.get(combo, {}).values())
+        for callback in callbacks:
+            callback()
+
+    def bindings(self):
+        """{combo: [(owner, name), ...]} for everything bound."""
+        with self._lock:
+            return {combo: list(callbacks) for combo, callbacks in self._callbacks.items()}
+
+
+registry = HotkeyRegistry()
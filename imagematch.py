@@ -0,0 +1,165 @@
+"""Template matching for waitimage and clickimage.
+
+Templates are loaded once, converted to grayscale and downscaled into a
+small pyramid, and the most recently used ones are cached by path and
+modification time. A search scores
+every position of the coarsest level with normalized cross-correlation,
+then refines the best few candidates level by level in a small
+neighbourhood, so the full-resolution work is a handful of tiny windows.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MATCH_THRESHOLD = 0.9
+MIN_LEVEL_SIZE = 8      # coarsest template level keeps at least this many pixels per side
+MAX_LEVELS = 4
+CANDIDATES = 5          # positions carried from one pyramid level to the next
+REFINE_RADIUS = 2       # search +-this many pixels around each upscaled candidate
+CACHE_SIZE = 32         # templates kept loaded
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def to_gray(rgb):
+    """Height x width x 3 RGB array to a float32 luminance array."""
+    return rgb[:, :, :3].astype(np.float32) @ _LUMA
+
+
+def downscale(a):
+    """Halve both dimensions by averaging 2x2 blocks."""
+    h, w = a.shape[0] // 2 * 2, a.shape[1] // 2 * 2
+    return a[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+
+def _window_sums(a, h, w):
+    ii = np.pad(a.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+    return ii[h:, w:] - ii[:-h, w:] - ii[h:, :-w] + ii[:-h, :-w]
+
+
+def ncc_map(image, tpl, tpl_zero_mean, tpl_norm):
+    """Normalized cross-correlation score of tpl at every position of image."""
+    h, w = tpl.shape
+    if image.shape[0] < h or image.shape[1] < w:
+        return np.empty((0, 0))
+    image = image.astype(np.float64)
+    numerator = np.einsum('ijkl,kl->ij', sliding_window_view(image, (h, w)), tpl_zero_mean)
+    s1 = _window_sums(image, h, w)
+    s2 = _window_sums(image * image, h, w)
+    spread = np.sqrt(np.maximum(s2 - s1 * s1 / (h * w), 0.0)) * tpl_norm
+    return np.where(spread > 1e-6, numerator / np.maximum(spread, 1e-6), 0.0)
+
+
+class Template:
+    """A grayscale template with its precomputed pyramid."""
+
+    def __init__(self, gray, name=''):
+        self.name = name
+        self.height, self.width = gray.shape
+        self.levels = [gray.astype(np.float64)]
+        while (len(self.levels) < MAX_LEVELS and
+               min(self.levels[-1].shape) // 2 >= MIN_LEVEL_SIZE):
+            self.levels.append(downscale(self.levels[-1]))
+        self.zero_mean = [t - t.mean() for t in self.levels]
+        self.norms = [np.sqrt((t * t).sum()) for t in self.zero_mean]
+        if self.norms[0] < 1e-6:
+            raise ValueError(f"template '{name}' is a single flat color; use waitregion instead")
+
+    def _scores(self, image, level):
+        return ncc_map(image, self.levels[level], self.zero_mean[level], self.norms[level])
+
+    def match(self, gray):
+        """Best (score, x, y) of the template's top-left corner in gray, or None."""
+        images = [gray]
+        for _ in range(len(self.levels) - 1):
+            images.append(downscale(images[-1]))
+
+        top = len(self.levels) - 1
+        scores = self._scores(images[top], top)
+        if scores.size == 0:
+            return None
+        k = min(CANDIDATES, scores.size)
+        best = np.argpartition(scores.ravel(), -k)[-k:]
+        candidates = [divmod(int(i), scores.shape[1]) for i in best]
+
+        for level in range(top - 1, -1, -1):
+            image = images[level]
+            th, tw = self.levels[level].shape
+            max_y, max_x = image.shape[0] - th, image.shape[1] - tw
+            refined = []
+            for y, x in candidates:
+                y0, x0 = max(0, 2 * y - REFINE_RADIUS), max(0, 2 * x - REFINE_RADIUS)
+                y1, x1 = min(max_y, 2 * y + REFINE_RADIUS), min(max_x, 2 * x + REFINE_RADIUS)
+                if y1 < y0 or x1 < x0:
+                    continue
+                local = self._scores(image[y0:y1 + th, x0:x1 + tw], level)
+                iy, ix = np.unravel_index(np.argmax(local), local.shape)
+                refined.append((local[iy, ix], y0 + int(iy), x0 + int(ix)))
+            refined.sort(reverse=True)
+            candidates = [(y, x) for _, y, x in refined[:CANDIDATES]]
+            if not candidates:
+                return None
+
+        y, x = candidates[0]
+        th, tw = self.levels[0].shape
+        return float(self._scores(gray[y:y + th, x:x + tw], 0)[0, 0]), x, y
+
+
+_cache = OrderedDict()      # (path, mtime) -> Template, least recently used first
+_cache_lock = threading.Lock()
+
+
+def load_template(path):
+    """Load and preprocess an image file once; reloaded only when the file changes."""
+    from PIL import Image
+    path = os.path.abspath(path)
+    key = (path, os.stat(path).st_mtime_ns)
+    with _cache_lock:
+        template = _cache.get(key)
+        if template is not None:
+            _cache.move_to_end(key)
+            return template
+    with Image.open(path) as image:
+        template = Template(to_gray(np.asarray(image.convert('RGB'))), name=path)
+    with _cache_lock:
+        _cache[key] = template
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return template
+
+
+class ImageCondition:
+    """The template appears in bbox with a score of at least threshold.
+
+    After a match, found holds the screen position of the match's center.
+    """
+
+    def __init__(self, template, bbox, threshold=MATCH_THRESHOLD):
+        self.template = template
+        self.bbox = bbox
+        self.threshold = threshold
+        self.found = None
+        self.score = None
+
+    def matches(self, frame):
+        result = self.template.match(to_gray(frame.to_array()))
+        if result is None:
+            return False
+        self.score, x, y = result
+        if self.score < self.threshold:
+            return False
+        self.found = (frame.left + x + self.template.width // 2,
+                      frame.top + y + self.template.height // 2)
+        return True
+
+
+def image_condition(path, args):
+    """Build an ImageCondition from waitimage/clickimage's (x1, y1, x2, y2[, threshold])."""
+    x1, y1, x2, y2 = args[:4]
+    threshold = args[4] if len(args) > 4 else MATCH_THRESHOLD
+    left, right = sorted((x1, x2))
+    top, bottom = sorted((y1, y2))
+    return ImageCondition(load_template(path), (left, top, right + 1, bottom + 1), threshold)
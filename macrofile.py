@@ -0,0 +1,154 @@
+"""Compact line-per-row macro files (.skm, or .skm.gz compressed).
+
+The first line is '#skm1 ' followed by the configuration's settings as JSON
+(everything but 'rows'). Every following line is one row: key, sleep,
+hold, jump and jumpcount separated by tabs, with trailing fields left out
+when they have their default value, so a row with nothing set is an empty
+line. Backslash, tab and newline in the key
+are escaped as \\\\, \\t and \\n.
+
+Absolute moveto(x,y[,duration]) rows after the first are delta-encoded as
+'~dx,dy[,duration]' relative to the previous absolute moveto, which keeps recorded mouse paths
+short. Rows are read one at a time, so a file can be played back without
+holding it in memory.
+
+    python -m macrofile convert recorded.json recorded.skm.gz
+"""
+import gzip
+import json
+import re
+import sys
+
+MAGIC = '#skm1'
+FIELDS = ('key', 'sleep', 'hold', 'jump', 'jumpcount')
+DEFAULTS = ('', '0.0', '0.0', '0', '0')
+EXTENSIONS = ('.skm', '.skm.gz')
+
+_MOVETO = re.compile(r'moveto\((\d+),(\d+)(,[^,()]+)?\)$')
+_DELTA = re.compile(r'~(-?\d+),(-?\d+)(,[^,()]+)?$')
+_ESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', '~': '~'}
+
+
+def is_macro_file(path):
+    return path.lower().endswith(EXTENSIONS)
+
+
+def _open(path, mode):
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='\n')
+    return open(path, mode, encoding='utf-8', newline='\n')
+
+
+def _escape(key):
+    key = key.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return '\\' + key if key.startswith('~') else key
+
+
+def _unescape(key):
+    return re.sub(r'\\([\\tn~])', lambda m: _ESCAPES[m.group(1)], key)
+
+
+def _settings(config):
+    return {name: value for name, value in config.items() if name != 'rows'}
+
+
+def read_settings(path):
+    """The configuration settings from the header, without reading any rows."""
+    with _open(path, 'r') as f:
+        return _parse_header(f.readline(), path)
+
+
+def _parse_header(line, path):
+    if not line.startswith(MAGIC):
+        raise ValueError(f"{path} is not a macro file (missing '{MAGIC}' header).")
+    settings = json.loads(line[len(MAGIC):] or '{}')
+    if not isinstance(settings, dict):
+        raise ValueError(f"{path}: invalid macro header.")
+    return settings
+
+
+def iter_rows(path):
+    """Yield the rows of a macro file one at a time, as row dicts."""
+    with _open(path, 'r') as f:
+        _parse_header(f.readline(), path)
+        last_move = None
+        for number, line in enumerate(f, 2):
+            # An empty line is a row with every field at its default.
+            values = line.rstrip('\n').split('\t')
+            key = values[0]
+            delta = _DELTA.match(key)
+            if delta:
+                if last_move is None:
+                    raise ValueError(f"{path}, line {number}: relative move before any moveto.")
+                last_move = (last_move[0] + int(delta.group(1)), last_move[1] + int(delta.group(2)))
+                key = f"moveto({last_move[0]},{last_move[1]}{delta.group(3) or ''})"
+            else:
+                key = _unescape(key)
+                move = _MOVETO.match(key)
+                if move:
+                    last_move = (int(move.group(1)), int(move.group(2)))
+            values[0] = key
+            values += DEFAULTS[len(values):]
+            yield dict(zip(FIELDS, values))
+
+
+def write_macro(path, config, rows=None):
+    """Write config's settings and rows (config['rows'] unless rows is given)."""
+    rows = config.get('rows', ()) if rows is None else rows
+    with _open(path, 'w') as f:
+        f.write(MAGIC + ' ' + json.dumps(_settings(config)) + '\n')
+        last_move = None
+        for row in rows:
+            values = [str(row.get(name, default)) for name, default in zip(FIELDS, DEFAULTS)]
+            move = _MOVETO.match(values[0])
+            if move:
+                x, y = int(move.group(1)), int(move.group(2))
+                if last_move is not None:
+                    values[0] = f"~{x - last_move[0]},{y - last_move[1]}{move.group(3) or ''}"
+                last_move = (x, y)
+            else:
+                values[0] = _escape(values[0])
+            while len(values) > 1 and values[-1] == DEFAULTS[len(values) - 1]:
+                values.pop()
+            f.write('\t'.join(values) + '\n')
+
+
+def load_macro(path):
+    """Read a whole macro file into a configuration dict, like a JSON configuration."""
+    config = read_settings(path)
+    config['rows'] = list(iter_rows(path))
+    return config
+
+
+def convert(source, target):
+    """Convert between JSON configurations and macro files, by extension."""
+    if is_macro_file(source):
+        config = read_settings(source)
+        rows = iter_rows(source)
+    else:
+        with open(source, 'r') as f:
+            config = json.load(f)
+        rows = config.get('rows', [])
+    if is_macro_file(target):
+        write_macro(target, config, rows)
+    else:
+        config = dict(config, rows=list(rows))
+        with open(target, 'w') as f:
+            json.dump(config, f, indent=4)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] != 'convert':
+        print("usage: python -m macrofile convert SOURCE TARGET", file=sys.stderr)
+        return 2
+    try:
+        convert(argv[1], argv[2])
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
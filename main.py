@@ -1,19 +1,32 @@
-import threading
 import time
+STARTED = time.perf_counter()
+import threading
 import os
 import sys
 import json
-import pydirectinput
-import keyboard
 import tkinter as tk
 from tkinter import ttk
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from tkinter import Toplevel, PhotoImage, filedialog
 from tkinter import Frame, LEFT, BOTH, YES, X, Y, RIGHT, TOP, BOTTOM, HORIZONTAL, VERTICAL
-import pyautogui
-from PIL import ImageGrab
-from pynput import mouse
+from program import OP_CHAIN, parse_error_policy
+from programcache import cached_compile_rows, cached_load_config
+from engine import (Engine, EngineListener, RESULT_COMPLETED, DEFAULT_MOUSE_SPEED,
+                    PHASE_ACTION, PHASE_DELAY)
+from scheduler import Scheduler, SleepTimer
+from profiler import Profiler
+from tracelog import Tracer, default_path as default_trace_path
+from control import ControlServer, default_token_path
+from dispatch import InputDispatcher
+from textinput import TYPE_INTERVAL
+from mousepath import MouseModel, SHAPES, DEFAULT_SHAPE, DEFAULT_RATE
+from rowview import RowView, FIELDS, new_row
+from macrofile import is_macro_file, write_macro
+from backends import create_backend
+from screen import PixelSampler
+from recorder import LiveRecorder
+from hotkeys import registry as hotkey_registry, describe_failures
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and PyInstaller."""
@@ -27,18 +40,9 @@ TOOL_NAME = "SimpleKeyClicker"
 ICON_PATH = resource_path("logo.ico")
 LOGO_PATH = resource_path("logo.png")
 EMERGENCY_STOP_KEY = 'esc'
-
-SINGLE_ACTION_KEYS = {
-    'tab', 'space', 'enter', 'esc', 'backspace', 'delete', 'insert',
-    'up', 'down', 'left', 'right',
-    'home', 'end', 'pageup', 'pagedown',
-    'capslock', 'numlock', 'scrolllock',
-    'printscreen', 'prntscrn', 'prtsc', 'pause',
-    'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12',
-    'f13', 'f14', 'f15', 'f16', 'f17', 'f18', 'f19', 'f20', 'f21', 'f22', 'f23', 'f24',
-    'shift', 'ctrl', 'alt', 'win', 'cmd'
-}
-
+PROGRESS_INTERVAL_MS = 33  # row highlight refresh while running (~30 Hz)
+THEME = "flatly"
+STARTUP_TARGET = 1.0       # seconds from launch until the window is idle
 
 POSSIBLE_KEYS = """
 --- Possible Keys/Mouse Actions ---
@@ -66,6 +70,11 @@ Basic Keyboard Input:
 Typing Strings:
 - Any text not recognized as a special key or command above will be typed out character by character.
   Example: Hello World!
+- type(text)  - Type text exactly, even if it looks like a key or command. \n is Enter, \t is Tab.
+- paste(text) - Paste text through the clipboard (replaces the clipboard contents).
+  Characters the keyboard cannot type (e.g. é, ü, emoji) are pasted automatically.
+  Typing speed is set in Options > Typing Speed; a 'Hold Time' > 0 on the row overrides it
+  (seconds per character). Long text with 'Instant' speed is pasted instead of typed.
 
 Basic Mouse Input (at current cursor position):
 - click   (Left mouse button click)
@@ -83,35 +92,78 @@ Advanced Mouse Input (at specific coordinates):
 Color Detection:
 - waitcolor(r,g,b,x,y) - Pause execution until the color (R, G, B) is detected
                          at screen coordinates (X, Y).
-                       - If the color is not found within the timeout (~30s),
-                         an error message appears, and automation stops after 'OK'.
+                       - If the color is not found within the timeout (~30s), the action
+                         fails (see Error Handling).
+- waitregion(x1,y1,x2,y2,r,g,b,tol,fraction)
+                       - Pause until at least 'fraction' (0-1, default 1) of the pixels in the
+                         rectangle (x1,y1)-(x2,y2) are within 'tol' (default 10) of (R, G, B).
+- waitall(r,g,b,x,y,r,g,b,x,y,...) - Pause until every listed point has its color.
+- waitany(r,g,b,x,y,r,g,b,x,y,...) - Pause until at least one listed point has its color.
+
+Conditions and Labels:
+- label(name)          - Names this row. Does nothing when run.
+- ifcolor(r,g,b,x,y)>target
+                       - If the pixel at (X, Y) has color (R, G, B) right now, continue at
+                         'target' (a label name or row number), otherwise with the next row.
+- ifcolor(r,g,b,x,y)>target|other
+                       - Same, but continue at 'other' when the color does not match.
+- goto(target)         - Always continue at 'target'.
+- Jump to / Jump count - 'Jump to' also accepts a label name. Each row counts its own jumps:
+                         after 'Jump count' jumps it falls through once and starts counting again.
+
+Error Handling:
+- onerror(policy)      - What a failed action (a wait that times out, an input error) leads to
+                         in the rows below: 'stop', 'skip' (go on with the next row),
+                         'goto,target', or 'retry,N,seconds,then' (N more tries, waiting
+                         'seconds' and twice as long each time, then stop/skip/goto).
+                         onerror(default) returns to the Options > On Error setting.
+
+Image Detection:
+- waitimage(path,x1,y1,x2,y2,threshold)
+                       - Pause until the image file 'path' appears inside the rectangle
+                         (x1,y1)-(x2,y2). 'threshold' (0-1, default 0.9) is the minimum similarity.
+- clickimage(path,x1,y1,x2,y2,threshold)
+                       - Same as waitimage, then click the center of the match
+                         (Use 'Hold Time' > 0 to hold the click).
 
 --- Notes ---
-- Safe Mode: Blocks potentially disruptive keys (Alt, Ctrl, Shift, Win, F4, Delete, Tab) and commands (waitcolor).
+- Safe Mode: Blocks potentially disruptive keys (Alt, Ctrl, Shift, Win, F4, Delete, Tab) and commands (waitcolor, ifcolor, waitregion, waitall, waitany, waitimage, clickimage, type, paste).
 - Coordinates/Color: Use the 'Capture' button next to the Key/Button field to easily get mouse position and pixel color for commands.
 """
 
-DANGEROUS_KEYS = {'alt', 'ctrl', 'shift', 'win', 'cmd', 'f4', 'delete', 'tab'}
-SYSTEM_COMMANDS = {'type(', 'paste(', 'waitcolor', 'ifcolor'}
-DEFAULT_MOUSE_SPEED = 20
-
-COLOR_MATCH_TOLERANCE = 10
-WAITCOLOR_TIMEOUT = 30
-
 class MainWindow:
     def __init__(self, root):
-        self.mouseSpeedVar = tk.DoubleVar(value=1./DEFAULT_MOUSE_SPEED)
+        self.mouseSpeedVar = tk.StringVar(value=str(1./DEFAULT_MOUSE_SPEED))
+        self.mousePathVar = tk.StringVar(value=DEFAULT_SHAPE)
+        self.mouseRateVar = tk.IntVar(value=DEFAULT_RATE)
+        self._mouse_model = None
+        self.typeIntervalVar = tk.DoubleVar(value=TYPE_INTERVAL)
+        self.errorPolicyVar = tk.StringVar(value="stop")
         self.root = root
         self.root.title(TOOL_NAME)
         self.root.geometry("1050x650")
         self.root.resizable(True, True)
         self.root.minsize(1050, 350)
+        # Shared by every tab: the style singleton is themed once, the logo decoded once.
+        self.current_theme = THEME
+        self.style = tb.Style(self.current_theme)
+        self._logo = None
+        self.capture_sampler = PixelSampler()
+        self.startup_seconds = None
         self.safe_mode = False
         self.safe_mode_var = tb.BooleanVar(value=self.safe_mode)
+        self.precise_timing_var = tb.BooleanVar(value=False)
+        self.profile_var = tb.BooleanVar(value=False)
+        self.trace_var = tb.BooleanVar(value=False)
+        self._tracer = None
+        self.control_server_var = tb.BooleanVar(value=False)
+        self.control_server = None
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(pady=0, expand=True, fill='both')
         self.frames = []
         self.clickers = []
+        self.clickers_by_title = {}
+        self.dispatcher = None
 
         self._create_menu()
         self._create_main_frame()
@@ -131,6 +183,7 @@ class MainWindow:
         file_menu.add_separator()
         file_menu.add_command(label="Save Configuration", command=self.save_configuration)
         file_menu.add_command(label="Load Configuration", command=self.load_configuration)
+        file_menu.add_command(label="Save Run Profile", command=self.save_profile)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
 
@@ -138,24 +191,49 @@ class MainWindow:
         menubar.add_cascade(label="Options", menu=options_menu)
         options_menu.add_checkbutton(label="Safe Mode", variable=self.safe_mode_var,
                                       command=self._toggle_safe_mode_from_menu)
+        options_menu.add_checkbutton(label="Precise Timing", variable=self.precise_timing_var)
+        options_menu.add_checkbutton(label="Profile Runs", variable=self.profile_var)
+        options_menu.add_checkbutton(label="Trace Runs", variable=self.trace_var)
+        options_menu.add_checkbutton(label="Control Server", variable=self.control_server_var,
+                                     command=self._toggle_control_server)
+        options_menu.add_command(label="Input Queue Statistics", command=self.show_queue_stats)
+        options_menu.add_command(label="Active Hotkeys", command=self.show_hotkeys)
         options_menu.add_separator()
         
         mouseSpeedMenu = tk.Menu(options_menu, tearoff=0)
-        
-        
-        
-        mouseSpeedMenu.add_radiobutton(label="100", variable=self.mouseSpeedVar, value=0.01)
-        mouseSpeedMenu.add_radiobutton(label="20", variable=self.mouseSpeedVar, value=0.05)
-        mouseSpeedMenu.add_radiobutton(label="10", variable=self.mouseSpeedVar, value=0.1)
-        mouseSpeedMenu.add_radiobutton(label="8", variable=self.mouseSpeedVar, value=0.125)
-        mouseSpeedMenu.add_radiobutton(label="5", variable=self.mouseSpeedVar, value=0.2)
-        mouseSpeedMenu.add_radiobutton(label="2", variable=self.mouseSpeedVar, value=0.5)
-        mouseSpeedMenu.add_radiobutton(label="1", variable=self.mouseSpeedVar, value=1.0)
-        mouseSpeedMenu.add_radiobutton(label="0.1", variable=self.mouseSpeedVar, value=10.0)
-        
-        
-        
+        # Fixed time per move, labelled in moves per second, then constant speeds.
+        for label, seconds in (("100", 0.01), ("20", 0.05), ("10", 0.1), ("8", 0.125),
+                               ("5", 0.2), ("2", 0.5), ("1", 1.0), ("0.1", 10.0)):
+            mouseSpeedMenu.add_radiobutton(label=label, variable=self.mouseSpeedVar, value=str(seconds))
+        mouseSpeedMenu.add_separator()
+        for pixels in (500, 1000, 2000, 4000):
+            mouseSpeedMenu.add_radiobutton(label=f"{pixels} px/s", variable=self.mouseSpeedVar,
+                                           value=f"{pixels}px/s")
         options_menu.add_cascade(label="Mouse Speed", menu=mouseSpeedMenu)
+
+        mousePathMenu = tk.Menu(options_menu, tearoff=0)
+        for shape in SHAPES:
+            mousePathMenu.add_radiobutton(label=shape.capitalize(), variable=self.mousePathVar, value=shape)
+        mousePathMenu.add_separator()
+        for rate in (60, 125, 250, 500):
+            mousePathMenu.add_radiobutton(label=f"{rate} updates/s", variable=self.mouseRateVar, value=rate)
+        options_menu.add_cascade(label="Mouse Path", menu=mousePathMenu)
+
+        typingSpeedMenu = tk.Menu(options_menu, tearoff=0)
+        typingSpeedMenu.add_radiobutton(label="Instant", variable=self.typeIntervalVar, value=0.0)
+        typingSpeedMenu.add_radiobutton(label="100 chars/s", variable=self.typeIntervalVar, value=0.01)
+        typingSpeedMenu.add_radiobutton(label="50 chars/s", variable=self.typeIntervalVar, value=0.02)
+        typingSpeedMenu.add_radiobutton(label="20 chars/s", variable=self.typeIntervalVar, value=0.05)
+        typingSpeedMenu.add_radiobutton(label="10 chars/s", variable=self.typeIntervalVar, value=0.1)
+        options_menu.add_cascade(label="Typing Speed", menu=typingSpeedMenu)
+
+        # Rows after an onerror(...) row use that policy instead.
+        errorPolicyMenu = tk.Menu(options_menu, tearoff=0)
+        for label, policy in (("Stop", "stop"), ("Skip Row", "skip"),
+                              ("Retry 3 Times, Then Stop", "retry,3"),
+                              ("Retry 3 Times, Then Skip", "retry,3,skip")):
+            errorPolicyMenu.add_radiobutton(label=label, variable=self.errorPolicyVar, value=policy)
+        options_menu.add_cascade(label="On Error", menu=errorPolicyMenu)
         
 
 
@@ -176,10 +254,128 @@ class MainWindow:
         self.frames.append(frame)
         
         self.clickers.append(KeyClickerApp(frame, root, self, text))
+        self.index_titles()
         self.notebook.select(frame)
         
         
     
+    @property
+    def logo(self):
+        """logo.png as a PhotoImage, or None if it cannot be loaded."""
+        if self._logo is None:
+            try:
+                self._logo = PhotoImage(file=LOGO_PATH)
+            except Exception as e:
+                print(f"Logo load error: {e}")
+                self._logo = False
+        return self._logo or None
+
+    def report_startup(self):
+        """Record how long startup took; warn when it misses STARTUP_TARGET."""
+        self.startup_seconds = time.perf_counter() - STARTED
+        if self.startup_seconds > STARTUP_TARGET:
+            print(f"Startup took {self.startup_seconds:.2f}s (target {STARTUP_TARGET:.1f}s) "
+                  f"for {len(self.clickers)} tab(s).")
+
+    def index_titles(self):
+        """Rebuild the title -> tab lookup used by chained rows (the first tab wins)."""
+        self.clickers_by_title = {}
+        for clicker in self.clickers:
+            self.clickers_by_title.setdefault(clicker.title.get(), clicker)
+
+    def find_clicker(self, title):
+        return self.clickers_by_title.get(title)
+
+    def input_backend(self, name, priority=0):
+        """A backend for one tab's run; all tabs share one ordered input queue."""
+        if self.dispatcher is None:
+            self.dispatcher = InputDispatcher(create_backend())
+        return self.dispatcher.client(name, priority)
+
+    def mouse_model(self):
+        """The mouse model for the current menu settings, kept while they stay the same so its paths stay cached."""
+        settings = (self.mouseSpeedVar.get(), self.mousePathVar.get(), self.mouseRateVar.get())
+        if self._mouse_model is None or self._mouse_model[0] != settings:
+            self._mouse_model = (settings, MouseModel.from_speed(settings[0], shape=settings[1], rate=settings[2]))
+        return self._mouse_model[1]
+
+    def tracer(self):
+        """The run trace shared by all tabs, or None while Options > Trace Runs is off."""
+        if not self.trace_var.get():
+            return None
+        if self._tracer is None:
+            self._tracer = Tracer(default_trace_path())
+        return self._tracer
+
+    def close_tracer(self):
+        if self._tracer is not None:
+            self._tracer.close()
+            self._tracer = None
+
+    def _toggle_control_server(self):
+        clicker = self.clickers[self.notebook.index("current")]
+        if not self.control_server_var.get():
+            self.stop_control_server()
+            return
+        server = ControlServer(self, token_path=default_token_path())
+        try:
+            server.start()
+        except OSError as e:
+            self.control_server_var.set(False)
+            clicker.show_custom_error("Control Server Error", f"Could not start the control server.\nError: {e}")
+            return
+        self.control_server = server
+        clicker.show_success(f"Control server listening on {server.address}\n"
+                             f"Token: {server.token}\n(also in {server.token_path})")
+
+    def stop_control_server(self):
+        if self.control_server is not None:
+            self.control_server.stop()
+            self.control_server = None
+
+    # Controller interface of control.ControlServer. These run on the server's
+    # thread, so they only read plain attributes and hand every action to the
+    # main loop with after(0, ...), without waiting for it.
+
+    def program_names(self):
+        return list(self.clickers_by_title)
+
+    def latest_engine(self, title):
+        clicker = self.clickers_by_title.get(title)
+        return clicker.engine if clicker is not None else None
+
+    def start_program(self, title):
+        clicker = self.clickers_by_title.get(title)
+        if clicker is None:
+            raise KeyError(title)
+        if clicker.running:
+            raise ValueError(f"'{title}' is already running")
+        self.root.after(0, clicker.start_action)
+
+    def stop_program(self, title):
+        clicker = self.clickers_by_title.get(title)
+        if clicker is None:
+            raise KeyError(title)
+        self.root.after(0, clicker.stop_action)
+
+    def show_queue_stats(self):
+        clicker = self.clickers[self.notebook.index("current")]
+        stats = self.dispatcher.stats() if self.dispatcher is not None else {}
+        if not stats:
+            clicker.show_success("No input has been sent yet.")
+            return
+        lines = [f"{name}: {s['calls']} calls, wait mean {s['wait_mean'] * 1000:.2f} ms, "
+                 f"max {s['wait_max'] * 1000:.2f} ms, max queue {s['max_depth']}"
+                 for name, s in stats.items()]
+        clicker.show_success("\n".join(lines))
+
+    def show_hotkeys(self):
+        clicker = self.clickers[self.notebook.index("current")]
+        lines = [f"{combo}: " + ", ".join(f"{owner.title.get()} ({name})" for owner, name in owners)
+                 for combo, owners in sorted(hotkey_registry.bindings().items())]
+        lines.append(f"{hotkey_registry.hook_count} keyboard hooks installed.")
+        clicker.show_success("\n".join(lines))
+
     def save_configuration(self):
         index = self.notebook.index("current")
         self.clickers[index].save_configuration()
@@ -189,6 +385,10 @@ class MainWindow:
         index = self.notebook.index("current")
         self.clickers[index].load_configuration()   
 
+    def save_profile(self):
+        index = self.notebook.index("current")
+        self.clickers[index].save_profile()
+
     def _create_main_frame(self):
         """Create the main container frame."""
 
@@ -209,7 +409,7 @@ class MainWindow:
 
 
 
-class KeyClickerApp:
+class KeyClickerApp(EngineListener):
     """Main application class for SimpleKeyClicker."""
     #mouseposition = None
     def __init__(self, KeyClickerFrame, MainWindowFrame, ParentClass, config = None):
@@ -218,14 +418,14 @@ class KeyClickerApp:
         self.root = KeyClickerFrame
         self.safe_mode = ParentClass.safe_mode
         self.safe_mode_var = tb.BooleanVar(value=self.safe_mode)
-        self.running = False
+        self.engine = None
+        self.recording = None
         self.rows = []
-        self.thread = None
-        self.error_acknowledged = threading.Event()
-        self.current_theme = "flatly"
+        self.chain_tabs = {}
         self.hotkey='Ctrl+f2'
         self.extrahotkeybuttons=''
         self.title='Test'
+        self.priority = 0
         self.description='Enter your description here'
         self.run_mode_var = tk.StringVar(value="limited")
         self.repetitions_var = tk.IntVar(value=1)
@@ -239,13 +439,18 @@ class KeyClickerApp:
         
         if (config): self.load_configuration(config+".json") #load default config
 
+    @property
+    def running(self):
+        return self.engine is not None and self.engine.running
+
     def _setup_style(self):
-        """Configure the visual theme."""
-        self.style = tb.Style(self.current_theme)
+        """Use the window's shared style; themes apply to every tab."""
+        self.style = self.ParentClass.style
 
     def _titlechange(self, var, index, mode):
         string=self.title.get()
         self.ParentClass.notebook.tab(self.root, text=string)
+        self.ParentClass.index_titles()
         #asd="asd"
         pass
 
@@ -260,14 +465,9 @@ class KeyClickerApp:
         control_frame = tb.Frame(self.top_frame)
         control_frame.pack(fill=BOTH, pady=5)
 
-        try:
-            self.logo_image = PhotoImage(file=LOGO_PATH)
-            logo_label = tb.Label(control_frame, image=self.logo_image)
-            logo_label.image = self.logo_image
-            logo_label.pack(side=LEFT, padx=(5, 20))
-        except Exception as e:
-            print(f"Logo load error: {e}")
-            pass
+        logo = self.ParentClass.logo
+        if logo is not None:
+            tb.Label(control_frame, image=logo).pack(side=LEFT, padx=(5, 20))
         
 
         title_frame = tb.Frame(control_frame)
@@ -337,48 +537,33 @@ class KeyClickerApp:
         add_row_frame = tb.Frame(self.bottom_frame)
         add_row_frame.pack(fill=X)
         tb.Button(add_row_frame, text="Add Row", bootstyle=SUCCESS, command=self._add_row).pack(side=LEFT, padx=5, pady=5)
-
-        self.canvas = tb.Canvas(self.bottom_frame, highlightthickness=0)
-        self.canvas.pack(side=LEFT, fill=BOTH, expand=YES)
-        self.scrollbar = tb.Scrollbar(self.bottom_frame, orient=VERTICAL, command=self.canvas.yview)
-        self.scrollbar.pack(side=RIGHT, fill=Y)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.rows_container = tb.Frame(self.canvas)
-        self.canvas.create_window((0,0), window=self.rows_container, anchor="nw")
-        self.rows_container.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-
-        self._add_row(is_first=True)
+        self.record_button = tb.Button(add_row_frame, text="Record", bootstyle=DANGER, command=self._start_recording)
+        self.record_button.pack(side=LEFT, padx=5, pady=5)
+
+        rows_frame = tb.Frame(self.bottom_frame)
+        rows_frame.pack(fill=BOTH, expand=YES)
+        self.rows = [new_row(is_first=True)]
+        self.row_view = RowView(rows_frame, self.rows, {
+            'capture': self._start_capture,
+            'up': self._move_row_up,
+            'down': self._move_row_down,
+            'duplicate': self._duplicate_row,
+            'remove': self._remove_row,
+        })
 
     def _setup_hotkeys(self, config=None):
-        """Setup global hotkeys."""
-        str1 = self.extrahotkeybuttons.get()
-        str2= self.hotkey.get()
-        if self.extrahotkeybuttons.get() != '': 
-            extrahotkeybuttons1=self.extrahotkeybuttons.get().split(',')
-            hotkey = self.hotkey.get()
-            hotkeys = []
-            i=0
-            for extrahotkey in extrahotkeybuttons1:
-                hotkeys.append(hotkey+"+"+extrahotkey)
-            for hotkey in hotkeys:
-                try:
-                    keyboard.add_hotkey(hotkey, self.start_action)  
-                     
-                except Exception as e:
-                    self.show_custom_error("error setting hotkeys")
-        if str2 !='':
-            try:
-                keyboard.add_hotkey(self.hotkey.get(), self.start_action) 
-            except Exception as e:
-                self.show_custom_error("error setting hotkeys")
-        try:
-            #if config in {'f1', 'f2','f3','f4','f5','f6', 'f7', 'f8','up','down','left','right'}:
- 
-            #keyboard.add_hotkey('ctrl+f2', self.start_action)
-            keyboard.add_hotkey('ctrl+f3', self.stop_action)
-            keyboard.add_hotkey(EMERGENCY_STOP_KEY, self.emergency_stop)
-        except Exception as e:
+        """Bind this tab's global hotkeys, replacing the ones it bound before."""
+        hotkey = self.hotkey.get()
+        combos = [hotkey] if hotkey != '' else []
+        if hotkey != '' and self.extrahotkeybuttons.get() != '':
+            combos += [hotkey + "+" + extrahotkey for extrahotkey in self.extrahotkeybuttons.get().split(',')]
+        failed = hotkey_registry.bind(self, 'start', combos, self.start_action)
+        if failed:
+            self.show_custom_error("Hotkey Error", f"Could not bind these start hotkeys:\n{describe_failures(failed)}")
+        failed = (hotkey_registry.bind(self, 'stop', ['ctrl+f3'], self.stop_action) +
+                  hotkey_registry.bind(self, 'emergency', [EMERGENCY_STOP_KEY], self.emergency_stop))
+        if failed:
+            e = failed[0][1]
             print(f"Warning: Could not set up global hotkeys. You might need root/admin privileges. Error: {e}")
             self.show_custom_error("Hotkey Warning", f"Could not set up global hotkeys (Ctrl+F2/F3, ESC).\nTry running as administrator.\nError: {e}")
 
@@ -388,6 +573,8 @@ class KeyClickerApp:
         self.safe_mode_label.config(text="[SAFE MODE ACTIVE]" if is_safe else "[SAFE MODE OFF]",
                                      foreground="green" if is_safe else "red")
         self.safe_mode = is_safe
+        if self.engine is not None:
+            self.engine.safe_mode = is_safe
 
     def _update_repetition_entry_state(self):
         """Enable/disable the repetition count entry based on radio button selection."""
@@ -399,7 +586,7 @@ class KeyClickerApp:
     def emergency_stop(self):
         """Halt automation immediately."""
         if self.running:
-            self.running = False
+            self.engine.stop()
             self.root.after(0, self._update_status_after_stop, "Status: Emergency Stop", "danger")
             self.show_custom_error("Emergency Stop", "Automation stopped.\nPress Start to begin again.")
 
@@ -409,139 +596,77 @@ class KeyClickerApp:
         self._clear_all_highlights()
 
     def _add_row(self, is_first=False, key="", sleep="0.0", hold="0.0", jump = "0", jumpcount = "0"):
-        """Add a new action row."""
-        row_frame = tb.Frame(self.rows_container)
-
-        highlight_frame = tb.Frame(row_frame, bootstyle="default")
-        highlight_frame.pack(fill=X, padx=2, pady=1) 
-        sub_frame = tb.Frame(highlight_frame)
-        sub_frame.pack(anchor='center', padx=5, pady=2)
-
-        key_var = tb.StringVar(value=key)
-        sleep_var = tb.StringVar(value=sleep)
-        hold_var = tb.StringVar(value=hold)
-        jump_var = tb.StringVar(value=jump)
-        jumpcount_var = tb.StringVar(value=jumpcount)
-
-        status_label = tb.Label(sub_frame, text="", width=3)
-        status_label.pack(side=LEFT)
-
-        tb.Label(sub_frame, text="Key/Button:", width=10).pack(side=LEFT)
-        key_entry = tb.Entry(sub_frame, textvariable=key_var, width=30)
-        key_entry.pack(side=LEFT, padx=5)
-
-        capture_btn = tb.Button(sub_frame, text="Capture", bootstyle=INFO, width=7,
-                                command=lambda k=key_var: self._start_capture(k))
-        capture_btn.pack(side=LEFT, padx=(0, 5))
-
-        tb.Label(sub_frame, text="Hold(s):", width=7).pack(side=LEFT)
-        tb.Entry(sub_frame, textvariable=hold_var, width=6).pack(side=LEFT, padx=(0,5))
-        tb.Label(sub_frame, text="Delay(s):", width=7).pack(side=LEFT)
-        tb.Entry(sub_frame, textvariable=sleep_var, width=6).pack(side=LEFT, padx=(0,5))
-        
-        tb.Label(sub_frame, text="Jump to:", width=8).pack(side=LEFT)
-        tb.Entry(sub_frame, textvariable=jump_var, width=6).pack(side=LEFT, padx=(0,5))
-        tb.Label(sub_frame, text="Jump count:", width=12).pack(side=LEFT)
-        tb.Entry(sub_frame, textvariable=jumpcount_var, width=6).pack(side=LEFT, padx=(0,5))
-
-        button_width = 3
-        up_btn = tb.Button(sub_frame, text="▲", bootstyle=SECONDARY, width=button_width,
-                           command=lambda f=row_frame: self._move_row_up(self._find_row_index(f)))
-        up_btn.pack(side=LEFT, padx=(5, 1))
-
-        down_btn = tb.Button(sub_frame, text="▼", bootstyle=SECONDARY, width=button_width,
-                             command=lambda f=row_frame: self._move_row_down(self._find_row_index(f)))
-        down_btn.pack(side=LEFT, padx=1)
-
-        dup_btn = tb.Button(sub_frame, text="❏", bootstyle=INFO, width=button_width,
-                            command=lambda f=row_frame: self._duplicate_row(self._find_row_index(f)))
-        dup_btn.pack(side=LEFT, padx=1)
-
-        remove_btn = tb.Button(sub_frame, text="X", bootstyle=DANGER, width=button_width,
-                               command=lambda f=row_frame: self._remove_row_by_frame(f))
-        remove_btn.pack(side=LEFT, padx=(1, 5))
-
-        row_data = {
-            'frame': row_frame,
-            'highlight_frame': highlight_frame,
-            'status_label': status_label,
-            'key_var': key_var,
-            'sleep_var': sleep_var,
-            'hold_var': hold_var,
-            'jump_var': jump_var,
-            'jumpcount_var': jumpcount_var,
-            'up_btn': up_btn,
-            'down_btn': down_btn,
-            'dup_btn': dup_btn,
-            'remove_btn': remove_btn,
-            'is_first': is_first
-        }
-        self.rows.append(row_data)
-        self._redraw_rows()
-
-    def _remove_row_by_frame(self, frame):
-        """Removes a row using its frame widget."""
-        index_to_remove = self._find_row_index(frame)
-        if index_to_remove is not None and index_to_remove >= 0:
-            if self.rows[index_to_remove]['is_first']:
+        """Add a new action row at the end and scroll to it."""
+        self.rows.append(new_row(is_first=is_first, key=key, sleep=sleep, hold=hold,
+                                 jump=jump, jumpcount=jumpcount))
+        self.row_view.refresh()
+        self.row_view.see(len(self.rows) - 1)
+
+    def _remove_row(self, index):
+        """Remove the row at the given index."""
+        if 0 <= index < len(self.rows):
+            if self.rows[index]['is_first']:
                  self.show_custom_error("Action Denied", "Cannot remove the initial row.")
                  return
-
-            self.rows[index_to_remove]['frame'].destroy()
-            del self.rows[index_to_remove]
-            self._redraw_rows()
-
-    def _find_row_index(self, frame):
-        """Find the index of a row by its frame."""
-        for i, r in enumerate(self.rows):
-            if r['frame'] == frame:
-                return i
-        return -1
-
-    def _redraw_rows(self):
-        """Redraw all rows in the container and update button states."""
-        for r in self.rows_container.winfo_children():
-            r.pack_forget()
-
-        num_rows = len(self.rows)
-        for i, r in enumerate(self.rows):
-            r['frame'].pack(fill=X, pady=0)
-
-            r['up_btn'].config(state=NORMAL if i > 0 else DISABLED)
-            r['down_btn'].config(state=NORMAL if i < num_rows - 1 else DISABLED)
-            r['remove_btn'].config(state=DISABLED if r['is_first'] else NORMAL)
-
-        self.rows_container.update_idletasks()
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            del self.rows[index]
+            self.row_view.refresh()
 
     def _move_row_up(self, index):
         """Move the row at the given index up by one position."""
         if index > 0 and not self.running:
             self.rows[index], self.rows[index - 1] = self.rows[index - 1], self.rows[index]
-            self._redraw_rows()
+            self.row_view.refresh()
+            self.row_view.see(index - 1)
 
     def _move_row_down(self, index):
         """Move the row at the given index down by one position."""
         if index < len(self.rows) - 1 and not self.running:
             self.rows[index], self.rows[index + 1] = self.rows[index + 1], self.rows[index]
-            self._redraw_rows()
+            self.row_view.refresh()
+            self.row_view.see(index + 1)
 
     def _duplicate_row(self, index):
         """Duplicate the row at the given index and insert it below."""
         if index >= 0 and not self.running:
             original_row = self.rows[index]
-            key = original_row['key_var'].get()
-            sleep = original_row['sleep_var'].get()
-            hold = original_row['hold_var'].get()
-            jump = original_row['jump_var'].get()
-            jumpcount = original_row['jumpcount_var'].get()
-
-            self._add_row(is_first=False, key=key, sleep=sleep, hold=hold, jump=jump, jumpcount=jumpcount)
-
-            new_row_data = self.rows.pop()
-            self.rows.insert(index + 1, new_row_data)
-
-            self._redraw_rows()
+            self.rows.insert(index + 1, new_row(is_first=False, **{f: original_row[f] for f in FIELDS}))
+            self.row_view.refresh()
+            self.row_view.see(index + 1)
+
+    def _start_recording(self):
+        """Record live keyboard and mouse input into rows until ESC is pressed."""
+        if self.running or self.recording is not None:
+            self.show_custom_error("Error", "Cannot record while running.")
+            return
+        self.recording = LiveRecorder(on_stop=lambda: self.root.after(0, self._finish_recording))
+        try:
+            self.recording.start()
+        except Exception as e:
+            self.recording = None
+            self.show_custom_error("Recorder Error", f"Could not start recording.\nError: {e}")
+            return
+        self.record_button.config(state=DISABLED)
+        self.status_label.config(text="Status: Recording (ESC to stop)", bootstyle="danger")
+        self.MainWindowFrame.iconify()
+
+    def _finish_recording(self):
+        """Add the recorded rows; they replace the rows of a tab that has only its empty initial row."""
+        recorded = self.recording.recorder.to_rows()
+        self.recording = None
+        try:
+            self.MainWindowFrame.deiconify()
+        finally:
+            self.record_button.config(state=NORMAL)
+            self.status_label.config(text="Status: Stopped", bootstyle="secondary")
+        if not recorded:
+            return
+        if len(self.rows) == 1 and not self.rows[0]['key']:
+            self.rows.clear()
+        start = len(self.rows)
+        for row in recorded:
+            self.rows.append(new_row(is_first=not self.rows, **row))
+        self.row_view.refresh()
+        self.row_view.see(start)
 
     def show_info(self):
         """Show possible keys and actions in a scrollable window."""
@@ -629,13 +754,11 @@ class KeyClickerApp:
         info_win.wait_window()
 
     def show_custom_error(self, title, message):
-        """Display a modal error dialog and signal acknowledgement."""
+        """Display a modal error dialog."""
         if threading.current_thread() != threading.main_thread():
             self.root.after(0, self.show_custom_error, title, message)
             return
 
-        self.error_acknowledged.clear()
-
         error_win = Toplevel(self.root)
         error_win.title(title)
         error_win.transient(self.root)
@@ -648,16 +771,12 @@ class KeyClickerApp:
 
         frm = tb.Frame(error_win, padding=10)
         frm.pack()
-        try:
-            logo = PhotoImage(file=LOGO_PATH)
-            tb.Label(frm, image=logo).pack()
-            error_win.logo = logo
-        except:
-            pass
+        if self.ParentClass.logo is not None:
+            tb.Label(frm, image=self.ParentClass.logo).pack()
         tb.Label(frm, text=message, padding=10, justify=LEFT, foreground="red", font=("Helvetica", 12)).pack()
 
         ok_button = tb.Button(frm, text="OK", bootstyle=PRIMARY,
-                              command=lambda: [self.error_acknowledged.set(), error_win.destroy()])
+                              command=error_win.destroy)
         ok_button.pack(pady=10)
         self._center_window(error_win)
         ok_button.focus_set()
@@ -681,405 +800,162 @@ class KeyClickerApp:
         if y < 0: y = 0
         window.geometry(f"+{x}+{y}")
 
-    def start_action(self):
-        """Start the automation sequence."""
-        
-        mouse1 = mouse.Controller()
-        self.mouseposition = mouse1.position
+    def _rows_as_config(self):
+        """Return the rows as plain dicts, in the saved configuration schema."""
+        return [{name: r[name] for name in FIELDS} for r in self.rows]
 
-        if self.running:
-            return
+    def _compile(self):
+        """This tab's (program, repetitions); raises ValueError with a message to show."""
         if not self.rows:
-             self.show_custom_error("Error", "Add at least one action row.")
-             return
-
-        for i, r in enumerate(self.rows):
-            if not r['key_var'].get().strip():
-                self.show_custom_error("Error", f"Row {i+1}: Please specify a key/button.")
-                return
-            try:
-                float(r['sleep_var'].get())
-                float(r['hold_var'].get())
-            except ValueError:
-                self.show_custom_error("Error", f"Row {i+1}: Invalid delay or hold time value.")
-                return
-
+            raise ValueError("Add at least one action row.")
+        program = cached_compile_rows(self._rows_as_config())
+        repetitions = None
         if self.run_mode_var.get() == "limited":
             try:
-                reps = self.repetitions_var.get()
-                if reps <= 0:
+                repetitions = self.repetitions_var.get()
+                if repetitions <= 0:
                     raise ValueError("Repetitions must be positive.")
             except (tk.TclError, ValueError) as e:
-                self.show_custom_error("Error", f"Invalid repetition count: Must be a positive whole number.\n({e})")
-                return
+                raise ValueError(f"Invalid repetition count: Must be a positive whole number.\n({e})")
+        return program, repetitions
+
+    def _compile_chains(self, program):
+        """Compile every tab reachable through '>Name' rows, keyed by title.
+
+        Missing tabs are left out; the engine reports them when the row runs.
+        Also records the chained tabs so the progress poll can paint their rows.
+        """
+        chains = {}
+        self.chain_tabs = {}
+        pending = [program]
+        while pending:
+            for ins in pending.pop():
+                if ins.op != OP_CHAIN or ins.text in chains:
+                    continue
+                clicker = self.ParentClass.find_clicker(ins.text)
+                if clicker is None:
+                    continue
+                try:
+                    chains[ins.text] = clicker._compile()
+                except ValueError as e:
+                    raise ValueError(f"Tab \"{ins.text}\": {e}")
+                self.chain_tabs[ins.text] = clicker
+                pending.append(chains[ins.text][0])
+        return chains
 
-        self.running = True
-        self.status_label.config(text="Status: Running", bootstyle="success")
+    def start_action(self):
+        """Compile the rows and start the automation sequence."""
+        if self.running:
+            return
+        try:
+            program, repetitions = self._compile()
+            chains = self._compile_chains(program)
+        except ValueError as e:
+            self.show_custom_error("Error", str(e))
+            return
+        try:
+            tracer = self.ParentClass.tracer()
+        except OSError as e:
+            self.show_custom_error("Trace Error", f"Could not open the run trace:\n{e}")
+            return
 
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
-        self.thread.start()
+        # Everything the engine needs is captured here, so it never reads Tk variables.
+        self.engine = Engine(program, repetitions=repetitions,
+                             mouse_speed=self.ParentClass.mouse_model(),
+                             type_interval=self.ParentClass.typeIntervalVar.get(),
+                             error_policy=parse_error_policy(self.ParentClass.errorPolicyVar.get()),
+                             safe_mode=self.safe_mode, listener=self,
+                             timer=Scheduler() if self.ParentClass.precise_timing_var.get() else SleepTimer(),
+                             profiler=Profiler(program) if self.ParentClass.profile_var.get() else None,
+                             chains=chains, name=self.title.get(), tracer=tracer,
+                             backend=self.ParentClass.input_backend(self.title.get(), self.priority))
+        self._setup_hotkeys()
+        self.status_label.config(text="Status: Running", bootstyle="success")
+        self._shown_loop = 0
+        self._shown_row = (None, -1, None)
+        self.engine.start()
+        self.root.after(PROGRESS_INTERVAL_MS, self._poll_progress)
 
     def stop_action(self):
         """Stop the automation sequence."""
         if not self.running:
              return
-        self.running = False
+        self.engine.stop()
         if threading.current_thread() == threading.main_thread():
             self._update_status_after_stop("Status: Stopped", "secondary")
         else:
             self.root.after(0, self._update_status_after_stop, "Status: Stopped", "secondary")
 
-    def _run_loop(self):
-        """Main automation loop with repetition control."""
-        gettrace = getattr(sys, 'gettrace', None)
-        self._setup_hotkeys()
-        run_mode = self.run_mode_var.get()
-        repetitions_to_run = 0
-        if run_mode == "limited":
-            try:
-                repetitions_to_run = self.repetitions_var.get()
-                if repetitions_to_run <= 0:
-                    raise ValueError("Repetitions must be positive.")
-            except (tk.TclError, ValueError):
-                 self.root.after(0, self.show_custom_error, "Internal Error", "Invalid repetition count during run.")
-                 self.root.after(0, self.stop_action)
-                 return
+    def _poll_progress(self):
+        """Repaint only what changed since the last frame (main thread).
 
-        try:
-            loop_count = 0
-            if run_mode == "limited":
-                for i in range(repetitions_to_run):
-                    if not self.running: break
-                    loop_count = i + 1
-                    status_text = f"Status: Running ({loop_count}/{repetitions_to_run})"
-                    self.root.after(0, lambda s=status_text: self.status_label.config(text=s, bootstyle="success"))
-                    j=0
-                    k=0
-                    while (j<len(self.rows)):
-                        if not self.running: break
-                        self.root.after(0, self._update_row_highlight, j)
-
-                        r = self.rows[j]
-
-                        key = r['key_var'].get().strip()
-                        delay_str = r['sleep_var'].get()
-                        hold_str = r['hold_var'].get()
-                        jump_str = r['jump_var'].get()
-                        jumpcount_str = r['jumpcount_var'].get()
-                        try:
-                            delay = float(delay_str)
-                            hold_time = float(hold_str)
-                            jump = int(jump_str)
-                            jumpcount = int(jumpcount_str)
-                        except ValueError:
-                            err_msg = f"Invalid number in Row {j+1} ('{delay_str}' or '{hold_str}'). Stopping."
-                            self.root.after(0, self.show_custom_error, "Runtime Error", err_msg)
-                            self.running = False
-                            break
-
-                        self.root.after(0, lambda row=r: row['status_label'].config(text="►"))
-                        time.sleep(0.001)
-
-                        if (jumpcount>0 and jump>=0 and k<jumpcount):
-                            k+=1
-                            j = jump - 1
-                            pass
-                        action_success = self._perform_action(key, hold_time)
-                        #action_success = 1
-
-                        if not action_success or not self.running:
-                            self.running = False
-                            break
-
-                        self.root.after(0, lambda row=r: row['status_label'].config(text="✓"))
-                        time.sleep(delay)
-                        self.root.after(0, lambda row=r: row['status_label'].config(text=""))
-                        self.root.after(0, lambda row=r: row['highlight_frame'].configure(bootstyle="default"))
-                        j+=1
-                    if not self.running: break
+        The engine publishes its position into engine.progress; polling it at
+        a fixed rate keeps the Tk event queue empty however fast rows run.
+        """
+        engine = self.engine
+        if engine is None or not engine.running:
+            return
+        progress = engine.progress
+        chain, index, phase, loop = progress.chain, progress.index, progress.phase, progress.loop
 
+        if loop != self._shown_loop and loop > 0:
+            if progress.repetitions is None:
+                status_text = f"Status: Running (Loop {loop})"
             else:
-                while self.running:
-                    loop_count += 1
-                    status_text = f"Status: Running (Loop {loop_count})"
-                    self.root.after(0, lambda s=status_text: self.status_label.config(text=s, bootstyle="success"))
-                    k = 0
-                    j = 0
-                    while (j<len(self.rows)):  #r in enumerate(self.rows)
-                        
-                        r = self.rows[j]
-                        if not self.running: break
-                        self.root.after(0, self._update_row_highlight, j)
-
-                        key = r['key_var'].get().strip()
-                        delay_str = r['sleep_var'].get()
-                        hold_str = r['hold_var'].get()
-                        jump_str = r['jump_var'].get()
-                        jumpcount_str = r['jumpcount_var'].get()
-                        try:
-                            delay = float(delay_str)
-                            hold_time = float(hold_str)
-                            jump = int(jump_str)
-                            jumpcount = int(jumpcount_str)
-                        except ValueError:
-                            err_msg = f"Invalid number in Row {j+1} ('{delay_str}' or '{hold_str}'). Stopping."
-                            self.root.after(0, self.show_custom_error, "Runtime Error", err_msg)
-                            self.running = False
-                            break
-
-                        self.root.after(0, lambda row=r: row['status_label'].config(text="►"))
-                        time.sleep(0.001)
-
-                        #action_success = 1
-                        if (jumpcount>0 and jump>=0 and k<jumpcount):
-                            k+=1
-                            j = jump - 1
-                            pass
-                        action_success = self._perform_action(key, hold_time)
-
-                        if not action_success or not self.running:
-                            self.running = False
-                            break
-
-                        self.root.after(0, lambda row=r: row['status_label'].config(text="✓"))
-                        time.sleep(delay)
-                        self.root.after(0, lambda row=r: row['status_label'].config(text=""))
-                        self.root.after(0, lambda row=r: row['highlight_frame'].configure(bootstyle="default"))
-                        j+=1
-                    if not self.running: break
+                status_text = f"Status: Running ({loop}/{progress.repetitions})"
+            self.status_label.config(text=status_text, bootstyle="success")
+            self._shown_loop = loop
 
-        finally:
-            self.root.after(0, self._clear_all_highlights)
-            current_status = self.status_label.cget("text")
-            if self.running or "Emergency Stop" not in current_status:
-                 final_status = "Status: Completed" if run_mode == "limited" and loop_count == repetitions_to_run and self.running else "Status: Stopped"
-                 self.root.after(0, self._update_status_after_stop, final_status, "secondary")
-
-            if run_mode == "limited" and loop_count == repetitions_to_run:
-                self.running = False
-
-    def _update_row_highlight(self, current_index):
-        """Highlight the current row (runs in main thread)."""
-        if not self.running: return
-        for i, row in enumerate(self.rows):
-            style = "info" if i == current_index else "default"
-            try:
-                if row['highlight_frame'].winfo_exists():
-                    row['highlight_frame'].configure(bootstyle=style)
-            except Exception:
-                pass
+        if (chain, index, phase) != self._shown_row:
+            old_chain, old_index, _ = self._shown_row
+            old_tab, tab = self._tab_of(old_chain), self._tab_of(chain)
+            if (old_chain, old_index) != (chain, index) and old_tab is not None and old_index >= 0:
+                old_tab.row_view.paint(old_index, "default", "")
+            if tab is not None and index >= 0 and phase in (PHASE_ACTION, PHASE_DELAY):
+                tab.row_view.paint(index, "info", "►" if phase == PHASE_ACTION else "✓")
+            self._shown_row = (chain, index, phase)
 
-    def _clear_all_highlights(self):
-        """Clear all row highlights and statuses (runs in main thread)."""
-        for row in self.rows:
-             try:
-                if row['highlight_frame'].winfo_exists():
-                    row['highlight_frame'].configure(bootstyle="default")
-                if row['status_label'].winfo_exists():
-                    row['status_label'].config(text="")
-             except Exception:
-                 pass
-
-    def _perform_action(self, key, hold_time):
-        """Execute a key/mouse action. Returns True on success, False on handled failure."""
-        if not self.running: return False
-
-        if '>' in key: 
-            chain = key.split('>')[1]
-            foundclicker = next((clicker for clicker in self.ParentClass.clickers if clicker.title.get() == chain), None)
-            if foundclicker: 
-                foundclicker.start_action()
-                while foundclicker.running:
-                    time.sleep(0.005)
-                return True
-            else: 
-                error_message = f"Tab \"{chain}\" not found.\nAutomation stopped."
-                self.root.after(0, self.show_custom_error, "Executing chain failed", error_message)
-                self.error_acknowledged.wait()
-                if self.running:
-                    self.root.after(0, self.stop_action)
-                return False
-            
-        if (key=="resetmouse"):
-            pyautogui.moveTo(self.mouseposition[0], self.mouseposition[1], duration=self.ParentClass.mouseSpeedVar.get())
-            return True
-
-        down = False
-        up = False
-        if key[0]=='!': 
-            return True
-        if key[0]=='+': 
-            key = key[1:]
-            down = True
-        if key[0]=='-':
-            key = key[1:]
-            up = True
-
-        is_dangerous_single_key = key.lower() in DANGEROUS_KEYS
-        is_system_command = any(cmd in key.lower() for cmd in SYSTEM_COMMANDS)
-
-        if self.safe_mode and (is_dangerous_single_key or is_system_command):
-            error_message = f"Action '{key}' is blocked in safe mode."
-            self.root.after(0, self.show_custom_error, "Safe Mode Block", error_message)
-            self.error_acknowledged.wait()
-            if self.running:
-                self.root.after(0, self.stop_action)
-            return False
-
-        if '(' in key and ')' in key:
-            try:
-                cmd = key.split('(')[0].lower()
-                args_str = key[key.index('(')+1:key.rindex(')')]
-                args = [a.strip() for a in args_str.split(',')]
-
-                if cmd in {'click', 'rclick', 'mclick', 'moveto'}:
-                    if len(args)!=2: raise ValueError("mouse events require 2 arguments (x, y)")
-                    x, y = map(int, args)
-                    if '+' in args_str or '-' in args_str:
-                        mouse1 = mouse.Controller()
-                        currentmouseposition = mouse1.position
-                        
-                        x += currentmouseposition[0]
-                        y += currentmouseposition[1]
-                if cmd in {'click', 'rclick', 'mclick', '+click', '-click'}:
-                    pydirectinput.moveTo(x, y)
-                    time.sleep(0.005)
-                    button_map = {'click': 'left', 'rclick': 'right', 'mclick': 'middle'}
-                    button = button_map[cmd]
-                    if hold_time > 0:
-                        pydirectinput.mouseDown(button=button)
-                        time.sleep(hold_time)
-                        pydirectinput.mouseUp(button=button)
-                    else:
-                        if (down):
-                            pydirectinput.mouseDown(button=button)
-                        elif(up):
-                            pydirectinput.mouseUp(button=button)
-                        else:
-                            pydirectinput.click(button=button)
-                    return True
-                
-                elif cmd == 'moveto':
-                    #x, y = map(int, args)
-                    pyautogui.moveTo(x, y, duration=self.ParentClass.mouseSpeedVar.get())
-                    return True
-
-                elif cmd == 'waitcolor':
-                    if len(args) == 5:
-                        r_val, g_val, b_val, x, y = map(int, args)
-                        print(f"[DEBUG] Performing waitcolor({r_val},{g_val},{b_val},{x},{y}) timeout={WAITCOLOR_TIMEOUT}s")
-                        found = self._wait_for_color(r_val, g_val, b_val, x, y, timeout=WAITCOLOR_TIMEOUT)
-
-                        if not found and self.running:
-                            error_message = f"Color ({r_val},{g_val},{b_val}) not found at ({x},{y}) within {WAITCOLOR_TIMEOUT}s.\\nAutomation stopped."
-                            self.root.after(0, self.show_custom_error, "Wait Color Failed", error_message)
-                            self.error_acknowledged.wait()
-                            if self.running:
-                                self.root.after(0, self.stop_action)
-                            return False
-                        elif not self.running:
-                            return False
-                        else:
-                            return True
-                    else:
-                         raise ValueError("waitcolor requires 5 arguments (r,g,b,x,y)")
+        self.root.after(PROGRESS_INTERVAL_MS, self._poll_progress)
 
-            except Exception as e:
-                 error_message = f"Error processing action '{key}':\\n{type(e).__name__}: {e}\\nAutomation stopped."
-                 self.root.after(0, self.show_custom_error, "Action Error", error_message)
-                 self.error_acknowledged.wait()
-                 if self.running:
-                     self.root.after(0, self.stop_action)
-                 return False
+    def _tab_of(self, chain):
+        """The tab whose rows progress.index refers to while chain (None for this tab) runs."""
+        return self if chain is None else self.chain_tabs.get(chain)
 
-        else:
-            k = key.lower()
-            try:
-                if k == "click":
-                    if hold_time > 0:
-                        pydirectinput.mouseDown()
-                        time.sleep(hold_time)
-                        pydirectinput.mouseUp()
-                    else:
-                        if(down):
-                            pydirectinput.mouseDown()
-                        elif(up):
-                            pydirectinput.mouseUp()
-                        else:
-                            pydirectinput.click()
-                elif k == "rclick":
-                    if hold_time > 0:
-                        pydirectinput.mouseDown(button='right')
-                        time.sleep(hold_time)
-                        pydirectinput.mouseUp(button='right')
-                    else:
-                        pydirectinput.rightClick()
-                elif k == "mclick":
-                    if hold_time > 0:
-                        pydirectinput.mouseDown(button='middle')
-                        time.sleep(hold_time)
-                        pydirectinput.mouseUp(button='middle')
-                    else:
-                        pydirectinput.middleClick()
-                elif k in SINGLE_ACTION_KEYS:
-                    if hold_time > 0:
-                        pydirectinput.keyDown(key)
-                        time.sleep(hold_time)
-                        pydirectinput.keyUp(key)
-                    else:
-                        if(down):
-                            pydirectinput.keyDown(key)
-                        elif(up):
-                            pydirectinput.keyUp(key)
-                        else:
-                            pydirectinput.press(key)
-                elif len(key) == 1:
-                    if hold_time > 0:
-                        pydirectinput.keyDown(key)
-                        time.sleep(hold_time)
-                        pydirectinput.keyUp(key)
-                    else:
-                        if(down):
-                            pydirectinput.keyDown(key)
-                        elif(up):
-                            pydirectinput.keyUp(key)
-                        else:
-                            pydirectinput.press(key)
-                else:
-                    pyautogui.write(key, interval=0.05)
+    def on_error(self, title, message):
+        """Show the error; the engine stops without waiting for the dialog."""
+        self.root.after(0, self.show_custom_error, title, message)
 
-            except Exception as e:
-                error_message = f"Error performing action '{key}':\\n{type(e).__name__}: {e}\\nAutomation stopped."
-                self.root.after(0, self.show_custom_error, "Action Error", error_message)
-                self.error_acknowledged.wait()
-                if self.running:
-                    self.root.after(0, self.stop_action)
-                return False
+    def on_row_error(self, index, title, message, action):
+        self.root.after(0, self._show_row_error, index, title, action)
 
-        return True
+    def _show_row_error(self, index, title, action):
+        if self.running:
+            self.status_label.config(text=f"Status: Running (row {index + 1}: {title}, {action})",
+                                     bootstyle="warning")
 
-    def _wait_for_color(self, r_val, g_val, b_val, x, y, timeout=30):
-        """Wait for a color at a position. Returns True if found, False if timeout/stopped."""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if not self.running:
-                return False
-            if self._check_pixel_color(r_val, g_val, b_val, x, y):
-                return True
-            time.sleep(0.1)
+    def on_finish(self, result):
+        self.root.after(0, self._finish_run, result)
 
-        return False
+    def _finish_run(self, result):
+        """Set the final status unless an emergency stop already did (main thread)."""
+        self._clear_all_highlights()
+        current_status = self.status_label.cget("text")
+        latency = self.engine.stop_latency if self.engine is not None else None
+        if result == RESULT_COMPLETED or "Emergency Stop" not in current_status:
+            final_status = "Status: Completed" if result == RESULT_COMPLETED else "Status: Stopped"
+            if latency is not None:
+                final_status += f" ({latency * 1000:.1f} ms)"
+            self._update_status_after_stop(final_status, "secondary")
+        elif latency is not None:
+            self.status_label.config(text=f"{current_status} ({latency * 1000:.1f} ms)")
 
-    def _check_pixel_color(self, r_val, g_val, b_val, x, y):
-        """Check if a pixel matches a color within tolerance."""
-        try:
-            x, y = int(x), int(y)
-            pixel = ImageGrab.grab(bbox=(x, y, x+1, y+1)).getpixel((0, 0))
-            return (abs(pixel[0] - r_val) <= COLOR_MATCH_TOLERANCE and
-                    abs(pixel[1] - g_val) <= COLOR_MATCH_TOLERANCE and
-                    abs(pixel[2] - b_val) <= COLOR_MATCH_TOLERANCE)
-        except Exception:
-            return False
+    def _clear_all_highlights(self):
+        """Clear all row highlights and statuses (runs in main thread)."""
+        for tab in [self] + list(self.chain_tabs.values()):
+            try:
+                tab.row_view.clear_highlights()
+            except Exception:
+                pass
 
     def save_configuration(self):
         """Save configuration to a JSON file."""
@@ -1087,7 +963,8 @@ class KeyClickerApp:
             self.show_custom_error("Error", "No configuration to save.")
             return
         file_path = filedialog.asksaveasfilename(defaultextension=".json",
-                                                 filetypes=[("JSON files", "*.json")],
+                                                 filetypes=[("JSON files", "*.json"),
+                                                            ("Compact macro files", "*.skm *.skm.gz")],
                                                  title="Save Configuration",
                                                  initialfile=self.title.get())
         if not file_path:
@@ -1100,36 +977,52 @@ class KeyClickerApp:
                 'description': self.description.get(),
                 'hotkey': self.hotkey.get(),
                 'extrahotkeybuttons':self.extrahotkeybuttons.get(),
-                'rows': [{'key': r['key_var'].get(),
-                           'sleep': r['sleep_var'].get(),
-                           'hold': r['hold_var'].get(),
-                           'jump': r['jump_var'].get(),
-                           'jumpcount': r['jumpcount_var'].get(),
-                           }
-                          for r in self.rows]
+                'priority': self.priority,
+                'rows': self._rows_as_config()
             }
-            with open(file_path, 'w') as f:
-                json.dump(config, f, indent=4)
+            if is_macro_file(file_path):
+                write_macro(file_path, config)
+            else:
+                with open(file_path, 'w') as f:
+                    json.dump(config, f, indent=4)
             self.show_success("Configuration saved!")
         except Exception as e:
             self.show_custom_error("Save Error", f"Failed to save configuration:\n{str(e)}")
 
+    def save_profile(self):
+        """Save the last profiled run of this tab as JSON or CSV."""
+        profiler = self.engine.profiler if self.engine is not None else None
+        if profiler is None:
+            self.show_custom_error("Error", "No profile recorded. Enable Options > Profile Runs and run first.")
+            return
+        if self.running:
+            self.show_custom_error("Error", "Stop the automation before saving its profile.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("JSON files", "*.json"), ("CSV files", "*.csv")],
+                                                 title="Save Run Profile",
+                                                 initialfile=f"{self.title.get()}-profile")
+        if not file_path:
+            return
+        try:
+            profiler.write(file_path)
+            self.show_success("Profile saved!")
+        except Exception as e:
+            self.show_custom_error("Save Error", f"Failed to save profile:\n{str(e)}")
+
     def load_configuration(self,file_path = 0):
         """Load configuration from a JSON file."""
         if self.running:
             self.show_custom_error("Error", "Stop the current action before loading.")
             return
 
-        if (not file_path): file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")],
+        if (not file_path): file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json"),
+                                                                          ("Compact macro files", "*.skm *.skm.gz")],
                                                title="Load Configuration")
         if not file_path:
             return
         try:
-            with open(file_path, 'r') as f:
-                config = json.load(f)
-
-            if 'rows' not in config or not isinstance(config['rows'], list):
-                 raise ValueError("Invalid configuration file format.")
+            config = cached_load_config(file_path)
 
             title = config.get('title','test')
             description = config.get('description','')
@@ -1137,6 +1030,10 @@ class KeyClickerApp:
             extrahotkeybuttons = config.get('extrahotkeybuttons','')
             loaded_run_mode = config.get('run_mode', 'infinite')
             loaded_repetitions = config.get('repetitions', 1)
+            try:
+                self.priority = int(config.get('priority', 0))
+            except (ValueError, TypeError):
+                self.priority = 0
             self.run_mode_var.set(loaded_run_mode)
             self.title.set(title)
             self.description.set(description)
@@ -1148,32 +1045,16 @@ class KeyClickerApp:
                 self.repetitions_var.set(10)
             self._update_repetition_entry_state()
 
-            for r in reversed(self.rows):
-                r['frame'].destroy()
-            self.rows.clear()
-
-            if not config['rows']:
-                 self._add_row(is_first=True)
-            else:
-                for i, row_config in enumerate(config['rows']):
-                    self._add_row(is_first=(i == 0),
-                                  key=row_config.get('key', ''),
-                                  sleep=row_config.get('sleep', '0.0'),
-                                  hold=row_config.get('hold', '0.0'),
-                                  jump=row_config.get('jump', '0'),
-                                  jumpcount=row_config.get('jumpcount', '0')
-                                  )
-
-            self._redraw_rows()
+            rows = [new_row(is_first=(i == 0), **row_config)
+                    for i, row_config in enumerate(config['rows'])]
+            self.rows = rows or [new_row(is_first=True)]
+            self.row_view.set_rows(self.rows)
             self._setup_hotkeys()
             #self.show_success("Configuration loaded!")
 
         except Exception as e:
-            for r in reversed(self.rows):
-                 r['frame'].destroy()
-            self.rows.clear()
-            self._add_row(is_first=True)
-            self._redraw_rows()
+            self.rows = [new_row(is_first=True)]
+            self.row_view.set_rows(self.rows)
             self.show_custom_error("Load Error", f"Failed to load configuration:\n{str(e)}")
 
     def show_success(self, message):
@@ -1188,19 +1069,15 @@ class KeyClickerApp:
         success_win.grab_set()
         frm = tb.Frame(success_win, padding=10)
         frm.pack()
-        try:
-            logo = PhotoImage(file=LOGO_PATH)
-            tb.Label(frm, image=logo).pack()
-            success_win.logo = logo
-        except:
-            pass
+        if self.ParentClass.logo is not None:
+            tb.Label(frm, image=self.ParentClass.logo).pack()
         tb.Label(frm, text=message, padding=10, justify=LEFT, foreground="green", font=("Helvetica", 12)).pack()
         ok_button = tb.Button(frm, text="OK", bootstyle=SUCCESS, command=success_win.destroy)
         ok_button.pack(pady=10)
         self._center_window(success_win)
         ok_button.focus_set()
 
-    def _start_capture(self, key_var):
+    def _start_capture(self, index):
         """Start capturing mouse coordinates and color."""
         if self.running:
             self.show_custom_error("Error", "Cannot capture while running.")
@@ -1230,10 +1107,11 @@ class KeyClickerApp:
             self.root.deiconify()
 
         if data:
-            self._show_capture_options(data, key_var)
+            self._show_capture_options(data, index)
 
     def _capture_data(self):
         """Capture mouse coordinates and color using pynput."""
+        from pynput import mouse
         data = {'x': None, 'y': None, 'color': None}
         listener = None
         def on_click(x, y, button, pressed):
@@ -1241,11 +1119,12 @@ class KeyClickerApp:
             if button == mouse.Button.left and pressed:
                 data['x'] = int(x)
                 data['y'] = int(y)
-                try:
-                    data['color'] = pyautogui.pixel(data['x'], data['y'])
-                except Exception as e:
-                    print(f"Warning: Could not get pixel color at ({data['x']},{data['y']}). Error: {e}")
+                pixels = self.ParentClass.capture_sampler.sample([(data['x'], data['y'])])
+                if pixels is None:
+                    print(f"Warning: Could not get pixel color at ({data['x']},{data['y']}).")
                     data['color'] = (0, 0, 0)
+                else:
+                    data['color'] = tuple(pixels[0])
                 if listener:
                     listener.stop()
                 return False
@@ -1256,7 +1135,7 @@ class KeyClickerApp:
 
         return data if data['x'] is not None else None
 
-    def _show_capture_options(self, data, key_var):
+    def _show_capture_options(self, data, index):
         """Show options for captured data."""
         options_win = Toplevel(self.root)
         options_win.title("Capture Options")
@@ -1282,7 +1161,7 @@ class KeyClickerApp:
                  font=("Helvetica", 11)).pack(side=LEFT)
 
         def insert_command(cmd):
-            key_var.set(cmd)
+            self.row_view.set_field(index, 'key', cmd)
             options_win.destroy()
 
         x, y = data['x'], data['y']
@@ -1312,14 +1191,14 @@ class KeyClickerApp:
 
     def _toggle_theme(self):
         """Toggle between light ('flatly') and dark ('darkly') themes."""
-        if self.current_theme == "flatly":
+        if self.ParentClass.current_theme == "flatly":
             new_theme = "darkly"
         else:
             new_theme = "flatly"
 
         try:
             self.style.theme_use(new_theme)
-            self.current_theme = new_theme
+            self.ParentClass.current_theme = new_theme
         except Exception as e:
             print(f"Error changing theme: {e}")
             self.show_custom_error("Theme Error", f"Failed to switch theme to '{new_theme}'.\\n{e}")
@@ -1337,7 +1216,10 @@ if __name__ == "__main__":
          except Exception:
             pass
 
-    root = tb.Window()
+    root = tb.Window(themename=THEME)
     #app = KeyClickerApp(root)
     app = MainWindow(root)
-    root.mainloop()
\ No newline at end of file
+    root.after_idle(app.report_startup)
+    root.mainloop()
+    app.stop_control_server()
+    app.close_tracer()
\ No newline at end of file
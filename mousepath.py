@@ -0,0 +1,176 @@
+"""Mouse trajectories for moveto and resetmouse.
+
+A MouseModel decides how long a move takes (a fixed time per move, or a
+speed in pixels per second) and what path it follows:
+
+- 'linear': a straight line at constant speed, as pyautogui's tween moved;
+- 'bezier': a gentle curve that accelerates and slows down at the ends;
+- 'human': a curve with random bend and a little tremor that fades out
+  before the target.
+
+Paths are computed once per distance, duration and shape and kept in a
+small cache as offsets from the start point, so replaying a move only
+adds the start position to each point. The engine replays the points on
+its timer at the model's sample rate.
+
+Speeds are written as seconds per move ('0.05') or pixels per second
+('2000px/s').
+"""
+import math
+import random
+import threading
+from collections import OrderedDict
+
+SHAPES = ('linear', 'bezier', 'human')
+DEFAULT_SHAPE = 'linear'
+DEFAULT_RATE = 125          # points per second of movement
+MIN_DURATION = 0.02         # pixel-per-second speeds never move faster than this...
+MAX_DURATION = 2.0          # ...or slower than this
+CACHE_SIZE = 256            # cached paths
+HUMAN_VARIANTS = 4          # different human paths per distance and duration
+
+_PX_PER_SECOND = 'px/s'
+
+
+def parse_speed(text):
+    """(seconds, pixels_per_second) from '0.05' or '2000px/s'; the other one is None.
+
+    Raises ValueError for anything else.
+    """
+    text = str(text).strip().lower().replace(' ', '')
+    if text.endswith(_PX_PER_SECOND):
+        value = float(text[:-len(_PX_PER_SECOND)])
+        if value <= 0:
+            raise ValueError(f"mouse speed must be positive: {text!r}")
+        return None, value
+    value = float(text)
+    if value < 0:
+        raise ValueError(f"mouse move time cannot be negative: {text!r}")
+    return value, None
+
+
+def _ease(t):
+    """Minimum-jerk position at time t in [0, 1]: slow start, fast middle, slow end."""
+    return t * t * t * (10 - 15 * t + 6 * t * t)
+
+
+def _bezier(t, p1, p2, end):
+    """Cubic Bezier from (0, 0) through controls p1, p2 to end."""
+    u = 1 - t
+    a, b, c = 3 * u * u * t, 3 * u * t * t, t * t * t
+    return (a * p1[0] + b * p2[0] + c * end[0],
+            a * p1[1] + b * p2[1] + c * end[1])
+
+
+def _controls(dx, dy, bend1, bend2):
+    """Bezier control points a third and two thirds along, pushed sideways by bend * distance."""
+    nx, ny = -dy, dx
+    return ((dx / 3 + nx * bend1, dy / 3 + ny * bend1),
+            (2 * dx / 3 + nx * bend2, 2 * dy / 3 + ny * bend2))
+
+
+def trajectory(dx, dy, count, shape=DEFAULT_SHAPE, seed=0):
+    """count points from just after (0, 0) to exactly (dx, dy), as integer offsets.
+
+    seed makes the 'human' shape reproducible.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"unknown mouse path {shape!r}; use one of {', '.join(SHAPES)}")
+    points = []
+    if shape == 'linear':
+        for i in range(1, count + 1):
+            t = i / count
+            points.append((round(dx * t), round(dy * t)))
+    elif shape == 'bezier':
+        p1, p2 = _controls(dx, dy, 0.1, 0.05)
+        for i in range(1, count + 1):
+            x, y = _bezier(_ease(i / count), p1, p2, (dx, dy))
+            points.append((round(x), round(y)))
+    else:
+        rng = random.Random(seed)
+        p1, p2 = _controls(dx, dy, rng.uniform(-0.25, 0.25), rng.uniform(-0.15, 0.15))
+        tremor = min(3.0, math.hypot(dx, dy) * 0.01)
+        for i in range(1, count + 1):
+            t = i / count
+            x, y = _bezier(_ease(t), p1, p2, (dx, dy))
+            fade = tremor * (1 - t)
+            points.append((round(x + rng.gauss(0, fade)), round(y + rng.gauss(0, fade))))
+    points[-1] = (dx, dy)
+    return tuple(points)
+
+
+class MouseModel:
+    """How moves are timed and shaped.
+
+    seconds is the time of every move; if pixels_per_second is given
+    instead, the time follows the distance, clamped to
+    [MIN_DURATION, MAX_DURATION]. rate is the number of cursor updates per
+    second of movement. One model can be shared by engines on several threads.
+    """
+
+    def __init__(self, seconds=0.05, pixels_per_second=None, shape=DEFAULT_SHAPE,
+                 rate=DEFAULT_RATE, cache_size=CACHE_SIZE):
+        if shape not in SHAPES:
+            raise ValueError(f"unknown mouse path {shape!r}; use one of {', '.join(SHAPES)}")
+        if rate <= 0:
+            raise ValueError("mouse sample rate must be positive")
+        self.seconds = seconds
+        self.pixels_per_second = pixels_per_second
+        self.shape = shape
+        self.rate = rate
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._variant = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_speed(cls, speed, shape=DEFAULT_SHAPE, rate=DEFAULT_RATE):
+        """A model from a speed string (see parse_speed) or a number of seconds."""
+        if isinstance(speed, (int, float)):
+            return cls(seconds=float(speed), shape=shape, rate=rate)
+        seconds, pixels_per_second = parse_speed(speed)
+        return cls(seconds=seconds, pixels_per_second=pixels_per_second, shape=shape, rate=rate)
+
+    def duration(self, distance):
+        """Seconds a move over distance pixels takes."""
+        if self.pixels_per_second is None:
+            return self.seconds
+        if distance <= 0:
+            return 0.0
+        return min(MAX_DURATION, max(MIN_DURATION, distance / self.pixels_per_second))
+
+    def plan(self, start, end, duration=None):
+        """(points, interval): absolute points to visit every interval seconds.
+
+        duration overrides the model's timing; a move that takes no time is
+        a single point.
+        """
+        x0, y0 = start
+        dx, dy = end[0] - x0, end[1] - y0
+        if duration is None:
+            duration = self.duration(math.hypot(dx, dy))
+        count = int(duration * self.rate + 0.5)
+        if count <= 1 or (dx == 0 and dy == 0):
+            return ((end[0], end[1]),), 0.0
+        offsets = self._offsets(dx, dy, count)
+        return tuple((x0 + x, y0 + y) for x, y in offsets), duration / count
+
+    def _offsets(self, dx, dy, count):
+        with self._lock:
+            variant = 0
+            if self.shape == 'human':
+                variant = self._variant = (self._variant + 1) % HUMAN_VARIANTS
+            key = (dx, dy, count, self.shape, variant)
+            cache = self._cache
+            offsets = cache.get(key)
+            if offsets is not None:
+                cache.move_to_end(key)
+                self.hits += 1
+                return offsets
+            self.misses += 1
+            offsets = cache[key] = trajectory(dx, dy, count, self.shape, seed=repr(key))
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+            return offsets
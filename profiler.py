@@ -0,0 +1,205 @@
+"""Opt-in execution profiler.
+
+Pass a Profiler to Engine to record, for every row, how long its action
+took, its planned and actual delay, and for screen waits the number of
+captures and the time to match. Backend calls are timed per method. The
+result is kept as log-scale histograms, so memory does not grow with the
+number of iterations, and can be written as JSON or CSV.
+"""
+import bisect
+import csv
+import json
+import time
+
+# Bucket upper edges: 4 per decade from 1 us to 100 s.
+BUCKET_EDGES = [10 ** (e / 4) for e in range(-24, 9)]
+
+
+class Histogram:
+    """Count, sum, min, max and log-scale buckets of durations in seconds."""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKET_EDGES) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect.bisect_left(BUCKET_EDGES, value)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile (capped at max)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                edge = BUCKET_EDGES[i] if i < len(BUCKET_EDGES) else self.max
+                return min(edge, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count, 'total': self.total, 'mean': self.mean,
+                'min': self.min or 0.0, 'max': self.max or 0.0,
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                'buckets': {f"{edge:.3g}": n for edge, n in zip(BUCKET_EDGES + [float('inf')], self.buckets) if n}}
+
+
+class RowStats:
+    """Everything recorded for one row."""
+
+    __slots__ = ('source', 'action', 'delay', 'planned_delay', 'polls', 'waits', 'wait_timeouts')
+
+    def __init__(self, source):
+        self.source = source
+        self.action = Histogram()
+        self.delay = Histogram()
+        self.planned_delay = 0.0
+        self.polls = 0
+        self.waits = Histogram()
+        self.wait_timeouts = 0
+
+    @property
+    def total(self):
+        return self.action.total + self.delay.total
+
+    def to_dict(self, index, run_time):
+        return {'index': index, 'source': self.source, 'count': self.action.count,
+                'share': self.total / run_time if run_time else 0.0,
+                'action': self.action.to_dict(),
+                'planned_delay': self.planned_delay, 'delay': self.delay.to_dict(),
+                'polls': self.polls, 'time_to_match': self.waits.to_dict(),
+                'wait_timeouts': self.wait_timeouts}
+
+
+class Profiler:
+    """Collects per-row and per-backend-call timings for one engine run."""
+
+    def __init__(self, program, clock=time.perf_counter):
+        self.clock = clock
+        # A streamed program is not held in memory, so only its backend calls are timed.
+        self.rows = [] if getattr(program, 'streamed', False) else [RowStats(ins.source) for ins in program]
+        self.backend_calls = {}
+        self.started = None
+        self.finished = None
+        self.loops = 0
+
+    def start(self):
+        self.started = self.clock()
+        self.finished = None
+
+    def finish(self, loops):
+        self.loops = loops
+        # Set last: once finished is set, nothing changes the profile any more.
+        self.finished = self.clock()
+
+    def record_action(self, index, seconds):
+        self.rows[index].action.add(seconds)
+
+    def record_delay(self, index, planned, seconds):
+        row = self.rows[index]
+        row.planned_delay = planned
+        row.delay.add(seconds)
+
+    def record_wait(self, index, polls, seconds, matched):
+        row = self.rows[index]
+        row.polls += polls
+        if matched:
+            row.waits.add(seconds)
+        else:
+            row.wait_timeouts += 1
+
+    def record_call(self, name, seconds):
+        histogram = self.backend_calls.get(name)
+        if histogram is None:
+            histogram = self.backend_calls[name] = Histogram()
+        histogram.add(seconds)
+
+    def wrap(self, backend):
+        """A backend that forwards to backend and times every call."""
+        return ProfilingBackend(backend, self)
+
+    @property
+    def run_time(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or self.clock()) - self.started
+
+    def to_dict(self):
+        run_time = self.run_time
+        return {'run': {'seconds': run_time, 'loops': self.loops,
+                        'steps': sum(row.action.count for row in self.rows)},
+                'rows': [row.to_dict(i, run_time) for i, row in enumerate(self.rows)],
+                'backend': {name: h.to_dict() for name, h in sorted(self.backend_calls.items())}}
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def write_csv(self, path):
+        """One line per row: counts, action latency, delay accuracy and waits."""
+        run_time = self.run_time
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['index', 'source', 'count', 'share', 'total_s',
+                             'action_mean_s', 'action_p99_s', 'action_max_s',
+                             'planned_delay_s', 'delay_mean_s', 'delay_max_s',
+                             'polls', 'matches', 'time_to_match_mean_s', 'wait_timeouts'])
+            for i, row in enumerate(self.rows):
+                writer.writerow([i, row.source, row.action.count,
+                                 f"{row.total / run_time if run_time else 0.0:.4f}", f"{row.total:.6f}",
+                                 f"{row.action.mean:.6f}", f"{row.action.percentile(99):.6f}",
+                                 f"{row.action.max or 0.0:.6f}",
+                                 row.planned_delay, f"{row.delay.mean:.6f}", f"{row.delay.max or 0.0:.6f}",
+                                 row.polls, row.waits.count, f"{row.waits.mean:.6f}", row.wait_timeouts])
+
+    def write(self, path):
+        """Write CSV if path ends in .csv, JSON otherwise."""
+        if path.lower().endswith('.csv'):
+            self.write_csv(path)
+        else:
+            self.write_json(path)
+
+
+class ProfilingBackend:
+    """Input backend proxy that records the duration of every call."""
+
+    def __init__(self, backend, profiler):
+        self._backend = backend
+        self._profiler = profiler
+        self.name = backend.name
+
+    def atomic(self):
+        return self._backend.atomic()
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if not callable(attr):
+            return attr
+        clock = self._profiler.clock
+        record = self._profiler.record_call
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                record(name, clock() - start)
+        # Cache the wrapper so later lookups skip __getattr__.
+        setattr(self, name, timed)
+        return timed
@@ -0,0 +1,407 @@
+"""Compile action rows into an immutable instruction program.
+
+Rows use the same plain-dict schema as the saved JSON configuration
+('key', 'sleep', 'hold', 'jump', 'jumpcount'). Everything that used to be
+parsed on every step of the run loop is parsed once here, so the worker
+thread only walks a tuple of ready-made instructions.
+"""
+import json
+import os
+from collections import namedtuple
+
+from textinput import unescape
+import macrofile
+
+# Bump whenever parsing or the Instruction layout changes; cached programs
+# compiled by another version are then ignored.
+PROGRAM_VERSION = 2
+
+SINGLE_ACTION_KEYS = {
+    'tab', 'space', 'enter', 'esc', 'backspace', 'delete', 'insert',
+    'up', 'down', 'left', 'right',
+    'home', 'end', 'pageup', 'pagedown',
+    'capslock', 'numlock', 'scrolllock',
+    'printscreen', 'prntscrn', 'prtsc', 'pause',
+    'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12',
+    'f13', 'f14', 'f15', 'f16', 'f17', 'f18', 'f19', 'f20', 'f21', 'f22', 'f23', 'f24',
+    'shift', 'ctrl', 'alt', 'win', 'cmd'
+}
+
+DANGEROUS_KEYS = {'alt', 'ctrl', 'shift', 'win', 'cmd', 'f4', 'delete', 'tab'}
+SYSTEM_COMMANDS = {'type(', 'paste(', 'waitcolor', 'ifcolor', 'waitregion', 'waitall', 'waitany',
+                   'waitimage', 'clickimage'}
+
+MOUSE_BUTTONS = {'click': 'left', 'rclick': 'right', 'mclick': 'middle'}
+
+# Opcodes
+OP_NOP = 0          # ignored row ('!' prefix) or unknown command(...)
+OP_KEY = 1          # text: key name
+OP_CLICK = 2        # text: button, args: (x, y) or ()
+OP_MOVETO = 3       # args: (x, y) or (x, y, duration)
+OP_WAITCOLOR = 4    # args: (r, g, b, x, y)
+OP_TYPE = 5         # text: string to type (plain text rows and type(...))
+OP_CHAIN = 6        # text: title of the tab to run
+OP_RESETMOUSE = 7
+OP_WAITREGION = 8   # args: (x1, y1, x2, y2, r, g, b[, tol[, fraction]])
+OP_WAITPOINTS = 9   # text: 'all' or 'any', args: (r, g, b, x, y) repeated
+OP_WAITIMAGE = 10   # text: image path, args: (x1, y1, x2, y2[, threshold])
+OP_CLICKIMAGE = 11  # same as OP_WAITIMAGE, then clicks the match's center
+OP_IFCOLOR = 12     # args: (r, g, b, x, y); goes to branch if the pixel matches, else branch_else
+OP_GOTO = 13        # always goes to branch
+OP_PASTE = 14       # text: string to paste through the clipboard (typed if the backend cannot paste)
+
+# Press modes for keys and mouse buttons
+PRESS = 0
+DOWN = 1            # '+' prefix
+UP = 2              # '-' prefix
+
+# What a failed action leads to once its retries are used up
+ON_ERROR_STOP = 'stop'
+ON_ERROR_SKIP = 'skip'      # carry on with the row's delay and the next row
+ON_ERROR_GOTO = 'goto'      # carry on at target
+RETRY_DELAY = 0.5           # default seconds before the first retry
+
+ErrorPolicy = namedtuple('ErrorPolicy', [
+    'retries',      # times a failed action is tried again
+    'backoff',      # seconds before the first retry, doubled before each further one
+    'action',       # ON_ERROR_STOP, ON_ERROR_SKIP or ON_ERROR_GOTO
+    'target',       # ON_ERROR_GOTO row index, -1 otherwise
+])
+
+STOP_ON_ERROR = ErrorPolicy(0, 0.0, ON_ERROR_STOP, -1)
+
+Instruction = namedtuple('Instruction', [
+    'op',           # one of the OP_* constants
+    'text',         # key name, button, text to type or chain target
+    'args',         # tuple of parsed ints
+    'relative',     # args are an offset from the current mouse position
+    'mode',         # PRESS, DOWN or UP
+    'hold',         # seconds to hold the key/button down
+    'delay',        # seconds to wait after the action
+    'jump',         # resolved target row index, -1 when the row never jumps
+    'jumpcount',    # how many times in a row the jump is taken before falling through
+    'branch',       # ifcolor/goto target row index, -1 if none
+    'branch_else',  # ifcolor target when the color does not match, -1 to continue
+    'dangerous',    # blocked while safe mode is on
+    'source',       # original key text, for error messages
+    'onerror',      # ErrorPolicy set by the last onerror(...) row, None for the run's policy
+])
+
+
+class ProgramError(ValueError):
+    """Raised when a row cannot be compiled."""
+
+
+def _parse_int_args(args_str):
+    return tuple(int(a.strip()) for a in args_str.split(','))
+
+
+def _parse_region_args(args_str):
+    parts = [a.strip() for a in args_str.split(',')]
+    if not 7 <= len(parts) <= 9:
+        raise ValueError("waitregion requires 7 to 9 arguments (x1,y1,x2,y2,r,g,b[,tol[,fraction]])")
+    args = tuple(int(a) for a in parts[:8])
+    if len(parts) == 9:
+        fraction = float(parts[8])
+        if not 0 < fraction <= 1:
+            raise ValueError("waitregion fraction must be between 0 and 1")
+        args += (fraction,)
+    return args
+
+
+def _parse_image_args(cmd, args_str):
+    parts = [a.strip() for a in args_str.split(',')]
+    if len(parts) not in (5, 6):
+        raise ValueError(f"{cmd} requires 5 or 6 arguments (path,x1,y1,x2,y2[,threshold])")
+    path = parts[0]
+    if not os.path.isfile(path):
+        raise ValueError(f"image file '{path}' not found")
+    args = tuple(int(a) for a in parts[1:5])
+    if len(parts) == 6:
+        threshold = float(parts[5])
+        if not 0 < threshold <= 1:
+            raise ValueError(f"{cmd} threshold must be between 0 and 1")
+        args += (threshold,)
+    return path, args
+
+
+def label_name(key):
+    """The name defined by a label(name) row, or None."""
+    key = str(key).strip()
+    if key.lower().startswith('label(') and key.endswith(')'):
+        return key[6:-1].strip()
+    return None
+
+
+def error_policy_text(key):
+    """The policy written in an onerror(policy) row, or None."""
+    key = str(key).strip()
+    if key.lower().startswith('onerror(') and key.endswith(')'):
+        return key[8:-1].strip()
+    return None
+
+
+def parse_error_policy(text, labels=None, count=None):
+    """ErrorPolicy from 'stop', 'skip', 'goto,target' or 'retry,N[,seconds][,stop|skip|goto,target]'.
+
+    'default' or nothing gives None, meaning the run's policy. goto targets
+    are resolved with labels and count as in compile_row; without labels
+    (a run-wide policy) goto is not allowed. Raises ValueError.
+    """
+    parts = [part.strip() for part in text.split(',')]
+    if parts == [''] or parts == ['default']:
+        return None
+    retries, backoff = 0, 0.0
+    if parts[0].lower() == 'retry':
+        if len(parts) < 2:
+            raise ValueError("retry needs a count: retry,N[,seconds][,stop|skip|goto,target]")
+        retries = int(parts[1])
+        if retries < 1:
+            raise ValueError("retry count must be at least 1")
+        backoff = RETRY_DELAY
+        parts = parts[2:]
+        if parts:
+            try:
+                backoff = float(parts[0])
+                parts = parts[1:]
+            except ValueError:
+                pass
+            if backoff < 0:
+                raise ValueError("retry delay cannot be negative")
+        if not parts:
+            parts = [ON_ERROR_STOP]
+    action = parts[0].lower()
+    if action in (ON_ERROR_STOP, ON_ERROR_SKIP) and len(parts) == 1:
+        return ErrorPolicy(retries, backoff, action, -1)
+    if action == ON_ERROR_GOTO and len(parts) == 2:
+        if labels is None:
+            raise ValueError("goto can only be used in onerror(...) rows")
+        return ErrorPolicy(retries, backoff, action, _resolve_target(parts[1], labels, count))
+    raise ValueError("use stop, skip, goto,target or retry,N[,seconds][,stop|skip|goto,target]")
+
+
+def _parse_action(key):
+    """Parse the key field. Returns (op, text, args, relative, mode)."""
+    if key.lower().startswith('ifcolor('):
+        condition, _, targets = key.partition('>')
+        if ')' not in condition:
+            raise ValueError("ifcolor requires 5 arguments (r,g,b,x,y)")
+        args = _parse_int_args(condition[condition.index('(')+1:condition.rindex(')')])
+        if len(args) != 5:
+            raise ValueError("ifcolor requires 5 arguments (r,g,b,x,y)")
+        if not targets.split('|')[0].strip():
+            raise ValueError("ifcolor needs a target row or label: ifcolor(r,g,b,x,y)>label")
+        return OP_IFCOLOR, targets, args, False, PRESS
+    cmd = key.split('(')[0].lower()
+    if cmd in ('type', 'paste') and key.endswith(')'):
+        text = unescape(key[len(cmd) + 1:-1])
+        if not text:
+            raise ValueError(f"{cmd} needs some text: {cmd}(text)")
+        return (OP_PASTE if cmd == 'paste' else OP_TYPE), text, (), False, PRESS
+    if '>' in key:
+        return OP_CHAIN, key.split('>')[1], (), False, PRESS
+    if key == "resetmouse":
+        return OP_RESETMOUSE, '', (), False, PRESS
+    if key[0] == '!':
+        return OP_NOP, '', (), False, PRESS
+
+    mode = PRESS
+    if key[0] == '+':
+        key = key[1:]
+        mode = DOWN
+    elif key[0] == '-':
+        key = key[1:]
+        mode = UP
+    if not key:
+        raise ValueError("'+' and '-' must be followed by a key or button")
+
+    if '(' in key and ')' in key:
+        cmd = key.split('(')[0].lower()
+        args_str = key[key.index('(')+1:key.rindex(')')]
+        if cmd == 'moveto' and args_str.count(',') == 2:
+            xy, _, duration = args_str.rpartition(',')
+            args = _parse_int_args(xy)
+            duration = float(duration)
+            if duration < 0:
+                raise ValueError("moveto duration cannot be negative")
+            return OP_MOVETO, '', args + (duration,), '+' in xy or '-' in xy, mode
+        if cmd in MOUSE_BUTTONS or cmd == 'moveto':
+            args = _parse_int_args(args_str)
+            if len(args) != 2:
+                raise ValueError("mouse events require 2 arguments (x, y)")
+            relative = '+' in args_str or '-' in args_str
+            if cmd == 'moveto':
+                return OP_MOVETO, '', args, relative, mode
+            return OP_CLICK, MOUSE_BUTTONS[cmd], args, relative, mode
+        if cmd == 'waitcolor':
+            args = _parse_int_args(args_str)
+            if len(args) != 5:
+                raise ValueError("waitcolor requires 5 arguments (r,g,b,x,y)")
+            return OP_WAITCOLOR, '', args, False, mode
+        if cmd == 'waitregion':
+            return OP_WAITREGION, '', _parse_region_args(args_str), False, mode
+        if cmd in ('waitall', 'waitany'):
+            args = _parse_int_args(args_str)
+            if not args or len(args) % 5:
+                raise ValueError(f"{cmd} requires groups of 5 arguments (r,g,b,x,y,...)")
+            return OP_WAITPOINTS, cmd[4:], args, False, mode
+        if cmd in ('waitimage', 'clickimage'):
+            path, args = _parse_image_args(cmd, args_str)
+            return (OP_WAITIMAGE if cmd == 'waitimage' else OP_CLICKIMAGE), path, args, False, mode
+        if cmd == 'goto':
+            return OP_GOTO, args_str.strip(), (), False, mode
+        return OP_NOP, '', (), False, mode
+
+    k = key.lower()
+    if k in MOUSE_BUTTONS:
+        return OP_CLICK, MOUSE_BUTTONS[k], (), False, mode
+    if k in SINGLE_ACTION_KEYS or len(key) == 1:
+        return OP_KEY, key, (), False, mode
+    return OP_TYPE, key, (), False, mode
+
+
+def _is_dangerous(key):
+    if key.lower().startswith(('ifcolor(', 'type(', 'paste(')):
+        return True
+    if key[0] == '!' or '>' in key or key == "resetmouse":
+        return False
+    k = (key[1:] if key[0] in '+-' else key).lower()
+    return k in DANGEROUS_KEYS or any(cmd in k for cmd in SYSTEM_COMMANDS)
+
+
+def _resolve_target(ref, labels, count):
+    """Row index for a row number or label name."""
+    ref = str(ref).strip()
+    if ref.isdigit():
+        target = int(ref)
+    elif ref in labels:
+        target = labels[ref]
+    else:
+        raise ValueError(f"unknown label '{ref}'")
+    if count is not None and not 0 <= target < count:
+        raise ValueError(f"jump target {target} is out of range (0-{count-1})")
+    return target
+
+
+def compile_row(index, row, labels=None, count=None, onerror=None):
+    """Compile a single row dict.
+
+    labels maps label names to row indexes and count is the number of rows;
+    both are used to resolve and range-check jump, ifcolor and goto targets.
+    onerror is the policy in effect for the row; an onerror(...) row
+    replaces it, and its instruction carries the new policy.
+    """
+    labels = labels or {}
+    key = str(row.get('key', '')).strip()
+    if not key:
+        raise ProgramError(f"Row {index+1}: Please specify a key/button.")
+    try:
+        delay = float(row.get('sleep', '0.0'))
+        hold = float(row.get('hold', '0.0'))
+    except (TypeError, ValueError):
+        raise ProgramError(f"Row {index+1}: Invalid delay or hold time value.")
+    if delay < 0 or hold < 0:
+        raise ProgramError(f"Row {index+1}: Delay and hold time cannot be negative.")
+    try:
+        jumpcount = int(row.get('jumpcount', '0') or 0)
+    except (TypeError, ValueError):
+        raise ProgramError(f"Row {index+1}: Invalid jump count value.")
+    jump_ref = str(row.get('jump', '0')).strip() or '0'
+    jump = -1
+    if jumpcount > 0 and not jump_ref.startswith('-'):
+        try:
+            jump = _resolve_target(jump_ref, labels, count)
+        except ValueError as e:
+            raise ProgramError(f"Row {index+1}: Invalid jump: {e}.")
+    if jump < 0:
+        jumpcount = 0
+    try:
+        op, text, args, relative, mode = _parse_action(key)
+        policy_text = error_policy_text(key)
+        if policy_text is not None:
+            onerror = parse_error_policy(policy_text, labels, count)
+        branch = branch_else = -1
+        if op == OP_IFCOLOR or op == OP_GOTO:
+            then_ref, _, else_ref = text.partition('|')
+            branch = _resolve_target(then_ref, labels, count)
+            if else_ref.strip():
+                branch_else = _resolve_target(else_ref, labels, count)
+    except ValueError as e:
+        raise ProgramError(f"Row {index+1}: Invalid action '{key}': {e}")
+
+    return Instruction(op, text, args, relative, mode, hold, delay,
+                       jump, jumpcount, branch, branch_else, _is_dangerous(key), key, onerror)
+
+
+def compile_rows(rows):
+    """Compile a list of row dicts into a tuple of Instructions.
+
+    label(name) rows define names that the Jump to field, ifcolor(...)>target,
+    goto(target) and onerror(goto,target) can use instead of row numbers.
+    An onerror(...) row sets the error policy of the rows after it. Raises
+    ProgramError with a user-facing message on the first invalid row.
+    """
+    labels = {}
+    for i, row in enumerate(rows):
+        name = label_name(row.get('key', ''))
+        if name is None:
+            continue
+        if not name or name.isdigit():
+            raise ProgramError(f"Row {i+1}: Label names must contain a letter.")
+        if name in labels:
+            raise ProgramError(f"Row {i+1}: Label '{name}' is already defined in row {labels[name]+1}.")
+        labels[name] = i
+    program = []
+    onerror = None
+    for i, row in enumerate(rows):
+        ins = compile_row(i, row, labels, len(rows), onerror)
+        onerror = ins.onerror
+        program.append(ins)
+    return tuple(program)
+
+
+class StreamedProgram:
+    """A macro file compiled one row at a time while it is iterated.
+
+    Only the current row is in memory, so the file can be any length. The
+    rows run straight through: jumps, ifcolor and goto (also in onerror) need random access
+    and raise ProgramError, as does any other invalid row when it is reached.
+    """
+
+    streamed = True
+
+    def __init__(self, path):
+        self.path = path
+        self.settings = macrofile.read_settings(path)
+
+    def __iter__(self):
+        onerror = None
+        for index, row in enumerate(macrofile.iter_rows(self.path)):
+            ins = compile_row(index, row, onerror=onerror)
+            onerror = ins.onerror
+            if (ins.jump >= 0 or ins.op == OP_IFCOLOR or ins.op == OP_GOTO
+                    or (onerror is not None and onerror.action == ON_ERROR_GOTO)):
+                raise ProgramError(f"Row {index+1}: Jumps, ifcolor and goto are not supported "
+                                   f"in streamed macros; convert the file to JSON.")
+            yield ins
+
+    def validate(self):
+        """Compile every row once (without keeping them). Returns the row count."""
+        count = 0
+        for _ in self:
+            count += 1
+        return count
+
+
+def load_config(file_path):
+    """Read a saved configuration file. Raises ValueError if it has no row list.
+
+    Macro files (.skm, .skm.gz) are read whole into the same schema.
+    """
+    if macrofile.is_macro_file(file_path):
+        return macrofile.load_macro(file_path)
+    with open(file_path, 'r') as f:
+        config = json.load(f)
+    if not isinstance(config, dict) or not isinstance(config.get('rows'), list):
+        raise ValueError("Invalid configuration file format.")
+    return config
@@ -0,0 +1,210 @@
+"""On-disk cache of parsed configurations and compiled programs.
+
+Entries are pickles named by a SHA-256 of their input: the file's bytes
+for a parsed configuration, the rows for a compiled program. Both hashes
+include program.PROGRAM_VERSION and the Python version, so a release that
+changes parsing or the instruction layout never reads an old entry. Using
+an entry refreshes its modification time, and when the cache grows past
+max_entries or max_bytes the least recently used entries are deleted.
+
+The cache is only an accelerator: any error reading or writing it falls
+back to parsing and compiling as usual.
+
+Loading a pickle can run arbitrary code, so the cache directory must only
+be writable by the user running the program; anyone who can write to it
+can run code as that user. The directory is created readable by its owner
+only, and on POSIX systems a directory owned by someone else, or writable
+by the group or others, is not used at all. Point SIMPLEKEYCLICKER_CACHE
+only at a private directory.
+"""
+import hashlib
+import os
+import pickle
+import sys
+
+from program import compile_rows, load_config, PROGRAM_VERSION, OP_WAITIMAGE, OP_CLICKIMAGE
+
+CACHE_ENV = 'SIMPLEKEYCLICKER_CACHE'    # directory to use; empty to disable the cache
+MAX_ENTRIES = 512
+MAX_BYTES = 256 * 1024 * 1024
+SUFFIX = '.pickle'
+
+_TAG = f"skc{PROGRAM_VERSION}-py{sys.version_info[0]}.{sys.version_info[1]}".encode()
+
+
+def default_directory():
+    """The per-user cache directory, or None when disabled through SIMPLEKEYCLICKER_CACHE=''."""
+    directory = os.environ.get(CACHE_ENV)
+    if directory is not None:
+        return directory or None
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'SimpleKeyClicker', 'cache')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'simplekeyclicker')
+
+
+def _rows_data(rows):
+    """The fields compile_rows reads from each row, as bytes to hash."""
+    return repr([(row.get('key', ''), row.get('sleep', '0.0'), row.get('hold', '0.0'),
+                  row.get('jump', '0'), row.get('jumpcount', '0')) for row in rows]).encode()
+
+
+class ProgramCache:
+    """A directory of cached entries with least-recently-used eviction."""
+
+    def __init__(self, directory, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._private = None
+
+    def private(self):
+        """Whether the directory exists and only this user can write to it (see the module docstring)."""
+        if self._private is None:
+            try:
+                stat = os.stat(self.directory)
+            except OSError:
+                return False
+            self._private = True
+            if os.name == 'posix':
+                self._private = stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+        return self._private
+
+    @staticmethod
+    def key(kind, data):
+        return kind + '-' + hashlib.sha256(_TAG + b'\0' + data).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        """The cached value, or None."""
+        if not self.private():
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Truncated or unreadable: drop it and rebuild.
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            if not self.private():
+                return
+            with open(temp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, path)
+        except OSError:
+            self._remove(temp)
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries beyond max_entries and max_bytes."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(SUFFIX):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        entries.sort(reverse=True)
+        total = 0
+        for count, (_, size, path) in enumerate(entries, 1):
+            total += size
+            if count > self.max_entries or total > self.max_bytes:
+                self._remove(path)
+
+    def clear(self):
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(SUFFIX):
+                        self._remove(entry.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def load_config(self, file_path):
+        """program.load_config through the cache, keyed by the file's contents."""
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        key = self.key('config', data)
+        config = self.get(key)
+        if config is None:
+            config = load_config(file_path)
+            self.put(key, config)
+        return config
+
+    def compile_rows(self, rows):
+        """program.compile_rows through the cache, keyed by the rows.
+
+        Rows that do not compile are not cached, so the error is raised
+        every time. Compiling checks that image files exist, so a cached
+        program whose images have gone is compiled again to report it.
+        """
+        key = self.key('program', _rows_data(rows))
+        program = self.get(key)
+        if program is not None and any((ins.op == OP_WAITIMAGE or ins.op == OP_CLICKIMAGE)
+                                       and not os.path.isfile(ins.text) for ins in program):
+            program = None
+        if program is None:
+            program = compile_rows(rows)
+            self.put(key, program)
+        return program
+
+
+_default = None
+
+
+def default_cache():
+    """The process-wide cache in default_directory(), or None if caching is disabled."""
+    global _default
+    if _default is None:
+        directory = default_directory()
+        _default = ProgramCache(directory) if directory else False
+    return _default or None
+
+
+def disable():
+    """Stop using the default cache in this process."""
+    global _default
+    _default = False
+
+
+def cached_load_config(file_path):
+    cache = default_cache()
+    return cache.load_config(file_path) if cache else load_config(file_path)
+
+
+def cached_compile_rows(rows):
+    cache = default_cache()
+    return cache.compile_rows(rows) if cache else compile_rows(rows)
@@ -0,0 +1,357 @@
+"""Record live keyboard and mouse input as action rows.
+
+Recorder is fed timestamped events (from LiveRecorder's pynput listeners,
+or any synthetic sequence) and turns them into rows in the configuration
+schema:
+
+- a key or button released with nothing in between becomes one press row
+  whose hold time is how long it was down; otherwise '+key'/'-key' rows.
+  A release matches its press by key code when one is recorded, since the
+  character can change in between ('A' pressed, 'a' released after Shift);
+- mouse paths become moveto(x,y,0) rows, thinned with Ramer-Douglas-Peucker
+  so only the points needed to stay within tolerance pixels are kept;
+- every row's delay is the recorded time until the next row starts.
+
+    python -m recorder recorded.json [--tolerance PX] [--stop-key esc]
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from program import SINGLE_ACTION_KEYS
+
+DEFAULT_TOLERANCE = 2.0     # pixels a thinned mouse path may deviate from the recorded one
+DEFAULT_STOP_KEY = 'esc'
+
+RecordedInput = namedtuple('RecordedInput', ['time', 'kind', 'args'])
+
+# pynput key names that differ from the names the backends press. Rows only
+# know one key per modifier, so the left and right ones record the same name.
+RECORDED_KEY_NAMES = {
+    'page_up': 'pageup', 'page_down': 'pagedown',
+    'caps_lock': 'capslock', 'num_lock': 'numlock', 'scroll_lock': 'scrolllock',
+    'print_screen': 'printscreen',
+    'ctrl_l': 'ctrl', 'ctrl_r': 'ctrl',
+    'alt_l': 'alt', 'alt_r': 'alt', 'alt_gr': 'alt',
+    'shift_l': 'shift', 'shift_r': 'shift',
+    'cmd': 'win', 'cmd_l': 'win', 'cmd_r': 'win',
+}
+
+BUTTON_COMMANDS = {'left': 'click', 'right': 'rclick', 'middle': 'mclick'}
+
+# Characters that mean something at the start of a key field; they are typed instead.
+RESERVED_KEYS = set('+-!>')
+
+
+def rdp(points, epsilon):
+    """Indexes of the (x, y) points that Ramer-Douglas-Peucker keeps for tolerance epsilon."""
+    n = len(points)
+    if n < 3:
+        return list(range(n))
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        farthest, index = -1.0, -1
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length:
+                distance = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                distance = math.hypot(x - x1, y - y1)
+            if distance > farthest:
+                farthest, index = distance, i
+        if farthest > epsilon:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def _seconds(value):
+    value = round(max(0.0, value), 3)
+    return str(value) if value else '0.0'
+
+
+class Recorder:
+    """Collects input events and converts them to rows.
+
+    All methods take the event time in seconds (any monotonic clock).
+    Keys may carry a code (such as pynput's virtual key code) that is the
+    same for a key's press and release. tolerance=None keeps every
+    recorded mouse sample.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.events = []
+
+    def key_down(self, key, t, code=None):
+        self.events.append(RecordedInput(t, 'key_down', (key,) if code is None else (key, code)))
+
+    def key_up(self, key, t, code=None):
+        self.events.append(RecordedInput(t, 'key_up', (key,) if code is None else (key, code)))
+
+    def move(self, x, y, t):
+        self.events.append(RecordedInput(t, 'move', (int(x), int(y))))
+
+    def button_down(self, button, x, y, t):
+        self.events.append(RecordedInput(t, 'button_down', (button, int(x), int(y))))
+
+    def button_up(self, button, x, y, t):
+        self.events.append(RecordedInput(t, 'button_up', (button, int(x), int(y))))
+
+    def feed(self, events):
+        """Add (time, kind, args) events, e.g. a synthetic stream."""
+        for t, kind, args in events:
+            self.events.append(RecordedInput(t, kind, tuple(args)))
+
+    def clear(self):
+        self.events.clear()
+
+    def to_rows(self):
+        """The recording as row dicts (key, sleep, hold, jump, jumpcount)."""
+        actions = _Actions()
+        path = []
+        held_keys = {}      # key code, or name without one -> (name, index of its '+' action)
+        held = {}           # button -> index of its '+' action
+        cursor = None
+        for t, kind, args in self.events:
+            if kind == 'move':
+                path.append((t, args[0], args[1]))
+                continue
+            cursor = self._flush_path(path, actions, cursor)
+            path = []
+            if kind == 'key_down':
+                key = args[0]
+                identity = args[1] if len(args) > 1 else key
+                if identity in held_keys:
+                    continue    # auto-repeat
+                if key in RESERVED_KEYS:
+                    actions.add(t, f"type({key})")
+                    continue
+                held_keys[identity] = (key, actions.add(t, '+' + key))
+            elif kind == 'key_up':
+                held_key = self._release(held_keys, *args)
+                if held_key is None:
+                    continue    # pressed before the recording started, or reserved
+                key, index = held_key
+                if index == len(actions) - 1:
+                    actions.merge_press(key, t)
+                else:
+                    actions.add(t, '-' + key)
+            elif kind == 'button_down':
+                button, x, y = args
+                held[button] = actions.add(t, f"+{BUTTON_COMMANDS[button]}({x},{y})")
+                cursor = (x, y)
+            elif kind == 'button_up':
+                button, x, y = args
+                index = held.pop(button, None)
+                if index is None:
+                    continue
+                command = BUTTON_COMMANDS[button]
+                if index == len(actions) - 1 and cursor == (x, y):
+                    actions.merge_press(f"{command}({x},{y})", t)
+                else:
+                    actions.add(t, f"-{command}({x},{y})")
+                cursor = (x, y)
+        self._flush_path(path, actions, cursor)
+        return actions.rows()
+
+    @staticmethod
+    def _release(held_keys, key, code=None):
+        """Remove and return the (name, index) of the held key that key or code releases."""
+        if code is not None and code in held_keys:
+            return held_keys.pop(code)
+        if key in held_keys:
+            return held_keys.pop(key)
+        # Without codes, a key pressed as 'A' can be released as 'a'.
+        for identity, (name, _) in held_keys.items():
+            if isinstance(identity, str) and name.lower() == key.lower():
+                return held_keys.pop(identity)
+        return None
+
+    def _flush_path(self, path, actions, cursor):
+        """Add the thinned moves of a mouse path. Returns the new cursor position."""
+        if not path:
+            return cursor
+        tolerance = self.tolerance
+        if cursor is not None and tolerance is not None and all(
+                math.hypot(x - cursor[0], y - cursor[1]) <= tolerance for _, x, y in path):
+            return cursor   # jitter around the last position
+        if tolerance is None:
+            kept = range(len(path))
+        else:
+            kept = rdp([(x, y) for _, x, y in path], tolerance)
+        for i in kept:
+            t, x, y = path[i]
+            if (x, y) != cursor:
+                actions.add(t, f"moveto({x},{y},0)")
+                cursor = (x, y)
+        return cursor
+
+
+class _Actions:
+    """Rows under construction, with their start times."""
+
+    def __init__(self):
+        self.starts = []
+        self.keys = []
+        self.holds = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, t, key):
+        self.starts.append(t)
+        self.keys.append(key)
+        self.holds.append(0.0)
+        return len(self.keys) - 1
+
+    def merge_press(self, key, t):
+        """Turn the last '+' action into a press held until t."""
+        self.keys[-1] = key
+        self.holds[-1] = t - self.starts[-1]
+
+    def rows(self):
+        rows = []
+        count = len(self.keys)
+        for i in range(count):
+            end = self.starts[i] + self.holds[i]
+            delay = self.starts[i + 1] - end if i + 1 < count else 0.0
+            rows.append({'key': self.keys[i], 'sleep': _seconds(delay),
+                         'hold': _seconds(self.holds[i]), 'jump': '0', 'jumpcount': '0'})
+        return rows
+
+
+def key_name(key):
+    """The backend key name of a pynput key, or None if rows cannot press it.
+
+    Named keys rows do not know (media keys, menu, ...) would replay as
+    typed text, so they are not recorded.
+    """
+    char = getattr(key, 'char', None)
+    if char is not None:
+        return char
+    name = getattr(key, 'name', None)
+    if name is None:
+        return None
+    name = RECORDED_KEY_NAMES.get(name, name)
+    return name if name in SINGLE_ACTION_KEYS else None
+
+
+def key_code(key):
+    """pynput's virtual key code of key, the same when it is pressed and released, or None."""
+    code = getattr(key, 'vk', None)
+    if code is None:
+        code = getattr(getattr(key, 'value', None), 'vk', None)
+    return code
+
+
+class LiveRecorder:
+    """Feeds a Recorder from pynput keyboard and mouse listeners until stop_key is pressed.
+
+    on_stop is called (from a listener thread) when recording ends.
+    """
+
+    def __init__(self, recorder=None, stop_key=DEFAULT_STOP_KEY, on_stop=None,
+                 clock=time.perf_counter):
+        self.recorder = recorder or Recorder()
+        self.stop_key = stop_key
+        self.on_stop = on_stop
+        self.clock = clock
+        self.stopped = threading.Event()
+        self._listeners = []
+
+    def start(self):
+        from pynput import keyboard, mouse
+        self._listeners = [
+            keyboard.Listener(on_press=self._on_press, on_release=self._on_release),
+            mouse.Listener(on_move=self._on_move, on_click=self._on_click),
+        ]
+        for listener in self._listeners:
+            listener.start()
+
+    def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        for listener in self._listeners:
+            listener.stop()
+        if self.on_stop is not None:
+            self.on_stop()
+
+    def wait(self):
+        while not self.stopped.wait(0.1):
+            pass
+
+    def _on_press(self, key):
+        name = key_name(key)
+        if name == self.stop_key:
+            self.stop()
+        elif name is not None:
+            self.recorder.key_down(name, self.clock(), key_code(key))
+
+    def _on_release(self, key):
+        name = key_name(key)
+        if name is not None and name != self.stop_key:
+            self.recorder.key_up(name, self.clock(), key_code(key))
+
+    def _on_move(self, x, y):
+        self.recorder.move(x, y, self.clock())
+
+    def _on_click(self, x, y, button, pressed):
+        name = getattr(button, 'name', None)
+        if name not in BUTTON_COMMANDS:
+            return
+        if pressed:
+            self.recorder.button_down(name, x, y, self.clock())
+        else:
+            self.recorder.button_up(name, x, y, self.clock())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="recorder", description="Record keyboard and mouse input as a configuration.")
+    parser.add_argument('output', help="file to write (.json, or .skm/.skm.gz)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="pixels a thinned mouse path may deviate, 0 keeps every sample (default %(default)s)")
+    parser.add_argument('--stop-key', default=DEFAULT_STOP_KEY, help="key that ends the recording (default %(default)s)")
+    parser.add_argument('--title', help="configuration title (default: the file name)")
+    args = parser.parse_args(argv)
+
+    live = LiveRecorder(Recorder(args.tolerance or None), stop_key=args.stop_key)
+    try:
+        live.start()
+    except ImportError as e:
+        print(f"Recorder Error: {e}", file=sys.stderr)
+        return 2
+    print(f"Recording... press {args.stop_key} to stop.")
+    try:
+        live.wait()
+    except KeyboardInterrupt:
+        live.stop()
+    rows = live.recorder.to_rows()
+    title = args.title or args.output.split('/')[-1].split('.')[0]
+    config = {'title': title, 'run_mode': 'limited', 'repetitions': 1, 'rows': rows}
+
+    from macrofile import is_macro_file, write_macro
+    if is_macro_file(args.output):
+        write_macro(args.output, config)
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(config, f, indent=4)
+    print(f"{len(live.recorder.events)} events recorded as {len(rows)} rows in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
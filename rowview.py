@@ -0,0 +1,229 @@
+"""Virtualized editor for action rows.
+
+The rows are plain dicts in the saved configuration schema plus
+'is_first'. RowView only creates widgets for as many rows as fit in the
+window and rebinds them to other rows as the view scrolls. Adding, moving
+or removing a row repaints one screenful of entries, and loading a
+configuration creates no widgets at all, however long the macro is.
+"""
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+
+FIELDS = ('key', 'sleep', 'hold', 'jump', 'jumpcount')
+DEFAULTS = {'key': '', 'sleep': '0.0', 'hold': '0.0', 'jump': '0', 'jumpcount': '0'}
+WHEEL_ROWS = 3
+
+
+def new_row(is_first=False, **fields):
+    """A row dict with defaults for the fields not given."""
+    row = {name: str(fields.get(name, DEFAULTS[name])) for name in FIELDS}
+    row['is_first'] = is_first
+    return row
+
+
+class _Slot:
+    """The widgets of one visible row, bound to whichever row is shown there."""
+
+    def __init__(self, view, parent):
+        self.view = view
+        self.index = -1
+        self.shown = False
+        self._binding = False
+        self.frame = tb.Frame(parent)
+        self.highlight_frame = tb.Frame(self.frame, bootstyle="default")
+        self.highlight_frame.pack(fill=X, padx=2, pady=1)
+        sub_frame = tb.Frame(self.highlight_frame)
+        sub_frame.pack(anchor='center', padx=5, pady=2)
+
+        self.vars = {name: tb.StringVar() for name in FIELDS}
+        for name, var in self.vars.items():
+            var.trace_add("write", lambda *_, name=name: self._changed(name))
+
+        self.status_label = tb.Label(sub_frame, text="", width=3)
+        self.status_label.pack(side=LEFT)
+
+        tb.Label(sub_frame, text="Key/Button:", width=10).pack(side=LEFT)
+        tb.Entry(sub_frame, textvariable=self.vars['key'], width=30).pack(side=LEFT, padx=5)
+        tb.Button(sub_frame, text="Capture", bootstyle=INFO, width=7,
+                  command=lambda: self._command('capture')).pack(side=LEFT, padx=(0, 5))
+
+        tb.Label(sub_frame, text="Hold(s):", width=7).pack(side=LEFT)
+        tb.Entry(sub_frame, textvariable=self.vars['hold'], width=6).pack(side=LEFT, padx=(0,5))
+        tb.Label(sub_frame, text="Delay(s):", width=7).pack(side=LEFT)
+        tb.Entry(sub_frame, textvariable=self.vars['sleep'], width=6).pack(side=LEFT, padx=(0,5))
+
+        tb.Label(sub_frame, text="Jump to:", width=8).pack(side=LEFT)
+        tb.Entry(sub_frame, textvariable=self.vars['jump'], width=6).pack(side=LEFT, padx=(0,5))
+        tb.Label(sub_frame, text="Jump count:", width=12).pack(side=LEFT)
+        tb.Entry(sub_frame, textvariable=self.vars['jumpcount'], width=6).pack(side=LEFT, padx=(0,5))
+
+        button_width = 3
+        self.up_btn = tb.Button(sub_frame, text="▲", bootstyle=SECONDARY, width=button_width,
+                                command=lambda: self._command('up'))
+        self.up_btn.pack(side=LEFT, padx=(5, 1))
+        self.down_btn = tb.Button(sub_frame, text="▼", bootstyle=SECONDARY, width=button_width,
+                                  command=lambda: self._command('down'))
+        self.down_btn.pack(side=LEFT, padx=1)
+        tb.Button(sub_frame, text="❏", bootstyle=INFO, width=button_width,
+                  command=lambda: self._command('duplicate')).pack(side=LEFT, padx=1)
+        self.remove_btn = tb.Button(sub_frame, text="X", bootstyle=DANGER, width=button_width,
+                                    command=lambda: self._command('remove'))
+        self.remove_btn.pack(side=LEFT, padx=(1, 5))
+
+        view._add_wheel_tag(self.frame)
+
+    def _command(self, name):
+        if self.index >= 0:
+            self.view.commands[name](self.index)
+
+    def _changed(self, name):
+        if not self._binding and 0 <= self.index < len(self.view.rows):
+            self.view.rows[self.index][name] = self.vars[name].get()
+
+    def bind(self, index, row, count, highlight):
+        self.index = index
+        self._binding = True
+        try:
+            for name, var in self.vars.items():
+                if var.get() != row[name]:
+                    var.set(row[name])
+        finally:
+            self._binding = False
+        self.up_btn.config(state=NORMAL if index > 0 else DISABLED)
+        self.down_btn.config(state=NORMAL if index < count - 1 else DISABLED)
+        self.remove_btn.config(state=DISABLED if row['is_first'] else NORMAL)
+        self.paint(*(highlight or ("default", "")))
+        if not self.shown:
+            self.frame.pack(fill=X, pady=0)
+            self.shown = True
+
+    def hide(self):
+        self.index = -1
+        if self.shown:
+            self.frame.pack_forget()
+            self.shown = False
+
+    def paint(self, style, status):
+        self.highlight_frame.configure(bootstyle=style)
+        self.status_label.config(text=status)
+
+
+class RowView:
+    """Scrollable list of rows that only materializes the visible ones.
+
+    commands maps 'capture', 'up', 'down', 'duplicate' and 'remove' to
+    callables taking a row index. Call refresh() after changing rows.
+    """
+
+    def __init__(self, parent, rows, commands):
+        self.rows = rows
+        self.commands = commands
+        self.first = 0
+        self.highlights = {}
+        self.slots = []
+        self.row_height = None
+        self._wheel_tag = f"RowView{id(self)}"
+
+        self.body = tb.Frame(parent)
+        # The body's size comes from the window, never from the slots it holds.
+        self.body.pack_propagate(False)
+        self.body.pack(side=LEFT, fill=BOTH, expand=YES)
+        self.scrollbar = tb.Scrollbar(parent, orient=VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.body.bind("<Configure>", self._on_resize)
+        self._add_wheel_tag(self.body)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.body.bind_class(self._wheel_tag, sequence, self._on_wheel)
+        self._ensure_slots(1)
+        self.refresh()
+
+    def _add_wheel_tag(self, widget):
+        widget.bindtags((self._wheel_tag,) + widget.bindtags())
+        for child in widget.winfo_children():
+            self._add_wheel_tag(child)
+
+    def _ensure_slots(self, count):
+        while len(self.slots) < count:
+            self.slots.append(_Slot(self, self.body))
+        if self.row_height is None:
+            slot = self.slots[0]
+            slot.frame.update_idletasks()
+            self.row_height = max(1, slot.frame.winfo_reqheight())
+
+    def _on_resize(self, event):
+        capacity = max(1, event.height // self.row_height)
+        if capacity != len(self.slots):
+            self._ensure_slots(capacity)
+            for slot in self.slots[capacity:]:
+                slot.frame.destroy()
+            del self.slots[capacity:]
+            self.refresh()
+
+    def _on_wheel(self, event):
+        up = getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0
+        self.yview('scroll', -WHEEL_ROWS if up else WHEEL_ROWS, 'units')
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')."""
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * len(self.rows))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            self.first += step * len(self.slots) if args[2] == 'pages' else step
+        self.refresh()
+
+    def set_rows(self, rows):
+        """Show a new row list (e.g. after loading) from the top."""
+        self.rows = rows
+        self.first = 0
+        self.highlights.clear()
+        self.refresh()
+
+    def refresh(self):
+        """Rebind the visible slots to the rows they now show."""
+        count = len(self.rows)
+        capacity = len(self.slots)
+        self.first = max(0, min(self.first, count - capacity))
+        for k, slot in enumerate(self.slots):
+            index = self.first + k
+            if index < count:
+                slot.bind(index, self.rows[index], count, self.highlights.get(index))
+            else:
+                slot.hide()
+        if count:
+            self.scrollbar.set(self.first / count, min(1.0, (self.first + capacity) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def see(self, index):
+        """Scroll just enough to show the row at index."""
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + len(self.slots):
+            self.first = index - len(self.slots) + 1
+        else:
+            return
+        self.refresh()
+
+    def set_field(self, index, name, value):
+        self.rows[index][name] = value
+        if self._slot_of(index) is not None:
+            self.refresh()
+
+    def _slot_of(self, index):
+        k = index - self.first
+        return self.slots[k] if 0 <= k < len(self.slots) and self.slots[k].index == index else None
+
+    def paint(self, index, style, status):
+        """Highlight a row; style "default" with an empty status clears it."""
+        if style == "default" and not status:
+            self.highlights.pop(index, None)
+        else:
+            self.highlights[index] = (style, status)
+        slot = self._slot_of(index)
+        if slot is not None:
+            slot.paint(style, status)
+
+    def clear_highlights(self):
+        for index in list(self.highlights):
+            self.paint(index, "default", "")
@@ -0,0 +1,169 @@
+"""Timers that decide how the engine waits for delays and holds.
+
+SleepTimer is the original behaviour: every wait is a relative time.sleep,
+so the time spent performing actions accumulates as drift.
+
+Scheduler plans every wait against an absolute time.perf_counter()
+timeline. It sleeps until shortly before each deadline and busy-waits the
+rest, learning how much the OS oversleeps, and records how late each
+deadline was actually reached.
+
+Both take an optional interrupt event in start(); setting it ends the wait
+in progress, and every later one, at once, so a stop does not wait out a
+long delay or hold.
+"""
+import math
+import sys
+import time
+
+SPIN_THRESHOLD = 0.001   # busy-wait the last millisecond before a deadline
+MAX_LAG = 0.25           # re-anchor the timeline when this far behind
+ROW_GAP = 0.001          # SleepTimer's pause before every row
+
+
+class SleepTimer:
+    """Relative sleeps, as the run loop always did."""
+
+    precise = False
+    interrupt = None
+
+    def start(self, interrupt=None):
+        self.interrupt = interrupt
+
+    def stop(self):
+        pass
+
+    def begin_row(self):
+        time.sleep(ROW_GAP)
+
+    def wait(self, seconds):
+        if seconds > 0:
+            if self.interrupt is None:
+                time.sleep(seconds)
+            else:
+                self.interrupt.wait(seconds)
+
+    def rebase(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class Scheduler:
+    """Absolute-deadline timer with hybrid sleep/spin waits and jitter statistics.
+
+    wait(seconds) advances the planned timeline by seconds and returns when
+    it is reached, so time spent between waits (performing the action) does
+    not add up. Call rebase() after actions of unpredictable length
+    (waitcolor, typing, chained tabs) so the timeline continues from now.
+    """
+
+    precise = True
+
+    def __init__(self, spin_threshold=SPIN_THRESHOLD, max_lag=MAX_LAG,
+                 clock=time.perf_counter, sleep=time.sleep):
+        self.spin_threshold = spin_threshold
+        self.max_lag = max_lag
+        self.clock = clock
+        self.sleep = sleep
+        self.deadline = None
+        self.interrupt = None
+        self.oversleep = 0.0
+        self._depth = 0
+        self._timer_period = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.count = 0
+        self.resyncs = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.max_late = 0.0
+
+    def start(self, interrupt=None):
+        """Anchor the timeline at the current time and reset the statistics.
+
+        Nested starts (a chained run sharing the timer) only rebase.
+        """
+        self._depth += 1
+        if self._depth == 1:
+            self.interrupt = interrupt
+            self._reset_stats()
+            self._set_timer_period(True)
+        self.rebase()
+
+    def stop(self):
+        self._depth = max(0, self._depth - 1)
+        if self._depth == 0:
+            self._set_timer_period(False)
+
+    def _set_timer_period(self, enable):
+        """Ask Windows for 1 ms sleep granularity while running (15.6 ms by default)."""
+        if sys.platform != 'win32' or enable == self._timer_period:
+            return
+        try:
+            import ctypes
+            winmm = ctypes.windll.winmm
+            (winmm.timeBeginPeriod if enable else winmm.timeEndPeriod)(1)
+            self._timer_period = enable
+        except (ImportError, AttributeError, OSError):
+            pass
+
+    def begin_row(self):
+        pass
+
+    def rebase(self):
+        """Continue the timeline from the current time."""
+        self.deadline = self.clock()
+
+    def wait(self, seconds):
+        """Advance the timeline by seconds and wait until it is reached."""
+        if self.deadline is None:
+            self.start()
+        self.deadline += seconds
+        self.wait_until(self.deadline)
+
+    def wait_until(self, deadline):
+        """Wait until deadline. Returns False if the interrupt event ended the wait."""
+        clock = self.clock
+        interrupt = self.interrupt
+        sleep = self.sleep if interrupt is None else interrupt.wait
+        remaining = deadline - clock()
+        while remaining > self.spin_threshold:
+            requested = remaining - self.spin_threshold - self.oversleep
+            if requested <= 0:
+                break
+            before = clock()
+            if sleep(requested):
+                return False
+            over = clock() - before - requested
+            # Track the oversleep with a slowly decaying maximum.
+            self.oversleep = max(over, self.oversleep * 0.95) if over > 0 else self.oversleep * 0.95
+            remaining = deadline - clock()
+        if interrupt is not None and interrupt.is_set():
+            return False
+        while clock() < deadline:
+            pass
+        self._record(clock() - deadline)
+        return True
+
+    def _record(self, late):
+        self.count += 1
+        delta = late - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (late - self._mean)
+        if late > self.max_late:
+            self.max_late = late
+        if late > self.max_lag:
+            self.resyncs += 1
+            self.rebase()
+
+    def stats(self):
+        """Lateness of the reached deadlines, in seconds."""
+        return {'waits': self.count,
+                'late_mean': self._mean,
+                'late_stdev': math.sqrt(self._m2 / self.count) if self.count else 0.0,
+                'late_max': self.max_late,
+                'resyncs': self.resyncs,
+                'oversleep': self.oversleep}
@@ -0,0 +1,254 @@
+"""Screen capture sources and the pixel sampler used by waitcolor.
+
+A capture source grabs a rectangle of the screen and returns a Frame. The
+mss source keeps one grabber per thread alive between polls; the PIL source
+is the fallback when mss is not installed. SyntheticSource serves frames
+from a function, an image or an array, so waits can be driven without a
+display.
+"""
+import threading
+import time
+
+COLOR_MATCH_TOLERANCE = 10
+POLL_INTERVAL = 0.01
+
+
+def color_matches(pixel, rgb, tolerance=COLOR_MATCH_TOLERANCE):
+    """True if every channel of pixel is within tolerance of rgb."""
+    return (abs(pixel[0] - rgb[0]) <= tolerance and
+            abs(pixel[1] - rgb[1]) <= tolerance and
+            abs(pixel[2] - rgb[2]) <= tolerance)
+
+
+def bounding_box(points):
+    """Smallest (left, top, right, bottom) box containing all (x, y) points."""
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs) + 1, max(ys) + 1
+
+
+class Frame:
+    """A captured screen rectangle. Coordinates are absolute screen pixels."""
+
+    def __init__(self, left, top, width, height):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+
+    def pixel(self, x, y):
+        """(r, g, b) at screen position (x, y)."""
+        raise NotImplementedError
+
+    def to_array(self):
+        """The frame as a height x width x 3 uint8 NumPy array (RGB)."""
+        raise NotImplementedError
+
+
+class BGRAFrame(Frame):
+    """Raw BGRA bytes, as returned by mss."""
+
+    def __init__(self, left, top, width, height, raw):
+        super().__init__(left, top, width, height)
+        self.raw = raw
+
+    def pixel(self, x, y):
+        i = ((y - self.top) * self.width + (x - self.left)) * 4
+        raw = self.raw
+        return raw[i + 2], raw[i + 1], raw[i]
+
+    def to_array(self):
+        import numpy as np
+        bgra = np.frombuffer(self.raw, dtype=np.uint8).reshape(self.height, self.width, 4)
+        return bgra[:, :, 2::-1]
+
+
+class ImageFrame(Frame):
+    """A PIL image."""
+
+    def __init__(self, left, top, image):
+        super().__init__(left, top, image.width, image.height)
+        self.image = image
+
+    def pixel(self, x, y):
+        return self.image.getpixel((x - self.left, y - self.top))[:3]
+
+    def to_array(self):
+        import numpy as np
+        return np.asarray(self.image.convert('RGB'))
+
+
+class ArrayFrame(Frame):
+    """A height x width x 3 NumPy array (RGB)."""
+
+    def __init__(self, left, top, array):
+        super().__init__(left, top, array.shape[1], array.shape[0])
+        self.array = array
+
+    def pixel(self, x, y):
+        return tuple(int(c) for c in self.array[y - self.top, x - self.left, :3])
+
+    def to_array(self):
+        return self.array[:, :, :3]
+
+
+class FunctionFrame(Frame):
+    """Pixels computed by a pixel(x, y) -> (r, g, b) function."""
+
+    def __init__(self, left, top, width, height, function):
+        super().__init__(left, top, width, height)
+        self.function = function
+
+    def pixel(self, x, y):
+        return tuple(self.function(x, y))[:3]
+
+    def to_array(self):
+        import numpy as np
+        return np.array([[self.pixel(x, y) for x in range(self.left, self.left + self.width)]
+                         for y in range(self.top, self.top + self.height)], dtype=np.uint8)
+
+
+class MssSource:
+    """Captures with mss, keeping one grabber per thread alive between grabs."""
+
+    name = 'mss'
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        self._local = threading.local()
+
+    def grab(self, bbox):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+        left, top, right, bottom = bbox
+        shot = sct.grab({'left': left, 'top': top, 'width': right - left, 'height': bottom - top})
+        return BGRAFrame(left, top, shot.width, shot.height, shot.raw)
+
+
+class PILSource:
+    """Captures with PIL.ImageGrab (a new capture context per grab)."""
+
+    name = 'pil'
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+
+    def grab(self, bbox):
+        return ImageFrame(bbox[0], bbox[1], self._grab(bbox=bbox))
+
+
+class SyntheticSource:
+    """Serves frames from a screen that is not real.
+
+    screen is a pixel(x, y) -> (r, g, b) function, a PIL image or an RGB
+    NumPy array covering the screen from (0, 0). Assign a new screen at any
+    time to change what later grabs see. grabs counts the captures.
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.grabs = 0
+
+    def grab(self, bbox):
+        self.grabs += 1
+        left, top, right, bottom = bbox
+        screen = self.screen
+        if callable(screen):
+            return FunctionFrame(left, top, right - left, bottom - top, screen)
+        if hasattr(screen, 'crop'):
+            return ImageFrame(left, top, screen.crop(bbox))
+        return ArrayFrame(left, top, screen[top:bottom, left:right])
+
+
+def create_source():
+    """The fastest available capture source: mss if installed, else PIL."""
+    try:
+        return MssSource()
+    except ImportError:
+        return PILSource()
+
+
+class PixelSampler:
+    """Polls screen pixels with one capture per poll.
+
+    All watched points are read from a single grab of their bounding box.
+    The capture source is created on first use, so nothing is imported for
+    programs that never look at the screen. polls counts every capture;
+    last_polls and last_wait describe the most recent wait().
+    """
+
+    def __init__(self, source=None, interval=POLL_INTERVAL, clock=time.perf_counter,
+                 sleep=time.sleep):
+        self.source = source
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.polls = 0
+        self.last_polls = 0
+        self.last_wait = 0.0
+
+    def grab(self, bbox):
+        """One capture of bbox, or None if capturing failed."""
+        if self.source is None:
+            self.source = create_source()
+        self.polls += 1
+        try:
+            return self.source.grab(bbox)
+        except Exception:
+            return None
+
+    def sample(self, points):
+        """The (r, g, b) of every (x, y) point, from a single capture.
+
+        Returns None if capturing failed.
+        """
+        frame = self.grab(bounding_box(points))
+        if frame is None:
+            return None
+        return [frame.pixel(x, y) for x, y in points]
+
+    def wait(self, bbox, predicate, timeout, is_running=lambda: True, interval=None,
+             interrupt=None):
+        """Capture bbox at a fixed rate until predicate(frame) is true.
+
+        Returns True on a match, False on timeout or once is_running()
+        returns False. Setting the interrupt event ends the pause between
+        captures at once.
+        """
+        interval = self.interval if interval is None else interval
+        sleep = self.sleep if interrupt is None else interrupt.wait
+        clock = self.clock
+        start = clock()
+        deadline = start + timeout
+        next_poll = start
+        polls = 0
+        try:
+            while is_running():
+                frame = self.grab(bbox)
+                polls += 1
+                if frame is not None and predicate(frame):
+                    return True
+                now = clock()
+                if now >= deadline:
+                    return False
+                next_poll += interval
+                if next_poll > now:
+                    sleep(min(next_poll, deadline) - now)
+                else:
+                    next_poll = now
+            return False
+        finally:
+            self.last_polls = polls
+            self.last_wait = clock() - start
+
+    def wait_for_color(self, rgb, x, y, timeout, is_running=lambda: True,
+                       tolerance=COLOR_MATCH_TOLERANCE):
+        """Wait until the pixel at (x, y) matches rgb."""
+        return self.wait((x, y, x + 1, y + 1),
+                         lambda frame: color_matches(frame.pixel(x, y), rgb, tolerance),
+                         timeout, is_running)
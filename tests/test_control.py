@@ -0,0 +1,136 @@
+import http.client
+import json
+import os
+
+import pytest
+
+from control import ControlServer
+from profiler import Profiler
+
+
+class Engine:
+    """The parts of engine.Engine the server reads."""
+
+    running = False
+    failed = False
+    stop_latency = None
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+
+class Controller:
+    def __init__(self):
+        self.started = []
+        self.engine = None
+
+    def program_names(self):
+        return ['Farm']
+
+    def latest_engine(self, name):
+        return self.engine
+
+    def start_program(self, name):
+        self.started.append(name)
+
+    def stop_program(self, name):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ControlServer(Controller(), port=0, token_path=str(tmp_path / 'token'))
+    server.start()
+    yield server
+    server.stop()
+
+
+def _request(server, method, path, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    connection.putrequest(method, path, skip_host=True)
+    for name, value in headers.items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    response = connection.getresponse()
+    body = json.loads(response.read())
+    connection.close()
+    return response.status, body
+
+
+def _headers(server, **extra):
+    headers = {'Host': f'127.0.0.1:{server.port}', 'Authorization': f'Bearer {server.token}'}
+    headers.update(extra)
+    return headers
+
+
+def test_token_is_written_while_serving(server):
+    with open(server.token_path) as f:
+        assert f.read().strip() == server.token
+    if os.name == 'posix':
+        assert os.stat(server.token_path).st_mode & 0o077 == 0
+    path = server.token_path
+    server.stop()
+    assert not os.path.exists(path)
+
+
+def test_requests_with_the_token_are_served(server):
+    status, body = _request(server, 'POST', '/programs/Farm/start', _headers(server))
+    assert status == 202
+    assert server.controller.started == ['Farm']
+
+
+@pytest.mark.parametrize('authorization', [None, 'Bearer wrong', 'Basic x'])
+def test_requests_without_the_token_are_refused(server, authorization):
+    headers = _headers(server)
+    del headers['Authorization']
+    if authorization is not None:
+        headers['Authorization'] = authorization
+    status, _ = _request(server, 'POST', '/programs/Farm/start', headers)
+    assert status == 401
+    assert server.controller.started == []
+
+
+def test_requests_from_web_pages_are_refused(server):
+    status, _ = _request(server, 'POST', '/programs/Farm/start',
+                         _headers(server, Origin='http://example.com'))
+    assert status == 403
+    assert server.controller.started == []
+
+
+@pytest.mark.parametrize('host', ['example.com', 'attacker.test:8765', ''])
+def test_requests_for_other_hosts_are_refused(server, host):
+    status, _ = _request(server, 'GET', '/programs', _headers(server, Host=host))
+    assert status == 403
+
+
+@pytest.mark.parametrize('host', ['localhost', '127.0.0.1:8765', '[::1]:8765'])
+def test_local_host_names_are_accepted(server, host):
+    status, body = _request(server, 'GET', '/programs', _headers(server, Host=host))
+    assert status == 200
+    assert body['programs'][0]['name'] == 'Farm'
+
+
+def test_profiles_are_served_once_the_run_has_finished(server):
+    profiler = Profiler([])
+    server.controller.engine = Engine(profiler)
+    profiler.start()
+    status, _ = _request(server, 'GET', '/programs/Farm/profile', _headers(server))
+    assert status == 409
+    profiler.finish(3)
+    status, body = _request(server, 'GET', '/programs/Farm/profile', _headers(server))
+    assert status == 200
+    assert body['run']['loops'] == 3
+
+
+def test_bodies_are_not_read_before_the_token_is_checked(server):
+    headers = _headers(server, **{'Content-Length': '10000000000'})
+    del headers['Authorization']
+    status, _ = _request(server, 'POST', '/programs/Farm/start', headers)
+    assert status == 401
+
+
+def test_large_bodies_are_refused(server):
+    status, _ = _request(server, 'POST', '/programs/Farm/start',
+                         _headers(server, **{'Content-Length': '10000000000'}))
+    assert status == 413
+    assert server.controller.started == []
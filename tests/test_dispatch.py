@@ -0,0 +1,85 @@
+import threading
+import time
+
+from backends import RecordingBackend
+from dispatch import InputDispatcher
+
+
+def _wait_for_depth(dispatcher, depth):
+    deadline = time.perf_counter() + 5.0
+    while dispatcher.depth < depth:
+        assert time.perf_counter() < deadline, "callers never queued"
+        time.sleep(0.001)
+
+
+def test_atomic_groups_from_concurrent_clients_are_not_interleaved():
+    backend = RecordingBackend()
+    dispatcher = InputDispatcher(backend)
+    start = threading.Barrier(2)
+
+    def produce(name, key):
+        client = dispatcher.client(name)
+        start.wait()
+        for _ in range(50):
+            with client.atomic():
+                client.key_down(key)
+                time.sleep(0.0002)      # give the other thread every chance to cut in
+                client.key_press(key)
+                client.key_up(key)
+            client.click()
+
+    threads = [threading.Thread(target=produce, args=(name, key)) for name, key in (('A', 'a'), ('B', 'b'))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = [(event.kind,) + event.args for event in backend.events]
+    assert len(events) == 2 * 50 * 4
+    i = 0
+    while i < len(events):
+        if events[i][0] == 'click':
+            i += 1
+            continue
+        key = events[i][1]
+        assert events[i:i + 3] == [('key_down', key), ('key_press', key), ('key_up', key)]
+        i += 3
+    stats = dispatcher.stats()
+    assert set(stats) == {'A', 'B'}
+    assert stats['A']['calls'] == stats['B']['calls'] == 100
+
+
+def test_waiting_calls_go_by_priority_then_arrival():
+    backend = RecordingBackend()
+    dispatcher = InputDispatcher(backend)
+    holder = dispatcher.client('holder')
+    threads = []
+    with holder.atomic():
+        for depth, (name, priority) in enumerate([('low', 0), ('high', 5), ('low2', 0), ('high2', 5)], 1):
+            client = dispatcher.client(name, priority)
+            thread = threading.Thread(target=client.key_press, args=(name,))
+            thread.start()
+            threads.append(thread)
+            _wait_for_depth(dispatcher, depth)
+        holder.key_press('holder')     # the owner's own calls never queue
+    for thread in threads:
+        thread.join()
+    assert [event.args[0] for event in backend.events] == ['holder', 'high', 'high2', 'low', 'low2']
+    assert dispatcher.stats()['low']['max_depth'] == 1
+    assert dispatcher.stats()['high2']['max_depth'] == 4
+
+
+def test_nested_atomic_groups_keep_the_turn():
+    backend = RecordingBackend()
+    dispatcher = InputDispatcher(backend)
+    client = dispatcher.client('A')
+    other = dispatcher.client('B')
+    with client.atomic():
+        with client.atomic():
+            client.key_down('shift')
+        thread = threading.Thread(target=other.key_press, args=('b',))
+        thread.start()
+        _wait_for_depth(dispatcher, 1)
+        client.key_up('shift')
+    thread.join()
+    assert [event.args[0] for event in backend.events] == ['shift', 'shift', 'b']
@@ -0,0 +1,251 @@
+import pytest
+
+from backends import RecordingBackend
+from engine import Engine, EngineListener, RESULT_COMPLETED, RESULT_FAILED, RESULT_STOPPED
+from program import (ErrorPolicy, ON_ERROR_GOTO, ON_ERROR_SKIP, ON_ERROR_STOP, RETRY_DELAY,
+                     compile_rows, parse_error_policy)
+from scheduler import SleepTimer
+from screen import PixelSampler, SyntheticSource
+
+
+def _run(rows, repetitions=1, **kwargs):
+    backend = RecordingBackend()
+    engine = Engine(compile_rows(rows), repetitions=repetitions, backend=backend, mouse_speed=0, **kwargs)
+    result = engine.run()
+    return result, [(event.kind,) + event.args for event in backend.events], engine
+
+
+def test_rows_become_backend_calls_in_order():
+    result, events, _ = _run([{'key': 'a'}, {'key': 'click(10,20)'}, {'key': 'type(hi)'},
+                              {'key': 'enter'}, {'key': 'b', 'hold': '0.01'}])
+    assert result == RESULT_COMPLETED
+    assert events == [('key_press', 'a'), ('mouse_move', 10, 20), ('click', 'left'), ('write', 'hi'),
+                      ('key_press', 'enter'), ('key_down', 'b'), ('key_up', 'b')]
+
+
+def test_repetitions_and_jumps():
+    result, events, engine = _run([{'key': 'a'}, {'key': 'b', 'jump': '0', 'jumpcount': '2'}, {'key': 'c'}],
+                                  repetitions=2)
+    assert result == RESULT_COMPLETED
+    assert [event[1] for event in events] == list('abababc') * 2
+    assert engine.progress.loop == 2
+    assert engine.progress.steps == 14
+
+
+def test_keys_held_by_the_run_are_released_at_the_end():
+    result, events, _ = _run([{'key': '+shift'}, {'key': 'x'}])
+    assert result == RESULT_COMPLETED
+    assert events == [('key_down', 'shift'), ('key_press', 'x'), ('key_up', 'shift')]
+
+
+def test_safe_mode_stops_before_dangerous_keys():
+    errors = []
+
+    class Listener(EngineListener):
+        def on_error(self, title, message):
+            errors.append(title)
+
+    result, events, engine = _run([{'key': 'a'}, {'key': 'alt'}, {'key': 'b'}], safe_mode=True,
+                                  listener=Listener())
+    assert result == RESULT_FAILED
+    assert events == [('key_press', 'a')]
+    assert engine.failed and len(errors) == 1
+
+
+def test_stop_from_a_listener_ends_the_run():
+    class Listener(EngineListener):
+        def on_row_done(self, index):
+            if index == 1:
+                engine.stop()
+
+    backend = RecordingBackend()
+    engine = Engine(compile_rows([{'key': 'a'}, {'key': 'b'}, {'key': 'c'}]), backend=backend,
+                    listener=Listener())
+    assert engine.run() == RESULT_STOPPED
+    assert [event.args[0] for event in backend.events] == ['a', 'b']
+    assert engine.stop_latency is not None and not engine.running
+
+
+def test_a_failing_backend_before_the_first_row_still_ends_the_run():
+    finished = []
+
+    class Listener(EngineListener):
+        def on_finish(self, result):
+            finished.append(result)
+
+    class Broken(RecordingBackend):
+        def position(self):
+            raise OSError("no display")
+
+    engine = Engine(compile_rows([{'key': 'a'}]), repetitions=1, backend=Broken(), listener=Listener())
+    try:
+        engine.run()
+    except OSError:
+        pass
+    assert not engine.running
+    assert finished == [RESULT_STOPPED]
+
+
+def test_keys_that_cannot_be_released_are_reported():
+    from tracelog import Tracer, EVENT_ERROR
+    errors = []
+
+    class Listener(EngineListener):
+        def on_error(self, title, message):
+            errors.append((title, message))
+
+    class Stuck(RecordingBackend):
+        def key_up(self, key):
+            raise OSError("device gone")
+
+    tracer = Tracer()
+    engine = Engine(compile_rows([{'key': '+shift'}]), repetitions=1, backend=Stuck(),
+                    listener=Listener(), tracer=tracer, name='main')
+    assert engine.run() == RESULT_COMPLETED
+    assert errors == [("Release Error", "Could not release 'shift'.\nError: device gone")]
+    assert [event['detail']['title'] for event in tracer.snapshot() if event['event'] == EVENT_ERROR] == ["Release Error"]
+
+
+class FlakyBackend(RecordingBackend):
+    """Raises on the first failures presses of key."""
+
+    def __init__(self, key, failures=10 ** 6):
+        super().__init__()
+        self.key = key
+        self.failures = failures
+        self.attempts = 0
+
+    def key_press(self, key):
+        if key == self.key:
+            self.attempts += 1
+            if self.attempts <= self.failures:
+                raise OSError(f"cannot press {key}")
+        super().key_press(key)
+
+
+class WaitLog(SleepTimer):
+    """Records the waits instead of sleeping."""
+
+    def __init__(self):
+        self.waits = []
+
+    def begin_row(self):
+        pass
+
+    def wait(self, seconds):
+        self.waits.append(seconds)
+
+
+class RowErrors(EngineListener):
+    def __init__(self):
+        self.row_errors = []
+        self.errors = []
+
+    def on_row_error(self, index, title, message, handling):
+        self.row_errors.append((index, handling, message))
+
+    def on_error(self, title, message):
+        self.errors.append((title, message))
+
+
+def _run_flaky(rows, backend, error_policy=None):
+    listener = RowErrors()
+    timer = WaitLog()
+    engine = Engine(compile_rows(rows), repetitions=1, backend=backend, timer=timer, listener=listener,
+                    error_policy=error_policy)
+    result = engine.run()
+    return result, [event.args[0] for event in backend.events], listener, timer
+
+
+ABC = [{'key': 'a'}, {'key': 'b'}, {'key': 'c'}]
+
+
+def test_failed_actions_stop_the_run_by_default():
+    result, keys, listener, _ = _run_flaky(ABC, FlakyBackend('b'))
+    assert result == RESULT_FAILED
+    assert keys == ['a']
+    assert len(listener.errors) == 1 and listener.row_errors == []
+    assert "Automation stopped." in listener.errors[0][1]
+
+
+def test_run_policy_skip_goes_on_with_the_next_row():
+    result, keys, listener, _ = _run_flaky(ABC, FlakyBackend('b'), parse_error_policy('skip'))
+    assert result == RESULT_COMPLETED
+    assert keys == ['a', 'c']
+    assert [(index, handling) for index, handling, _ in listener.row_errors] == [(1, ON_ERROR_SKIP)]
+    assert listener.errors == []
+
+
+def test_retries_back_off_and_succeed():
+    rows = [{'key': 'onerror(retry,3,0.1)'}] + ABC
+    backend = FlakyBackend('b', failures=2)
+    result, keys, listener, timer = _run_flaky(rows, backend)
+    assert result == RESULT_COMPLETED
+    assert keys == ['a', 'b', 'c']
+    assert backend.attempts == 3
+    assert [handling for _, handling, _ in listener.row_errors] == ['retry 1/3', 'retry 2/3']
+    assert [seconds for seconds in timer.waits if seconds] == [0.1, 0.2]
+
+
+def test_retries_that_run_out_fall_back_to_the_policy_action():
+    rows = [{'key': 'onerror(retry,1,0,skip)'}] + ABC
+    result, keys, listener, _ = _run_flaky(rows, FlakyBackend('b'))
+    assert result == RESULT_COMPLETED
+    assert keys == ['a', 'c']
+    assert [handling for _, handling, _ in listener.row_errors] == ['retry 1/1', ON_ERROR_SKIP]
+    assert "Tried 2 times." in listener.row_errors[-1][2]
+
+    rows = [{'key': 'onerror(retry,1,0)'}] + ABC
+    result, keys, listener, _ = _run_flaky(rows, FlakyBackend('b'))
+    assert result == RESULT_FAILED
+    assert keys == ['a']
+    assert "Tried 2 times." in listener.errors[0][1]
+
+
+def test_goto_policy_continues_at_its_target():
+    rows = [{'key': 'onerror(goto,cleanup)'}] + ABC + [{'key': 'label(cleanup)'}, {'key': 'z'}]
+    result, keys, listener, _ = _run_flaky(rows, FlakyBackend('b'))
+    assert result == RESULT_COMPLETED
+    assert keys == ['a', 'z']
+    assert listener.row_errors[0][1] == ON_ERROR_GOTO
+
+
+def test_row_policies_apply_until_the_next_onerror_row():
+    rows = [{'key': 'onerror(skip)'}, {'key': 'b'}, {'key': 'onerror(default)'}, {'key': 'b'}, {'key': 'c'}]
+    result, keys, listener, _ = _run_flaky(rows, FlakyBackend('b'))
+    assert result == RESULT_FAILED
+    assert keys == []
+    assert [handling for _, handling, _ in listener.row_errors] == [ON_ERROR_SKIP]
+    assert len(listener.errors) == 1
+
+
+@pytest.mark.parametrize('text', ['retry', 'retry,0', 'retry,2,-1', 'goto,3', 'ignore', 'skip,now'])
+def test_invalid_run_policies_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_error_policy(text)
+
+
+def test_policy_text_is_parsed():
+    assert parse_error_policy('') is None
+    assert parse_error_policy('retry,2') == ErrorPolicy(2, RETRY_DELAY, ON_ERROR_STOP, -1)
+    assert parse_error_policy('retry,2,1.5,skip') == ErrorPolicy(2, 1.5, ON_ERROR_SKIP, -1)
+
+
+def test_a_reused_engine_does_not_take_a_branch_left_by_a_stopped_run():
+    runs = []
+
+    def red(x, y):
+        if len(runs) == 1:
+            engine.stop()   # while ifcolor picks its target, so the first run never takes it
+        return (255, 0, 0)
+
+    backend = RecordingBackend()
+    rows = [{'key': 'a'}, {'key': 'b'}, {'key': 'ifcolor(255,0,0,5,5)>end'}, {'key': 'd'},
+            {'key': 'label(end)'}, {'key': 'e'}]
+    engine = Engine(compile_rows(rows), repetitions=1, backend=backend,
+                    sampler=PixelSampler(SyntheticSource(red)))
+    for expected in (RESULT_STOPPED, RESULT_COMPLETED):
+        runs.append(expected)
+        backend.clear()
+        assert engine.run() == expected
+    assert [event.args[0] for event in backend.events] == ['a', 'b', 'e']
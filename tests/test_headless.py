@@ -0,0 +1,26 @@
+from backends import RecordingBackend
+from engine import RESULT_COMPLETED
+from headless import HeadlessRunner
+
+
+def _configs():
+    main = {'title': 'Main', 'run_mode': 'limited', 'repetitions': '5',
+            'rows': [{'key': 'a'}, {'key': '>Sub'}]}
+    sub = {'title': 'Sub', 'run_mode': 'limited', 'repetitions': '2', 'rows': [{'key': 'b'}]}
+    return [('main.json', main), ('sub.json', sub)]
+
+
+def _keys(repetitions):
+    backend = RecordingBackend()
+    runner = HeadlessRunner(_configs(), repetitions=repetitions, backend=backend, mouse_speed=0)
+    runner.compile()
+    assert runner.run_program('Main') == RESULT_COMPLETED
+    return ''.join(event.args[0] for event in backend.events)
+
+
+def test_saved_repetitions_are_used_without_an_override():
+    assert _keys(None) == 'abb' * 5
+
+
+def test_the_override_does_not_change_how_often_chained_programs_run():
+    assert _keys(3) == 'abb' * 3
@@ -0,0 +1,100 @@
+import pytest
+
+from hotkeys import HotkeyRegistry, describe_failures, normalize
+
+
+class FakeHook:
+    """Stands in for the keyboard module; rejects the combos in bad."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.hooks = {}
+        self.added = 0
+        self._handles = iter(range(1, 10 ** 6))
+
+    def add_hotkey(self, combo, callback):
+        if combo in self.bad:
+            raise ValueError(f"unknown key in {combo!r}")
+        self.added += 1
+        handle = next(self._handles)
+        self.hooks[handle] = (combo, callback)
+        return handle
+
+    def remove_hotkey(self, handle):
+        del self.hooks[handle]
+
+    def press(self, combo):
+        for hooked, callback in list(self.hooks.values()):
+            if hooked == combo:
+                callback()
+
+
+class Owner:
+    pass
+
+
+@pytest.fixture
+def hook():
+    return FakeHook(bad={'ctrl+nosuchkey'})
+
+
+@pytest.fixture
+def registry(hook):
+    return HotkeyRegistry(hook)
+
+
+def test_combos_are_normalized():
+    assert normalize(' Ctrl + F2 ') == 'ctrl+f2'
+
+
+def test_one_hook_per_combo_however_often_it_is_bound(registry, hook):
+    tabs = [Owner(), Owner()]
+    calls = []
+    for _ in range(5):     # rebinding on every run or load
+        for i, tab in enumerate(tabs):
+            registry.bind(tab, 'start', ['Ctrl+F2', 'ctrl+f2 '], lambda i=i: calls.append(i))
+    assert hook.added == 1 and registry.hook_count == 1
+    hook.press('ctrl+f2')
+    assert sorted(calls) == [0, 1]
+    assert sorted(registry.bindings()['ctrl+f2'], key=lambda key: tabs.index(key[0])) == \
+        [(tabs[0], 'start'), (tabs[1], 'start')]
+
+
+def test_rebinding_replaces_the_previous_combos(registry, hook):
+    tab = Owner()
+    calls = []
+    registry.bind(tab, 'start', ['ctrl+f2'], lambda: calls.append('f2'))
+    registry.bind(tab, 'start', ['ctrl+f5'], lambda: calls.append('f5'))
+    hook.press('ctrl+f2')
+    hook.press('ctrl+f5')
+    assert calls == ['f5']
+    assert list(registry.bindings()) == ['ctrl+f5']
+    assert len(hook.hooks) == 1
+
+
+def test_hooks_are_removed_with_their_last_binding(registry, hook):
+    first, second = Owner(), Owner()
+    registry.bind(first, 'start', ['ctrl+f2'], lambda: None)
+    registry.bind(first, 'stop', ['ctrl+f3'], lambda: None)
+    registry.bind(second, 'start', ['ctrl+f2'], lambda: None)
+    registry.unbind_all(first)
+    assert registry.hook_count == 1 and list(registry.bindings()) == ['ctrl+f2']
+    registry.unbind(second, 'start')
+    assert registry.hook_count == 0 and hook.hooks == {}
+
+
+def test_rejected_combos_are_reported_and_the_rest_bound(registry, hook):
+    tab = Owner()
+    calls = []
+    failed = registry.bind(tab, 'start', ['ctrl+f2', 'ctrl+NoSuchKey'], lambda: calls.append(1))
+    assert [combo for combo, _ in failed] == ['ctrl+nosuchkey']
+    assert isinstance(failed[0][1], ValueError)
+    hook.press('ctrl+f2')
+    assert calls == [1]
+    assert list(registry.bindings()) == ['ctrl+f2']
+
+
+def test_failures_are_described_one_per_line():
+    failed = [('ctrl+zz', ValueError("unknown key 'zz'")), ('alt+qq', ValueError("unknown key 'qq'"))]
+    assert describe_failures(failed) == "alt+qq: unknown key 'qq'\nctrl+zz: unknown key 'zz'"
+    assert describe_failures([]) == ""
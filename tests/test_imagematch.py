@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import imagematch
+from imagematch import Template, image_condition, load_template, to_gray
+from screen import SyntheticSource
+
+
+def _screen(seed=1, size=(120, 160)):
+    """A smooth random texture, so every template position is distinct."""
+    rng = np.random.default_rng(seed)
+    noise = rng.random((size[0] // 8, size[1] // 8, 3))
+    image = Image.fromarray((noise * 255).astype(np.uint8)).resize(size[::-1], Image.BILINEAR)
+    return np.asarray(image)
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    screen = _screen()
+    path = tmp_path / 'button.png'
+    Image.fromarray(screen[40:72, 90:130]).save(path)
+    return screen, str(path)
+
+
+def test_template_is_found_where_it_was_cut_from(template_file):
+    screen, path = template_file
+    condition = image_condition(path, (0, 0, 159, 119))
+    frame = SyntheticSource(screen).grab(condition.bbox)
+    assert condition.matches(frame)
+    assert condition.score > 0.99
+    assert condition.found == (90 + 40 // 2, 40 + 32 // 2)
+
+
+def test_template_is_found_inside_an_offset_region(template_file):
+    screen, path = template_file
+    condition = image_condition(path, (150, 110, 60, 20))     # corners in any order
+    frame = SyntheticSource(screen).grab(condition.bbox)
+    assert condition.matches(frame)
+    assert condition.found == (110, 56)
+
+
+def test_other_screens_do_not_match(template_file):
+    _, path = template_file
+    condition = image_condition(path, (0, 0, 159, 119))
+    assert not condition.matches(SyntheticSource(_screen(seed=2)).grab(condition.bbox))
+    assert condition.found is None
+
+
+def test_flat_templates_are_rejected():
+    with pytest.raises(ValueError):
+        Template(np.full((16, 16), 100.0))
+
+
+def test_region_smaller_than_the_template_does_not_match(template_file):
+    screen, path = template_file
+    template = load_template(path)
+    assert template.match(to_gray(screen[:10, :10])) is None
+
+
+def test_cache_keeps_the_most_recently_used_templates(tmp_path, monkeypatch):
+    monkeypatch.setattr(imagematch, 'CACHE_SIZE', 2)
+    monkeypatch.setattr(imagematch, '_cache', imagematch.OrderedDict())
+    screen = _screen()
+    paths = []
+    for i in range(3):
+        path = tmp_path / f'{i}.png'
+        Image.fromarray(screen[i * 10:i * 10 + 32, :32]).save(path)
+        paths.append(str(path))
+    first = load_template(paths[0])
+    load_template(paths[1])
+    assert load_template(paths[0]) is first     # now the most recently used
+    load_template(paths[2])
+    cached = [key[0] for key in imagematch._cache]
+    assert cached == [paths[0], paths[2]]
+    assert load_template(paths[0]) is first
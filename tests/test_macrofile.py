@@ -0,0 +1,22 @@
+from macrofile import load_macro, write_macro
+
+
+def test_rows_with_only_default_fields_survive_a_round_trip(tmp_path):
+    rows = [
+        {'key': 'a', 'sleep': '0.5', 'hold': '0.0', 'jump': '0', 'jumpcount': '0'},
+        {'key': '', 'sleep': '0.0', 'hold': '0.0', 'jump': '0', 'jumpcount': '0'},
+        {'key': '', 'sleep': '0.0', 'hold': '0.0', 'jump': '0', 'jumpcount': '0'},
+        {'key': 'b', 'sleep': '0.0', 'hold': '0.0', 'jump': '2', 'jumpcount': '3'},
+    ]
+    path = str(tmp_path / 'macro.skm')
+    write_macro(path, {'title': 'gaps', 'rows': rows})
+    config = load_macro(path)
+    assert config['title'] == 'gaps'
+    assert config['rows'] == rows
+
+
+def test_moves_are_delta_encoded_and_restored(tmp_path):
+    rows = [{'key': 'moveto(100,200)'}, {'key': 'moveto(90,230,0.5)'}, {'key': '~literal'}]
+    path = str(tmp_path / 'moves.skm.gz')
+    write_macro(path, {}, rows)
+    assert [row['key'] for row in load_macro(path)['rows']] == [row['key'] for row in rows]
@@ -0,0 +1,101 @@
+import math
+
+import pytest
+
+from backends import RecordingBackend
+from engine import Engine, RESULT_COMPLETED
+from mousepath import MAX_DURATION, MIN_DURATION, SHAPES, MouseModel, parse_speed, trajectory
+from program import compile_rows
+
+MOVES = [(300, 0), (0, -250), (-123, 457), (1, 1), (800, 600)]
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('dx, dy', MOVES)
+def test_paths_end_exactly_at_the_target(shape, dx, dy):
+    points = trajectory(dx, dy, 25, shape, seed=7)
+    assert len(points) == 25
+    assert points[-1] == (dx, dy)
+    assert all(isinstance(x, int) and isinstance(y, int) for x, y in points)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_paths_stay_near_the_straight_line(shape):
+    dx, dy = 400, 300
+    length = math.hypot(dx, dy)
+    for x, y in trajectory(dx, dy, 50, shape, seed=3):
+        off_line = abs(x * dy - y * dx) / length
+        assert off_line < 0.3 * length
+
+
+def test_linear_paths_move_at_constant_speed():
+    points = ((0, 0),) + trajectory(500, 0, 10, 'linear')
+    assert [b[0] - a[0] for a, b in zip(points, points[1:])] == [50] * 10
+
+
+def test_curved_paths_are_slow_at_the_ends():
+    points = ((0, 0),) + trajectory(1000, 0, 20, 'bezier')
+    steps = [math.dist(a, b) for a, b in zip(points, points[1:])]
+    assert steps[0] < steps[10] and steps[-1] < steps[10]
+
+
+def test_human_paths_are_deterministic_for_a_seed():
+    assert trajectory(500, 200, 40, 'human', seed='a') == trajectory(500, 200, 40, 'human', seed='a')
+    assert trajectory(500, 200, 40, 'human', seed='a') != trajectory(500, 200, 40, 'human', seed='b')
+    plans = [[MouseModel(seconds=0.2, shape='human').plan((10, 10), (510, 210)) for _ in range(5)]
+             for _ in range(2)]
+    assert plans[0] == plans[1]
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_plans_fit_the_requested_duration(shape):
+    model = MouseModel(seconds=0.3, shape=shape, rate=100)
+    points, interval = model.plan((100, 100), (700, 500))
+    assert points[-1] == (700, 500)
+    assert len(points) == 30
+    assert len(points) * interval == pytest.approx(0.3)
+    points, interval = model.plan((100, 100), (700, 500), duration=0.05)
+    assert len(points) * interval <= 0.05 + 1e-9
+
+
+def test_speeds_in_pixels_per_second_are_clamped():
+    model = MouseModel(pixels_per_second=1000)
+    assert model.duration(500) == pytest.approx(0.5)
+    assert model.duration(1) == MIN_DURATION
+    assert model.duration(10 ** 6) == MAX_DURATION
+    assert model.duration(0) == 0.0
+
+
+def test_instant_and_empty_moves_are_one_point():
+    assert MouseModel(seconds=0).plan((5, 5), (50, 60)) == (((50, 60),), 0.0)
+    assert MouseModel(seconds=1).plan((5, 5), (5, 5)) == (((5, 5),), 0.0)
+
+
+def test_paths_are_cached():
+    model = MouseModel(seconds=0.1, shape='bezier')
+    first = model.plan((0, 0), (100, 100))
+    assert model.plan((50, 50), (150, 150))[0] == tuple((x + 50, y + 50) for x, y in first[0])
+    assert (model.hits, model.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('text, parsed', [
+    ('0.05', (0.05, None)), ('2000px/s', (None, 2000.0)), (' 1500 PX/S ', (None, 1500.0)), ('0', (0.0, None)),
+])
+def test_parse_speed(text, parsed):
+    assert parse_speed(text) == parsed
+
+
+@pytest.mark.parametrize('text', ['-1', '0px/s', 'fast'])
+def test_parse_speed_rejects_bad_values(text):
+    with pytest.raises(ValueError):
+        parse_speed(text)
+
+
+def test_engine_replays_the_path_and_lands_on_the_target():
+    backend = RecordingBackend()
+    model = MouseModel(seconds=0.05, shape='human', rate=200)
+    engine = Engine(compile_rows([{'key': 'moveto(400,300)'}]), repetitions=1, backend=backend, mouse_speed=model)
+    assert engine.run() == RESULT_COMPLETED
+    moves = [event.args for event in backend.events if event.kind == 'mouse_move']
+    assert len(moves) == 10
+    assert moves[-1] == (400, 300)
@@ -0,0 +1,34 @@
+from backends import NullBackend
+from engine import Engine, RESULT_COMPLETED
+from profiler import Profiler
+from program import compile_rows
+from screen import PixelSampler, SyntheticSource
+
+WAIT = {'key': 'waitcolor(255,0,0,1,1)'}
+
+
+def _sampler():
+    return PixelSampler(source=SyntheticSource(lambda x, y: (255, 0, 0)), interval=0.0)
+
+
+def test_waits_in_chained_programs_are_not_recorded_in_the_caller():
+    main = compile_rows([WAIT, {'key': '>sub'}])
+    sub = compile_rows([{'key': 'a'}, {'key': 'b'}, {'key': 'c'}, WAIT])
+    profiler = Profiler(main)
+    engine = Engine(main, repetitions=1, backend=NullBackend(), sampler=_sampler(),
+                    profiler=profiler, chains={'sub': (sub, 1)}, name='main')
+    assert engine.run() == RESULT_COMPLETED
+    assert profiler.rows[0].waits.count == 1
+    assert profiler.rows[1].waits.count == 0
+
+
+def test_streamed_programs_with_waits_can_be_profiled(tmp_path):
+    from macrofile import write_macro
+    from program import StreamedProgram
+    path = str(tmp_path / 'waits.skm')
+    write_macro(path, {'title': 'waits'}, [{'key': 'a'}, WAIT])
+    program = StreamedProgram(path)
+    profiler = Profiler(program)
+    engine = Engine(program, repetitions=1, backend=NullBackend(), sampler=_sampler(), profiler=profiler)
+    assert engine.run() == RESULT_COMPLETED
+    assert profiler.backend_calls['key_press'].count == 1
@@ -0,0 +1,105 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import programcache
+from program import ProgramError
+from programcache import ProgramCache, SUFFIX
+
+ROWS = [{'key': 'a', 'sleep': '0.1'}, {'key': 'click(10,20)'}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ProgramCache(str(tmp_path / 'cache'))
+
+
+def _entries(cache):
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith(SUFFIX))
+
+
+def test_keys_hash_the_input_and_the_program_version(monkeypatch):
+    key = ProgramCache.key('program', b'rows')
+    assert key.startswith('program-') and len(key) == len('program-') + 64
+    assert ProgramCache.key('program', b'rows') == key
+    assert ProgramCache.key('program', b'other rows') != key
+    assert ProgramCache.key('config', b'rows') != key
+    monkeypatch.setattr(programcache, '_TAG', programcache._TAG + b'-next')
+    assert ProgramCache.key('program', b'rows') != key
+
+
+def test_compiled_programs_are_reused(cache):
+    first = cache.compile_rows(ROWS)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.compile_rows([dict(row) for row in ROWS]) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.compile_rows(ROWS + [{'key': 'b'}])
+    assert cache.misses == 2
+    assert len(_entries(cache)) == 2
+
+
+def test_configurations_are_keyed_by_file_contents(cache, tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'title': 'One', 'rows': ROWS}))
+    assert cache.load_config(str(path))['title'] == 'One'
+    assert cache.load_config(str(path))['title'] == 'One'
+    assert cache.hits == 1
+    path.write_text(json.dumps({'title': 'Two', 'rows': ROWS}))
+    assert cache.load_config(str(path))['title'] == 'Two'
+    assert cache.hits == 1
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_entries = 2
+    keys = [cache.key('program', bytes([i])) for i in range(3)]
+    for age, key in zip((30, 20), keys):
+        cache.put(key, key)
+        os.utime(cache._path(key), (1000 - age, 1000 - age))
+    assert cache.get(keys[0]) == keys[0]     # used now, so keys[1] is the oldest
+    cache.put(keys[2], keys[2])
+    assert _entries(cache) == sorted(key + SUFFIX for key in (keys[0], keys[2]))
+
+
+def test_entries_beyond_max_bytes_are_evicted(cache):
+    cache.max_bytes = 1500
+    for i in range(3):
+        key = cache.key('program', bytes([i]))
+        cache.put(key, b'x' * 600)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    cache.evict()
+    assert _entries(cache) == sorted(cache.key('program', bytes([i])) + SUFFIX for i in (1, 2))
+
+
+def test_unreadable_entries_are_dropped(cache):
+    key = cache.key('program', b'broken')
+    cache.put(key, 'value')
+    with open(cache._path(key), 'wb') as f:
+        f.write(b'not a pickle')
+    assert cache.get(key) is None
+    assert _entries(cache) == []
+
+
+def test_programs_are_recompiled_when_an_image_has_gone(cache, tmp_path):
+    image = tmp_path / 'button.png'
+    Image.fromarray(np.random.default_rng(0).integers(0, 255, (16, 16, 3), dtype=np.uint8)).save(image)
+    rows = [{'key': f'waitimage({image},0,0,100,100)'}]
+    program = cache.compile_rows(rows)
+    assert cache.compile_rows(rows) == program and cache.hits == 1
+    os.remove(image)
+    with pytest.raises(ProgramError, match='not found'):
+        cache.compile_rows(rows)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="permission bits are POSIX only")
+def test_directories_others_can_write_to_are_not_used(cache):
+    cache.compile_rows(ROWS)
+    assert os.stat(cache.directory).st_mode & 0o777 == 0o700
+    os.chmod(cache.directory, 0o777)
+    untrusted = ProgramCache(cache.directory)
+    untrusted.compile_rows(ROWS)
+    untrusted.compile_rows(ROWS + [{'key': 'b'}])
+    assert untrusted.hits == 0
+    assert len(_entries(untrusted)) == 1     # nothing read, nothing written
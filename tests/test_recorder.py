@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+from program import compile_rows, OP_KEY, OP_TYPE, OP_CLICK, OP_MOVETO, DOWN, UP
+from recorder import Recorder, key_code, key_name, RECORDED_KEY_NAMES
+
+
+def _named(pynput_name):
+    return key_name(SimpleNamespace(char=None, name=pynput_name))
+
+
+def _stream():
+    """Ctrl+C with the left Ctrl held, a tap of a, a right-shift press, a drag."""
+    ctrl, shift = _named('ctrl_l'), _named('shift_r')
+    return [
+        (0.00, 'key_down', (ctrl,)),
+        (0.05, 'key_down', ('c',)),
+        (0.10, 'key_up', ('c',)),
+        (0.20, 'key_up', (ctrl,)),
+        (0.30, 'key_down', ('a',)),
+        (0.35, 'key_up', ('a',)),
+        (0.40, 'key_down', (shift,)),
+        (0.45, 'key_up', (shift,)),
+        (0.50, 'move', (10, 10)),
+        (0.55, 'move', (50, 10)),
+        (0.60, 'button_down', ('left', 50, 10)),
+        (0.65, 'move', (90, 40)),
+        (0.70, 'button_up', ('left', 90, 40)),
+        (0.80, 'key_down', ('+',)),
+        (0.85, 'key_up', ('+',)),
+    ]
+
+
+def test_recorded_rows_compile_to_key_presses():
+    recorder = Recorder()
+    recorder.feed(_stream())
+    rows = recorder.to_rows()
+    program = compile_rows(rows)
+    keys = [ins for ins in program if not ins.source.startswith(('type(', 'moveto(', '+click', '-click', 'click'))]
+    assert keys
+    assert all(ins.op == OP_KEY for ins in keys), [ins.source for ins in keys if ins.op != OP_KEY]
+    assert [(ins.text, ins.mode) for ins in keys[:2]] == [('ctrl', DOWN), ('c', 0)]
+    assert (keys[2].text, keys[2].mode) == ('ctrl', UP)
+    assert keys[4].text == 'shift' and keys[4].hold > 0
+    # The reserved '+' is typed, not taken for a key-down prefix.
+    assert program[-1].source == 'type(+)' and program[-1].op == OP_TYPE
+    assert any(ins.op == OP_CLICK and ins.mode == DOWN for ins in program)
+    assert any(ins.op == OP_MOVETO for ins in program)
+
+
+def test_every_mapped_pynput_name_compiles_to_a_key():
+    for pynput_name in RECORDED_KEY_NAMES:
+        name = _named(pynput_name)
+        for prefix in ('', '+', '-'):
+            ins = compile_rows([{'key': prefix + name}])[0]
+            assert ins.op == OP_KEY, (pynput_name, prefix + name)
+
+
+def test_unknown_named_keys_are_not_recorded():
+    assert key_name(SimpleNamespace(char=None, name='media_play_pause')) is None
+    assert key_name(SimpleNamespace(char='x', name=None)) == 'x'
+
+
+def _held_at_end(rows):
+    """Keys and buttons a replay of rows leaves held down."""
+    held = set()
+    for row in rows:
+        key = row['key']
+        if key.startswith('+'):
+            held.add(key[1:])
+        elif key.startswith('-'):
+            held.discard(key[1:])
+    return held
+
+
+def test_a_shifted_key_released_as_another_char_is_matched_by_code():
+    recorder = Recorder()
+    recorder.key_down('shift', 0.0, 160)
+    recorder.key_down('A', 0.1, 65)
+    recorder.key_up('shift', 0.2, 160)
+    recorder.key_up('a', 0.3, 65)
+    rows = recorder.to_rows()
+    assert [row['key'] for row in rows] == ['+shift', '+A', '-shift', '-A']
+    assert _held_at_end(rows) == set()
+
+
+def test_a_press_and_release_as_another_char_is_one_row():
+    recorder = Recorder()
+    recorder.feed([(0.0, 'key_down', ('A', 65)), (0.1, 'key_up', ('a', 65))])
+    rows = recorder.to_rows()
+    assert [(row['key'], row['hold']) for row in rows] == [('A', '0.1')]
+
+
+def test_without_codes_releases_match_regardless_of_case():
+    recorder = Recorder()
+    recorder.feed([(0.0, 'key_down', ('shift',)), (0.1, 'key_down', ('A',)),
+                   (0.2, 'key_up', ('shift',)), (0.3, 'key_up', ('a',))])
+    rows = recorder.to_rows()
+    assert [row['key'] for row in rows] == ['+shift', '+A', '-shift', '-A']
+
+
+def test_the_left_arrow_key_and_the_left_button_are_held_separately():
+    recorder = Recorder()
+    recorder.feed([(0.0, 'key_down', ('left',)), (0.1, 'button_down', ('left', 5, 5)),
+                   (0.2, 'key_up', ('left',)), (0.3, 'button_up', ('left', 5, 5))])
+    rows = recorder.to_rows()
+    assert [row['key'] for row in rows] == ['+left', '+click(5,5)', '-left', '-click(5,5)']
+
+
+def test_live_recorder_passes_pynput_key_codes():
+    assert key_code(SimpleNamespace(char='a', vk=65)) == 65
+    assert key_code(SimpleNamespace(name='shift', value=SimpleNamespace(vk=160))) == 160
+    assert key_code(SimpleNamespace(char='a')) is None
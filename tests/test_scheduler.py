@@ -0,0 +1,132 @@
+import threading
+import time
+
+from scheduler import Scheduler, SleepTimer
+
+TICK = 1e-6     # every clock reading advances the fake time by this much
+
+
+class FakeClock:
+    """Time that moves by TICK per reading and by the requested time, plus oversleep, per sleep."""
+
+    def __init__(self, oversleep=0.0):
+        self.now = 100.0
+        self.oversleep = oversleep
+        self.sleeps = []
+
+    def __call__(self):
+        self.now += TICK
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds + self.oversleep
+
+    def work(self, seconds):
+        self.now += seconds
+
+
+class FakeEvent:
+    """An interrupt event that is set from the n-th wait on."""
+
+    def __init__(self, clock, set_on=1):
+        self.clock = clock
+        self.set_on = set_on
+        self.waits = 0
+
+    def wait(self, seconds):
+        self.waits += 1
+        if self.waits >= self.set_on:
+            return True
+        self.clock.sleep(seconds)
+        return False
+
+    def is_set(self):
+        return self.waits >= self.set_on
+
+
+def _scheduler(clock, **kwargs):
+    return Scheduler(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_deadlines_do_not_drift_with_the_time_actions_take():
+    clock = FakeClock()
+    timer = _scheduler(clock)
+    timer.start()
+    start = timer.deadline
+    for _ in range(100):
+        clock.work(0.003)       # the row's action
+        timer.wait(0.01)
+    assert abs(timer.deadline - (start + 1.0)) < 1e-9
+    assert 0 <= clock.now - timer.deadline < 1e-4
+    stats = timer.stats()
+    assert stats['waits'] == 100 and stats['resyncs'] == 0
+    assert stats['late_max'] < 1e-4
+
+
+def test_oversleeping_is_learned_and_spun_off():
+    clock = FakeClock(oversleep=0.002)
+    timer = _scheduler(clock)
+    timer.start()
+    for _ in range(20):
+        timer.wait(0.02)
+    assert timer.oversleep > 0.0015
+    assert timer.stats()['late_max'] < 0.0025
+    # Once learned, sleeps end early enough that the deadline is not overshot.
+    assert clock.now - timer.deadline < 1e-4
+
+
+def test_short_waits_only_spin():
+    clock = FakeClock()
+    timer = _scheduler(clock)
+    timer.start()
+    timer.wait(0.0005)
+    assert clock.sleeps == []
+    assert timer.stats()['waits'] == 1
+
+
+def test_falling_far_behind_rebases_the_timeline():
+    clock = FakeClock()
+    timer = _scheduler(clock, max_lag=0.25)
+    timer.start()
+    timer.wait(0.01)
+    clock.work(0.5)             # a stall much longer than the delay
+    timer.wait(0.01)
+    assert timer.stats()['resyncs'] == 1
+    assert timer.deadline >= clock.now - 1e-4
+    timer.wait(0.01)
+    assert timer.stats()['resyncs'] == 1
+
+
+def test_interrupt_ends_the_wait_without_recording_it():
+    clock = FakeClock()
+    timer = _scheduler(clock)
+    timer.start(interrupt=FakeEvent(clock, set_on=2))
+    timer.wait(0.01)
+    assert timer.stats()['waits'] == 1
+    before = clock.now
+    assert timer.wait_until(before + 10.0) is False     # stopped during the sleep
+    assert clock.now - before < 10.0
+    assert timer.stats()['waits'] == 1
+
+
+def test_nested_starts_keep_the_outer_interrupt():
+    clock = FakeClock()
+    timer = _scheduler(clock)
+    event = FakeEvent(clock)
+    timer.start(interrupt=event)
+    timer.start(interrupt=None)     # a chained run sharing the timer
+    assert timer.interrupt is event
+    timer.stop()
+    timer.stop()
+
+
+def test_stop_interrupts_real_waits():
+    for timer in (Scheduler(), SleepTimer()):
+        event = threading.Event()
+        timer.start(interrupt=event)
+        threading.Timer(0.05, event.set).start()
+        started = time.perf_counter()
+        timer.wait(10.0)
+        assert time.perf_counter() - started < 2.0
+        timer.stop()
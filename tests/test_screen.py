@@ -0,0 +1,81 @@
+import numpy as np
+
+from screen import PixelSampler, SyntheticSource
+
+
+class FakeClock:
+    """A clock that only moves when the sampler sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _sampler(screen, interval=0.05):
+    clock = FakeClock()
+    return PixelSampler(SyntheticSource(screen), interval=interval, clock=clock, sleep=clock.sleep), clock
+
+
+def test_sample_reads_every_point_from_one_grab():
+    screen = np.zeros((20, 30, 3), dtype=np.uint8)
+    screen[5, 7] = (255, 0, 0)
+    screen[15, 25] = (0, 0, 255)
+    sampler, _ = _sampler(screen)
+    assert sampler.sample([(7, 5), (25, 15), (0, 0)]) == [(255, 0, 0), (0, 0, 255), (0, 0, 0)]
+    assert sampler.source.grabs == 1
+    assert sampler.polls == 1
+
+
+def test_sources_serve_functions_and_images_alike():
+    from PIL import Image
+    image = Image.new('RGB', (10, 10), (0, 128, 0))
+    for screen in (lambda x, y: (0, 128, 0), image, np.asarray(image)):
+        sampler, _ = _sampler(screen)
+        assert tuple(sampler.sample([(3, 4)])[0]) == (0, 128, 0)
+
+
+def test_wait_for_color_polls_until_the_screen_changes():
+    screen_color = {'color': (0, 0, 0)}
+    sampler, clock = _sampler(lambda x, y: screen_color['color'])
+
+    def turn_red(seconds):
+        clock.sleep(seconds)
+        if len(clock.sleeps) == 3:
+            screen_color['color'] = (250, 5, 0)
+
+    sampler.sleep = turn_red
+    assert sampler.wait_for_color((255, 0, 0), 4, 4, timeout=1.0)
+    assert sampler.last_polls == 4
+    assert abs(sampler.last_wait - 0.15) < 1e-9
+    assert sampler.polls == 4
+
+
+def test_wait_times_out_without_a_match():
+    sampler, clock = _sampler(lambda x, y: (0, 0, 0), interval=0.1)
+    assert not sampler.wait_for_color((255, 255, 255), 0, 0, timeout=0.35)
+    assert sampler.last_polls == 5
+    assert abs(clock.now - 0.35) < 1e-9     # the last pause is cut short at the deadline
+
+
+def test_wait_ends_when_the_run_stops():
+    sampler, _ = _sampler(lambda x, y: (0, 0, 0))
+    checks = iter([True, True, False])
+    assert not sampler.wait((0, 0, 1, 1), lambda frame: False, 10.0, is_running=lambda: next(checks))
+    assert sampler.last_polls == 2
+
+
+def test_failed_grabs_count_as_no_match():
+    class BrokenSource:
+        def grab(self, bbox):
+            raise OSError("no display")
+
+    sampler = PixelSampler(BrokenSource())
+    assert sampler.sample([(0, 0)]) is None
+    assert sampler.polls == 1
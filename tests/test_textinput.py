@@ -0,0 +1,91 @@
+import pytest
+
+from backends import RecordingBackend
+from engine import Engine, RESULT_COMPLETED
+from program import OP_PASTE, OP_TYPE, ProgramError, compile_rows
+from textinput import MAX_CHUNK, PASTE, PASTE_THRESHOLD, WRITE, plan_text, send_text, unescape
+
+
+class AsciiBackend(RecordingBackend):
+    """Like the pyautogui backends: printable ASCII only."""
+
+    unicode_typing = False
+
+
+class NoPasteBackend(AsciiBackend):
+    can_paste = False
+
+
+LONG = 'x' * PASTE_THRESHOLD
+
+
+@pytest.mark.parametrize('text, interval, can_paste, unicode_typing, paste, plan', [
+    ('', 0.05, True, False, False, []),
+    ('hello', 0.05, True, False, False, [(WRITE, 'hello')]),
+    ('hello', 0.05, True, False, True, [(PASTE, 'hello')]),
+    ('a\tb\nc', 0.05, False, False, False, [(WRITE, 'a\tb\nc')]),
+    ('café au lait', 0.05, True, False, False, [(WRITE, 'caf'), (PASTE, 'é'), (WRITE, ' au lait')]),
+    ('日本 go', 0.05, True, False, False, [(PASTE, '日本'), (WRITE, ' go')]),
+    ('café', 0.05, True, True, False, [(WRITE, 'café')]),
+    (LONG, 0.0, True, False, False, [(PASTE, LONG)]),
+    (LONG, 0.05, True, False, False, [(WRITE, LONG)]),
+    (LONG, 0.0, False, False, False, [(WRITE, LONG)]),
+    (LONG[:-1], 0.0, True, False, False, [(WRITE, LONG[:-1])]),
+])
+def test_plan(text, interval, can_paste, unicode_typing, paste, plan):
+    assert plan_text(text, interval, can_paste, unicode_typing, paste) == plan
+
+
+def test_characters_that_can_neither_be_typed_nor_pasted_are_an_error():
+    with pytest.raises(ValueError):
+        plan_text('naïve', 0.05, False, False)
+
+
+@pytest.mark.parametrize('text, interval, calls', [
+    ('abcdef', 0.05, [('write', 'ab'), ('write', 'cd'), ('write', 'ef')]),     # 0.1 s per chunk
+    ('abcde', 0.01, [('write', 'abcde')]),
+    ('é!é', 0.05, [('paste', 'é'), ('write', '!'), ('paste', 'é')]),
+    ('y' * (MAX_CHUNK + 3), 0.0, [('write', 'y' * MAX_CHUNK), ('write', 'yyy')]),
+])
+def test_send_text_batches_calls(text, interval, calls):
+    backend = NoPasteBackend() if interval == 0 else AsciiBackend()
+    assert send_text(backend, text, interval)
+    assert [(event.kind,) + event.args for event in backend.events] == calls
+
+
+def test_send_text_stops_between_chunks():
+    backend = AsciiBackend()
+    checks = iter([True, True, False])
+    assert not send_text(backend, 'abcdef', 0.05, is_running=lambda: next(checks))
+    assert [event.args[0] for event in backend.events] == ['ab', 'cd']
+
+
+@pytest.mark.parametrize('key, op, text', [
+    ('type(hello)', OP_TYPE, 'hello'),
+    ('TYPE(Hi there)', OP_TYPE, 'Hi there'),
+    ('type(a\\nb\\tc\\\\n)', OP_TYPE, 'a\nb\tc\\n'),
+    ('type(f(x), g(y))', OP_TYPE, 'f(x), g(y)'),
+    ('paste(Grüße)', OP_PASTE, 'Grüße'),
+    ('Hello World', OP_TYPE, 'Hello World'),
+])
+def test_rows_compile_to_typing(key, op, text):
+    ins = compile_rows([{'key': key}])[0]
+    assert (ins.op, ins.text) == (op, text)
+
+
+@pytest.mark.parametrize('key', ['type()', 'paste()'])
+def test_empty_text_is_rejected(key):
+    with pytest.raises(ProgramError):
+        compile_rows([{'key': key}])
+
+
+def test_unescape_leaves_other_backslashes():
+    assert unescape(r'C:\path\n\x') == 'C:\\path\n\\x'
+
+
+def test_engine_types_with_the_row_hold_as_interval():
+    backend = AsciiBackend()
+    program = compile_rows([{'key': 'type(abcd)', 'hold': '0.05'}, {'key': 'paste(ñ)'}])
+    assert Engine(program, repetitions=1, backend=backend).run() == RESULT_COMPLETED
+    assert [(event.kind,) + event.args for event in backend.events] == \
+        [('write', 'ab'), ('write', 'cd'), ('paste', 'ñ')]
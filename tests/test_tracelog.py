@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+from tracelog import EVENT_DROPPED, EVENT_ROW_START, RingBuffer, Tracer
+
+
+def _read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_overflow_keeps_the_newest_records_and_counts_the_rest(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Tracer(path, capacity=8, flush_interval=60.0)     # the writer never wakes before close()
+    for i in range(20):
+        tracer.emit(EVENT_ROW_START, 'main', i, f"row {i}")
+    tracer.close()
+    records = _read(path)
+    assert records[0]['event'] == EVENT_DROPPED and records[0]['detail'] == 12
+    assert [record['row'] for record in records[1:]] == list(range(13, 21))     # rows are written from 1
+    assert [record['detail'] for record in records[1:]] == [f"row {i}" for i in range(12, 20)]
+    assert tracer.written == 8
+    assert tracer.buffer.dropped == 12
+
+
+def test_the_background_writer_flushes_while_running(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Tracer(path, flush_interval=0.01)
+    tracer.emit(EVENT_ROW_START, 'main', 0, 'a')
+    deadline = time.perf_counter() + 5.0
+    while tracer.written < 1:
+        assert time.perf_counter() < deadline, "the writer never flushed"
+        time.sleep(0.005)
+    assert [record['program'] for record in _read(path)] == ['main']
+    tracer.emit(EVENT_ROW_START, 'main', 1, 'b')
+    tracer.close()
+    assert [record['row'] for record in _read(path)] == [1, 2]
+
+
+def test_records_from_several_flushes_are_appended_in_order(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Tracer(path, capacity=4, flush_interval=60.0)
+    for i in range(10):
+        tracer.emit(EVENT_ROW_START, 'main', i)
+        if i % 3 == 2:
+            tracer.flush()
+    tracer.close()
+    assert [record['row'] for record in _read(path)] == list(range(1, 11))
+    assert tracer.buffer.dropped == 0
+
+
+def test_snapshot_without_a_file_holds_the_newest_events():
+    tracer = Tracer(capacity=4)
+    for i in range(6):
+        tracer.emit(EVENT_ROW_START, 'main', i)
+    assert [record['row'] for record in tracer.snapshot()] == [3, 4, 5, 6]
+    tracer.close()
+
+
+def test_ring_buffer_capacity_must_be_a_power_of_two():
+    with pytest.raises(ValueError):
+        RingBuffer(6)
+    buffer = RingBuffer(2)
+    for i in range(5):
+        buffer.append(i)
+    assert buffer.drain() == ([3, 4], 3)
+    assert buffer.drain() == ([], 0)
@@ -0,0 +1,70 @@
+"""Typing text rows, type(...) and paste(...).
+
+plan_text splits text into backend calls: runs of characters the backend
+can type go out as one write() each, characters it cannot type (anything
+outside printable ASCII on the pyautogui-based backends) are pasted
+through the clipboard, and long text typed without a per-character delay
+is pasted whole. send_text performs the plan in chunks short enough to
+stop between them.
+"""
+import re
+
+TYPE_INTERVAL = 0.05        # seconds between characters, as text rows always used
+PASTE_THRESHOLD = 200       # paste text this long when typing without a delay
+CHUNK_SECONDS = 0.1         # a chunk takes about this long at the given interval
+MAX_CHUNK = 256             # characters per write() when typing without a delay
+
+WRITE = 'write'
+PASTE = 'paste'
+
+_ESCAPES = {'n': '\n', 't': '\t', '\\': '\\'}
+
+
+def unescape(text):
+    r"""Replace \n, \t and \\ in type(...) and paste(...) text."""
+    return re.sub(r'\\([nt\\])', lambda m: _ESCAPES[m.group(1)], text)
+
+
+def _typable(ch):
+    return ' ' <= ch <= '~' or ch in '\n\t'
+
+
+def plan_text(text, interval, can_paste, unicode_typing, paste=False,
+              threshold=PASTE_THRESHOLD):
+    """The (WRITE or PASTE, text) calls that enter text.
+
+    Raises ValueError if text has characters the backend can neither type
+    nor paste.
+    """
+    if not text:
+        return []
+    if can_paste and (paste or (interval <= 0 and len(text) >= threshold)):
+        return [(PASTE, text)]
+    if unicode_typing:
+        return [(WRITE, text)]
+    steps = []
+    for run in re.findall(r'[ -~\n\t]+|[^ -~\n\t]+', text):
+        if _typable(run[0]):
+            steps.append((WRITE, run))
+        elif can_paste:
+            steps.append((PASTE, run))
+        else:
+            raise ValueError(f"the input backend cannot type {run[0]!r}; use a backend that can paste")
+    return steps
+
+
+def send_text(backend, text, interval=TYPE_INTERVAL, paste=False, is_running=lambda: True):
+    """Enter text through backend. Returns False if is_running() turned False midway."""
+    steps = plan_text(text, interval, backend.can_paste, backend.unicode_typing, paste)
+    chunk = max(1, int(CHUNK_SECONDS / interval)) if interval > 0 else MAX_CHUNK
+    for kind, run in steps:
+        if kind == PASTE:
+            if not is_running():
+                return False
+            backend.paste(run)
+            continue
+        for i in range(0, len(run), chunk):
+            if not is_running():
+                return False
+            backend.write(run[i:i + chunk], interval=interval)
+    return True
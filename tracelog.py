@@ -0,0 +1,176 @@
+"""Structured run trace.
+
+Pass a Tracer to Engine to record what a run does as timestamped events:
+runs and repetitions starting, every row's start, action and end, jumps
+and branches taken, chained programs, screen waits, errors and why the run
+ended. Emitting an event only stores a tuple in a ring buffer; a background
+thread drains the buffer and appends the events to a file as JSON lines, so
+the engine thread never formats or writes anything:
+
+    {"time": 1760780000.123456, "program": "Farm", "event": "row_start", "row": 3, "detail": "click"}
+
+Rows are numbered from 1, as in the GUI. If the writer falls more than a
+buffer behind, the oldest events are overwritten and a "dropped" event
+with their number is written in their place. Without a path the events
+are only kept in memory, for snapshot().
+"""
+import itertools
+import json
+import os
+import threading
+import time
+
+CAPACITY = 1 << 16          # events held in memory; a power of two
+FLUSH_INTERVAL = 0.2        # seconds between writes to the file
+TRACE_ENV = 'SIMPLEKEYCLICKER_TRACE'
+TRACE_FILE = 'SimpleKeyClicker-trace.jsonl'
+
+EVENT_RUN_START = 'run_start'       # detail: repetitions (None for infinite)
+EVENT_LOOP = 'loop'                 # detail: repetition number
+EVENT_ROW_START = 'row_start'       # detail: the row's action
+EVENT_ACTION_DONE = 'action_done'   # the action finished, the delay starts
+EVENT_ROW_END = 'row_end'
+EVENT_JUMP = 'jump'                 # detail: the row jumped to
+EVENT_CHAIN_START = 'chain_start'   # detail: the chained program
+EVENT_CHAIN_END = 'chain_end'
+EVENT_WAIT = 'wait'                 # detail: {'found', 'polls', 'seconds'}
+EVENT_RETRY = 'retry'               # detail: {'attempt', 'error', 'delay'}
+EVENT_ERROR = 'error'               # detail: {'title', 'message', 'handled'}
+EVENT_RUN_END = 'run_end'           # detail: {'result', 'stop_requested'}
+EVENT_DROPPED = 'dropped'           # detail: number of events lost
+
+
+def default_path():
+    """Where the GUI writes its trace: SIMPLEKEYCLICKER_TRACE, or the home directory."""
+    return os.environ.get(TRACE_ENV) or os.path.join(os.path.expanduser('~'), TRACE_FILE)
+
+
+class RingBuffer:
+    """Fixed-size event buffer for many producers and one consumer.
+
+    append() takes no lock: each item gets its sequence number from an
+    itertools.count, whose next() is atomic, and goes into its own slot.
+    A slot holds (sequence, item), so the consumer can tell an item it has
+    not read yet from one that is not written yet or already overwritten.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("ring buffer capacity must be a power of two")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self._slots = [None] * capacity
+        self._sequence = itertools.count()
+        self._read = 0
+        self.dropped = 0
+
+    def append(self, item):
+        sequence = next(self._sequence)
+        self._slots[sequence & self.mask] = (sequence, item)
+
+    def drain(self):
+        """The items appended since the last drain, oldest first, and the number lost since."""
+        slots, mask = self._slots, self.mask
+        read = self._read
+        items = []
+        lost = 0
+        while True:
+            entry = slots[read & mask]
+            if entry is None or entry[0] < read:
+                break               # not written yet
+            if entry[0] > read:
+                # Overwritten before it was read. The slot's item is at most a
+                # buffer ahead of the oldest one still held: go on from there.
+                oldest = entry[0] - self.capacity + 1
+                lost += oldest - read
+                read = oldest
+                continue
+            items.append(entry[1])
+            read += 1
+        self._read = read
+        self.dropped += lost
+        return items, lost
+
+    def snapshot(self):
+        """Every item still held, oldest first, without consuming them."""
+        entries = [entry for entry in list(self._slots) if entry is not None]
+        entries.sort(key=lambda entry: entry[0])
+        return [item for _, item in entries]
+
+
+class Tracer:
+    """Collects events from any number of engines and writes them to path."""
+
+    def __init__(self, path=None, capacity=CAPACITY, flush_interval=FLUSH_INTERVAL,
+                 clock=time.perf_counter):
+        self.path = path
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.buffer = RingBuffer(capacity)
+        # emit() is on the engine's hot path, so it fills the buffer's slots itself.
+        self._next = self.buffer._sequence.__next__
+        self._slots = self.buffer._slots
+        self._mask = self.buffer.mask
+        self.written = 0
+        # Converts clock() readings to wall-clock time when writing.
+        self._epoch = time.time() - clock()
+        self._closed = threading.Event()
+        self._file = None
+        self._writer = None
+        if path is not None:
+            self._file = open(path, 'a', encoding='utf-8')
+            self._writer = threading.Thread(target=self._write_loop, daemon=True, name="trace writer")
+            self._writer.start()
+
+    def emit(self, kind, program, row=-1, detail=None):
+        """Record an event; row is the 0-based row index, -1 for none."""
+        sequence = self._next()
+        self._slots[sequence & self._mask] = (sequence, (self.clock(), kind, program, row, detail))
+
+    def snapshot(self):
+        """The events still in memory as dicts, oldest first."""
+        return [self._record(event) for event in self.buffer.snapshot()]
+
+    def _record(self, event):
+        t, kind, program, row, detail = event
+        record = {'time': round(self._epoch + t, 6), 'program': program, 'event': kind}
+        if row >= 0:
+            record['row'] = row + 1
+        if detail is not None:
+            record['detail'] = detail
+        return record
+
+    def _write_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Write the buffered events to the file (the writer thread does this on its own)."""
+        if self._file is None:
+            return
+        events, lost = self.buffer.drain()
+        if not events and not lost:
+            return
+        lines = []
+        if lost:
+            lines.append(json.dumps({'time': round(time.time(), 6), 'event': EVENT_DROPPED,
+                                     'detail': lost}))
+        for event in events:
+            lines.append(json.dumps(self._record(event), default=str))
+        try:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+        except (OSError, ValueError):
+            return
+        self.written += len(events)
+
+    def close(self):
+        """Write what is left and close the file."""
+        self._closed.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None